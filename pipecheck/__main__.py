@@ -1,29 +1,35 @@
 #!/usr/bin/env /usr/bin/python3
 
-import concurrent.futures
 import os
+import random
 import signal
+import socket
 import sys
 import time
 
-from prometheus_client import Enum, Summary, start_http_server
-from termcolor import colored
-
-from pipecheck.api import CheckResult, Err, Ok, Warn
+from pipecheck.api import Call, CheckResult, Err, Ok, Unk, Warn, load
 from pipecheck.checks import probes
 from pipecheck.cli import get_commands_and_config_from_args, parse_args
-from pipecheck.cmdfile import get_config_from_yamlfile
-
-REQUEST_TIME = Summary("checks_processing_seconds", "Time spent processing all checks")
-
-CHECK_STATE_LABLES = ["url", "host", "port", "name"]
-CHECK_STATES = {}
-
-for check in probes:
-    labels = [x for x in probes[check].get_args() if x in CHECK_STATE_LABLES]
-    CHECK_STATES[check] = Enum(f"{check}_check_state", f"State of check {check}", labels, states=["Ok", "Warn", "Err"])
+from pipecheck.cmdfile import get_check_id, get_checks_from_yamlfile, iter_checks
+from pipecheck.engine import ThreadEngine, engines
+from pipecheck.graph import resolve_dependencies
+from pipecheck.limits import LIMIT_OPTIONS, Limits
+from pipecheck.metrics import CHECK_STATE_LABLES, DEFAULT_BUCKETS, CheckMetrics, get_state_labels
+from pipecheck.output import JsonLinesWriter
+from pipecheck.reload import ConfigReloader
+from pipecheck.scheduler import Scheduler
+from pipecheck.shard import get_shard_index, select_shard
+
+# NOTE: heavy dependencies (probe modules, prometheus_client, yaml, asyncio) are imported on first use, keeping
+# one-shot runs (e.g. init containers) fast. This is why imports inside functions are found throughout the package,
+# tests/test_startup.py guards it.
+
+CHECK_OPTIONS = ["interval", "id", "depends_on"] + LIMIT_OPTIONS
 
 no_color = False
+metrics = None
+output = None
+pusher = None
 
 commands = []
 results = []
@@ -41,7 +47,7 @@ def print_result(result: CheckResult):
         return msg
 
     if not no_color:
-        c = colored
+        from termcolor import colored as c
     else:
         c = non_colored
 
@@ -51,67 +57,220 @@ def print_result(result: CheckResult):
         print(c("[OK]    ", "green"), result.msg, flush=True)
     elif isinstance(result, Err):
         print(c("[ERROR] ", "red"), result.msg, flush=True)
+    elif isinstance(result, Unk):
+        print(c("[SKIP]  ", "blue"), result.msg, flush=True)
 
 
 def print_error(msg: str):
     print(msg, file=sys.stderr, flush=True)
 
 
-def get_commands_from_config(c):
-    commands = []
+def get_named_commands_from_config(c):
+    return [(get_check_id(path, command), command) for path, command in iter_checks(c)]
 
-    def scan(x):
-        if isinstance(x, dict):
-            if "type" in x.keys():
-                final_x = dict(filter(lambda elem: not isinstance(elem[1], dict), x.items()))
-                commands.append(final_x)
-            else:
-                for key in x:
-                    scan(x[key])
-        elif isinstance(x, list):
-            for i in x:
-                scan(i)
 
-    scan(c)
-    return commands
+def get_commands_from_config(c):
+    return [command for _, command in get_named_commands_from_config(c)]
 
 
 def gen_calls(args):
     (commands, config) = get_commands_and_config_from_args(args)
     if "file" in args and args["file"]:
-        c = get_config_from_yamlfile(args["file"])
-        commands.extend(get_commands_from_config(c))
+        # all checks of the file are validated before any probe is created
+        for id, command in get_checks_from_yamlfile(args["file"], CHECK_OPTIONS):
+            commands.append(command if id is None else {**command, "id": id})
 
-    for command in commands:
-        yield gen_call(command, config)
+    # depends_on references are checked (unknown, ambiguous, cyclic) when loading the checks
+    calls = resolve_dependencies(gen_call(command, config) for command in commands)
+    if args.get("shards") and args["shards"] > 1:
+        calls = select_shard(calls, args["shards"], get_shard_index(args.get("shard_index")))
+    return calls
 
 
 def gen_call(command, config):
     f_name = command.pop("type")
     if f_name not in probes:
         raise Exception(f"can't find check of type '{f_name}'")
+    options = {k: command.pop(k) for k in CHECK_OPTIONS if k in command}
     l_config = {**config, **command}
     f = probes[f_name](**l_config)
-    return (f, f_name)
-
-
-@REQUEST_TIME.time()
-def run(calls):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        launched_checks = {executor.submit(cmd[0]): cmd for cmd in calls}
-        return_code = 0
-        for future in concurrent.futures.as_completed(launched_checks):
-            cmd = launched_checks[future]
-            result = future.result()
-            print_result(result)
-            labels = {k: v for k, v in cmd[0].get_labels().items() if k in CHECK_STATE_LABLES}
-            CHECK_STATES[cmd[1]].labels(**labels).state(result.__class__.__name__)
-            if isinstance(result, Err):
-                return_code = 1
-
+    return Call(f, f_name, options)
+
+
+def gen_engine(args):
+    limits = Limits(
+        host_concurrency=args.get("host_concurrency"),
+        host_rate=args.get("host_rate"),
+        type_concurrency=dict(args.get("type_concurrency") or []),
+        type_rate=dict(args.get("type_rate") or []),
+        burst=args.get("rate_burst") or 1,
+    )
+    return load(engines[args["engine"]])(
+        concurrency=args["concurrency"],
+        batch=args.get("batch"),
+        coalesce=args.get("coalesce"),
+        result_ttl=args.get("result_ttl"),
+        limits=limits,
+        batch_options=gen_batch_options(args),
+    )
+
+
+def gen_batch_options(args):
+    # settings of a whole batch rather than of its checks, passed to Probe.execute_many() of the type
+    tcp = {"max_inflight": args.get("tcp_inflight"), "fallback_delay": args.get("tcp_fallback_delay")}
+    return {"tcp": {k: v for k, v in tcp.items() if v is not None}}
+
+
+def gen_pusher(args):
+    if not args.get("push"):
+        return None
+    from pipecheck.aggregate import ResultPusher
+
+    return ResultPusher(
+        args["push"],
+        args.get("vantage") or socket.gethostname(),
+        on_error=lambda e: print_error(f"pushing results failed, dropped ({e})"),
+    )
+
+
+def report(cmd, result: CheckResult):
+    if output is not None:
+        output.write(cmd, result)
+    else:
+        print_result(result)
+    if pusher is not None:
+        pusher.write(cmd, result)
+    if metrics is not None:
+        metrics.observe(cmd, result)
+
+
+def report_skip(cmd):
+    print_error(f"{cmd[1]} check {get_state_labels(cmd)} skipped, previous run still in progress")
+    if metrics is not None:
+        metrics.skipped.labels(cmd[1]).inc()
+
+
+def flush_output(summary_seconds=None):
+    # writes the buffered jsonl results at once, with a summary line at the end of a run
+    if pusher is not None:
+        pusher.flush()
+    if output is None:
+        return
+    if summary_seconds is not None:
+        output.summary(summary_seconds)
+    output.flush()
+
+
+def run(calls, engine=None, fail_fast=False, deadline=None):
+    if engine is None:
+        engine = ThreadEngine()
+
+    start = time.perf_counter()
+    return_code = 0
+    calls = list(calls)
+    reported = 0
+    for cmd, result in engine.execute(calls, timeout=deadline):
+        report(cmd, result)
+        reported += 1
+        if isinstance(result, Err):
+            return_code = 1
+            if fail_fast:
+                break
+    flush_output(summary_seconds=time.perf_counter() - start)
+    if reported < len(calls):
+        print_error(f"fail-fast: {len(calls) - reported} outstanding checks cancelled")
+
+    if metrics is not None:
+        metrics.processing.observe(time.perf_counter() - start)
     return return_code
 
 
+def run_wait(calls, engine=None, timeout=None, backoff=1.0, max_backoff=30.0, clock=time.monotonic, sleep=time.sleep):
+    """
+    Re-runs the failing checks until all pass or `timeout` seconds passed, waiting between attempts with
+    exponential backoff (`backoff` x 2^attempt, at most `max_backoff`) and jitter. Probes, the engine and connection
+    pools are reused across attempts. Passing checks are reported once, failing ones when giving up.
+    The deadline is kept with `clock`, the backoff waits with `sleep`.
+    """
+    if engine is None:
+        engine = ThreadEngine()
+
+    start = time.perf_counter()
+    deadline = None if not timeout else clock() + timeout
+    failing = list(calls)
+    attempt = 0
+    with engine:
+        while True:
+            results = list(engine.execute(failing, timeout=None if deadline is None else deadline - clock()))
+            for cmd, result in results:
+                if not isinstance(result, (Err, Unk)):
+                    report(cmd, result)
+            failed = [(cmd, result) for cmd, result in results if isinstance(result, (Err, Unk))]
+            delay = min(max_backoff, backoff * 2**attempt)
+            delay = random.uniform(delay / 2, delay)
+            give_up = deadline is not None and clock() + delay >= deadline
+            if give_up:
+                for cmd, result in failed:
+                    report(cmd, result)
+            flush_output(summary_seconds=time.perf_counter() - start if not failed or give_up else None)
+            if not failed:
+                return 0
+            if give_up:
+                print_error(f"gave up waiting after {attempt + 1} attempts, {len(failed)} checks failing")
+                return 1
+            print_error(f"{len(failed)} checks failing, attempt {attempt + 2} in {delay:.1f}s")
+            sleep(delay)
+            failing = [cmd for cmd, _ in failed]
+            attempt += 1
+
+
+def run_once(args, calls, engine):
+    if args.get("wait") is not None:
+        status = run_wait(
+            calls,
+            engine,
+            timeout=args["wait"],
+            backoff=args.get("wait_backoff") or 1.0,
+            max_backoff=args.get("wait_max_backoff") or 30.0,
+        )
+    else:
+        status = run(calls, engine, fail_fast=args.get("fail_fast"), deadline=args.get("deadline"))
+    if pusher is not None:
+        # the results still queued are delivered before exiting
+        pusher.close()
+    return status
+
+
+def apply_config(scheduler, calls):
+    (added, removed) = scheduler.update(calls)
+    if scheduler.engine.limits is not None:
+        # host limits set by options of the checks are taken from the new ones
+        scheduler.engine.limits.reset()
+    if metrics is not None:
+        metrics.retain(scheduler.calls())
+    print_error(f"config reloaded: {added} checks added, {removed} removed, {len(scheduler) - added} unchanged")
+
+
+def run_scheduler(scheduler, reloader=None):
+    with scheduler.engine:
+        while True:
+            scheduler.step(timeout=1.0 if reloader else None)
+            flush_output()
+            if reloader:
+                reloader.poll()
+
+
+def run_aggregator(args):
+    from pipecheck.aggregate import Aggregator, AggregatorServer
+
+    aggregator = Aggregator(quorum=args.get("quorum"), max_age=args.get("vantage_ttl") or 120.0)
+    server = AggregatorServer(aggregator, args["prom_port"])
+    signal.signal(signal.SIGTERM, signal_handler)
+    print_error(f"aggregator listening on port {server.port}")
+    with server:
+        server.serve_forever()
+
+
 def signal_handler(signal, frame):
     print_error(f"signal {signal} received. exited.")
     sys.exit(0)
@@ -120,28 +279,73 @@ def signal_handler(signal, frame):
 if __name__ == "__main__":
     args = parse_args()
 
-    if not supports_color() or ("no_color" in args and args["no_color"]):
-        no_color = True
+    no_color = not supports_color() or bool(args.get("no_color"))
+
+    output = JsonLinesWriter() if args.get("output") == "jsonl" else None
 
     sys.tracebacklimit = 0
     if "verbose" in args and args["verbose"]:
         sys.tracebacklimit = None
 
+    if args.get("aggregate"):
+        run_aggregator(args)
+
+    pusher = gen_pusher(args)
+
     calls = list(gen_calls(args))
     if len(calls) <= 0:
         print_error("No probes specified")
         sys.exit(0)
 
+    engine = gen_engine(args)
+
     last_status = 0
     if "interval" in args and args["interval"]:
+        from prometheus_client import start_http_server
+
+        # metrics are registered for all check types, including those of plugins
+        probes.load_plugins()
+        metrics = CheckMetrics(
+            probes,
+            buckets=args.get("histogram_buckets") or DEFAULT_BUCKETS,
+            labels=args.get("metric_labels") or CHECK_STATE_LABLES,
+            url_mode=args.get("metric_url") or "full",
+            max_label_length=args.get("metric_max_label_length") or 128,
+            max_series=args.get("metric_max_series") or 1000,
+            series_ttl=args.get("metric_ttl"),
+        )
         start_http_server(args["prom_port"])
 
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
 
-        while True:
-            last_status = run(calls)
-            time.sleep(float(args["interval"]))
+        scheduler = Scheduler(
+            engine,
+            float(args["interval"]),
+            jitter=args["jitter"],
+            on_result=report,
+            on_skip=report_skip,
+            on_step=metrics.processing.observe,
+        )
+        for call in calls:
+            scheduler.add(call)
+
+        reloader = None
+        if args.get("file") and args["file"] != "-":
+            reloader = ConfigReloader(
+                args["file"],
+                lambda: list(gen_calls(args)),
+                lambda calls: apply_config(scheduler, calls),
+                on_error=lambda e: print_error(f"config reload failed, keeping current checks ({e})"),
+                poll_interval=args.get("reload_interval"),
+            )
+            signal.signal(signal.SIGHUP, reloader.request)
+        run_scheduler(scheduler, reloader)
     else:
-        last_status = run(calls)
+        last_status = run_once(args, calls, engine)
+        if engine.abandoned:
+            # don't wait for abandoned probes (e.g. a blocking system dns lookup), their sockets are closed on exit
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(last_status)
     sys.exit(last_status)
@@ -0,0 +1,283 @@
+import gzip
+import json
+import queue
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pipecheck.output import JsonLinesWriter
+
+STATES = ["Ok", "Warn", "Err", "Unk"]
+
+# pushed requests larger than this are refused (413), before and after decompression
+MAX_PUSH_BYTES = 16 * 1024 * 1024
+MAX_RECORDS_BYTES = 64 * 1024 * 1024
+
+
+def gunzip(body, limit):
+    """Decompresses gzip data of at most `limit` bytes, raises ValueError on larger ones without inflating them"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, limit + 1)
+    if len(data) > limit or decompressor.unconsumed_tail:
+        raise ValueError(f"more than {limit} bytes decompressed")
+    if not decompressor.eof:
+        raise zlib.error("truncated gzip data")
+    return data
+
+
+def get_target(record):
+    # the check id, or the labels of checks without one (e.g. 'host=db,port=3306')
+    if record.get("id") is not None:
+        return str(record["id"])
+    return ",".join(f"{k}={v}" for k, v in sorted((record.get("labels") or {}).items()))
+
+
+def quorum_state(statuses, quorum=None):
+    """
+    State of a target from the statuses reported by its vantage points: Err once `quorum` vantage points (default:
+    a majority) see it failing, Warn if only some do (partial outage) or any warns, Unk with fewer than `quorum`
+    reporting. Skipped checks (unk) don't vote.
+    """
+    votes = [s for s in statuses if s in ("ok", "warn", "err")]
+    quorum = quorum or len(votes) // 2 + 1
+    if not votes or len(votes) < quorum:
+        return "Unk"
+    failing = votes.count("err")
+    if failing >= quorum:
+        return "Err"
+    if failing or "warn" in votes:
+        return "Warn"
+    return "Ok"
+
+
+class Aggregator:
+    """
+    Matrix of target x vantage point of the results pushed by pipecheck agents. Results older than `max_age`
+    seconds are dropped, e.g. of an agent which stopped pushing.
+    """
+
+    def __init__(self, quorum=None, max_age=120.0):
+        self.quorum = quorum
+        self.max_age = max_age
+        self._results = {}  # (type, target) -> {vantage: (received, record)}
+        self._pushes = {}  # vantage -> time of the last push
+        self._lock = threading.Lock()
+
+    def add(self, vantage, records, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._pushes[vantage] = now
+            for record in records:
+                if record.get("summary") or "status" not in record:
+                    continue
+                self._results.setdefault((record["type"], get_target(record)), {})[vantage] = (now, record)
+
+    def matrix(self, now=None):
+        """{(type, target): {vantage: record}} of the results not older than max_age"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for key in list(self._results):
+                vantages = self._results[key]
+                for vantage in [v for v, (received, _) in vantages.items() if now - received > self.max_age]:
+                    del vantages[vantage]
+                if not vantages:
+                    del self._results[key]
+            return {key: {v: record for v, (_, record) in vantages.items()} for key, vantages in self._results.items()}
+
+    def states(self, now=None):
+        return {key: quorum_state([r["status"] for r in v.values()], self.quorum) for key, v in self.matrix(now).items()}
+
+    def collect(self):
+        # prometheus_client collector interface
+        from prometheus_client.core import GaugeMetricFamily
+
+        matrix = self.matrix()
+        vantage_state = GaugeMetricFamily(
+            "pipecheck_vantage_check_state",
+            "State of a target seen from a vantage point",
+            labels=["type", "target", "vantage", "state"],
+        )
+        vantage_duration = GaugeMetricFamily(
+            "pipecheck_vantage_check_duration_seconds",
+            "Duration of the last check of a target from a vantage point",
+            labels=["type", "target", "vantage"],
+        )
+        target_state = GaugeMetricFamily(
+            "pipecheck_target_state",
+            "State of a target agreed by a quorum of vantage points",
+            labels=["type", "target", "state"],
+        )
+        vantages = GaugeMetricFamily(
+            "pipecheck_target_vantages", "Vantage points reporting a target", labels=["type", "target"]
+        )
+        failing = GaugeMetricFamily(
+            "pipecheck_target_failing_vantages", "Vantage points seeing a target fail", labels=["type", "target"]
+        )
+        for (type, target), results in sorted(matrix.items()):
+            for vantage, record in sorted(results.items()):
+                for state in STATES:
+                    vantage_state.add_metric([type, target, vantage, state], float(record["status"] == state.lower()))
+                if record.get("duration") is not None:
+                    vantage_duration.add_metric([type, target, vantage], record["duration"])
+            state = quorum_state([r["status"] for r in results.values()], self.quorum)
+            for s in STATES:
+                target_state.add_metric([type, target, s], float(state == s))
+            vantages.add_metric([type, target], len(results))
+            failing.add_metric([type, target], sum(r["status"] == "err" for r in results.values()))
+        last_push = GaugeMetricFamily(
+            "pipecheck_vantage_last_push_timestamp_seconds", "Time of the last push of a vantage point", labels=["vantage"]
+        )
+        with self._lock:
+            for vantage, pushed in sorted(self._pushes.items()):
+                last_push.add_metric([vantage], pushed)
+        return [vantage_state, vantage_duration, target_state, vantages, failing, last_push]
+
+
+class _PushHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlsplit(self.path)
+        vantage = (parse_qs(url.query).get("vantage") or [""])[0]
+        if url.path != "/push" or not vantage:
+            self.send_error(404 if url.path != "/push" else 400)
+            return
+        (status, records) = self._read_records()
+        if status is not None:
+            self.send_error(status, records)
+            return
+        self.server.aggregator.add(vantage, records)
+        self.send_response(204)
+        self.end_headers()
+
+    def _read_records(self):
+        # (None, records) of the request, or (error status, message)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return (400, "invalid Content-Length")
+        if length > MAX_PUSH_BYTES:
+            return (413, f"more than {MAX_PUSH_BYTES} bytes")
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gunzip(body, MAX_RECORDS_BYTES)
+        except zlib.error as e:
+            return (400, str(e))
+        except ValueError as e:
+            return (413, str(e))
+        try:
+            return (None, [json.loads(line) for line in body.decode().splitlines() if line.strip()])
+        except ValueError as e:
+            return (400, str(e))
+
+    def do_GET(self):
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+        if urlsplit(self.path).path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = generate_latest(self.server.registry)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AggregatorServer(ThreadingHTTPServer):
+    """Accepts results on POST /push?vantage=NAME (JSON Lines, optionally gzip encoded) and exports /metrics"""
+
+    daemon_threads = True
+
+    def __init__(self, aggregator, port, host=""):
+        from prometheus_client import CollectorRegistry
+
+        self.aggregator = aggregator
+        self.registry = CollectorRegistry()
+        self.registry.register(aggregator)
+        super().__init__((host, port), _PushHandler)
+        self.port = self.server_address[1]
+
+
+class ResultPusher(JsonLinesWriter):
+    """
+    Pushes results to an aggregator from a background thread, as gzip compressed requests of up to `batch_size`
+    results, sent at the latest `flush_interval` seconds after the first one of a batch was queued. flush() hands the
+    buffered results to the thread and never blocks: at most `max_queue` results wait, newer ones are dropped. A batch
+    which can't be delivered is retried `retries` times, then dropped and passed to `on_error` with the exception.
+    """
+
+    _CLOSE = object()
+
+    def __init__(
+        self, url, vantage, timeout=5.0, on_error=None, batch_size=1000, flush_interval=1.0, max_queue=10000, retries=1
+    ):
+        import requests
+
+        super().__init__()
+        self.url = f"{url.rstrip('/')}/push"
+        self.vantage = vantage
+        self.timeout = timeout
+        self.on_error = on_error
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self._session = requests.Session()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def flush(self):
+        (lines, self._lines) = (self._lines, [])
+        dropped = 0
+        for line in lines:
+            try:
+                self._queue.put_nowait(line)
+            except queue.Full:
+                dropped += 1
+        if dropped and self.on_error:
+            self.on_error(OverflowError(f"push queue full, {dropped} results dropped"))
+
+    def close(self, timeout=None):
+        """Pushes the remaining results and stops the thread, waiting at most `timeout` seconds"""
+        self.flush()
+        self._queue.put(self._CLOSE)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        due = None
+        while True:
+            try:
+                line = self._queue.get(timeout=None if due is None else max(0.0, due - time.monotonic()))
+            except queue.Empty:
+                line = None
+            if line is not None and line is not self._CLOSE:
+                batch.append(line)
+                due = due or time.monotonic() + self.flush_interval
+            if batch and (line is self._CLOSE or len(batch) >= self.batch_size or time.monotonic() >= due):
+                self._push(batch)
+                (batch, due) = ([], None)
+            if line is self._CLOSE:
+                return
+
+    def _push(self, lines):
+        body = gzip.compress(("\n".join(lines) + "\n").encode())
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session.post(
+                    self.url,
+                    params={"vantage": self.vantage},
+                    data=body,
+                    headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                return
+            except Exception as e:
+                if attempt == self.retries and self.on_error:
+                    self.on_error(e)
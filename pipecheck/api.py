@@ -1,8 +1,21 @@
+import copy
+import importlib
+from typing import ClassVar, NamedTuple, Union
+
+
+def load(path):
+    """Imports a lazily registered object given as "module:attribute" """
+    (module, _, attribute) = path.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
 class CheckResult:
     msg: str = ""
+    duration: float = None  # seconds, set by the engine
 
-    def __init__(self, msg) -> None:
+    def __init__(self, msg, phases=None) -> None:
         self.msg = msg
+        self.phases = phases or {}  # seconds per phase (e.g. dns, connect, tls), as far as the probe knows them
 
 
 class Ok(CheckResult):
@@ -21,11 +34,109 @@ class Unk(CheckResult):
     pass
 
 
-class Probe:
+def _to_bool(value):
+    if isinstance(value, str):
+        if value.lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"expected a boolean, got '{value}'")
+    return bool(value)
+
+
+def _to_int(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"expected an integer, got {value}")
+    return int(value)
+
+
+def _to_str(value):
+    if isinstance(value, (dict, list, tuple)):
+        raise ValueError(f"expected a string, got {value!r}")
+    return str(value)
+
+
+def _to_list(value):
+    if isinstance(value, dict):
+        raise ValueError(f"expected a list, got {value!r}")
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _to_dict(value):
+    if not isinstance(value, dict):
+        raise ValueError(f"expected a mapping, got {value!r}")
+    return dict(value)
+
+
+COERCIONS = {bool: _to_bool, int: _to_int, float: float, str: _to_str, list: _to_list, dict: _to_dict}
+
+
+def _get_coercion(annotation):
+    # Optional[X] is coerced like X, unknown types are taken as they are
+    args = getattr(annotation, "__args__", None) or ()
+    if getattr(annotation, "__origin__", None) is Union and type(None) in args:
+        annotation = [a for a in args if a not in (type(None),)][0]
+    annotation = getattr(annotation, "__origin__", None) or annotation
+    return COERCIONS.get(annotation, lambda value: value)
+
+
+class _ProbeType(type):
+    """
+    Compiles the field schema of a probe class once: annotated public class attributes are the arguments of the
+    probe (their value is the default, their type the coercion of configured values), annotated private ones are
+    state of an instance. Both are stored in __slots__, other (ClassVar or private) class attributes are shared by all
+    instances. Unannotated public attributes are only accepted as new defaults of inherited arguments.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields = {}
+        state = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, "_fields", {}))
+            state.update(getattr(base, "_state", {}))
+        annotations = namespace.get("__annotations__", {})
+        for k, value in list(namespace.items()):
+            if k[:1] == "_" or k in annotations or callable(value) or isinstance(value, (classmethod, staticmethod, property)):
+                continue
+            if k not in fields:
+                raise TypeError(
+                    f"argument '{k}' of probe {name} has no type annotation (e.g. `{k}: str = ...`), "
+                    "annotate shared class attributes with ClassVar"
+                )
+            fields[k] = (fields[k][0], namespace.pop(k))
+        slots = list(namespace.get("__slots__", ()))
+        for k, annotation in annotations.items():
+            if getattr(annotation, "__origin__", None) is ClassVar:
+                continue
+            if k not in fields and k not in state:
+                slots.append(k)
+            (state if k[:1] == "_" else fields)[k] = (_get_coercion(annotation), namespace.pop(k, None))
+        namespace["__slots__"] = tuple(slots)
+        namespace["_fields"] = fields
+        namespace["_state"] = state
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Probe(metaclass=_ProbeType):
+    # instances can hold attributes besides their fields and state, e.g. a connection set by a plugin probe
+    __slots__ = ("__dict__",)
+    _labels: dict = None
+
     def __init__(self, **kwargs):
-        for k, v in kwargs.items():
-            if v is not None and k in self.__class__.__dict__:
-                setattr(self, k, v)
+        for k, (coerce, default) in self._fields.items():
+            value = kwargs.get(k)
+            try:
+                setattr(self, k, default if value is None else coerce(value))
+            except (TypeError, ValueError) as e:
+                raise ValueError(self._invalid(k, e)) from None
+        for k, reason in self.check_args({k: getattr(self, k) for k in self._fields}).items():
+            raise ValueError(self._invalid(k, reason))
+        for k, (_, default) in self._state.items():
+            setattr(self, k, default)
+
+    @classmethod
+    def _invalid(cls, k, reason):
+        return f"invalid argument '{k}' of {cls.get_type()} check ({reason})"
 
     @classmethod
     def get_help(cls):
@@ -37,13 +148,147 @@ class Probe:
 
     @classmethod
     def get_args(cls):
-        return [i for i in cls.__dict__.keys() if i[:1] != "_"]
+        return list(cls._fields)
+
+    @classmethod
+    def get_defaults(cls):
+        return {k: default for k, (_, default) in cls._fields.items()}
+
+    @classmethod
+    def check_args(cls, args) -> dict:
+        """
+        Returns {arg: reason} of the arguments (converted to the type of their field) the probe doesn't accept,
+        e.g. out of range. Used by validate() and on construction.
+        """
+        return {}
+
+    @classmethod
+    def validate(cls, kwargs):
+        """Returns the errors of arguments which can't be converted to the type of their field or fail check_args()"""
+        errors = []
+        values = {}
+        for k, value in kwargs.items():
+            if k in cls._fields and value is not None:
+                try:
+                    values[k] = cls._fields[k][0](value)
+                except (TypeError, ValueError) as e:
+                    errors.append(cls._invalid(k, e))
+        return errors + [cls._invalid(k, reason) for k, reason in cls.check_args(values).items()]
 
     def get_labels(self):
-        return {k: getattr(self, k) for k in self.__class__.__dict__ if k[:1] != "_"}
+        # built once, the arguments of a probe don't change after construction
+        if self._labels is None:
+            self._labels = {k: getattr(self, k) for k in self._fields}
+        return self._labels
+
+    def limit_timeout(self, seconds) -> "Probe":
+        """
+        Returns a copy of the probe with its timeouts (args named `timeout` or `*_timeout`) capped to `seconds`, e.g. to
+        the time left until a deadline, or the probe itself if none is longer. The probe itself isn't changed.
+        """
+        capped = [
+            k
+            for k in self._fields
+            if (k == "timeout" or k.endswith("_timeout")) and (getattr(self, k) is None or float(getattr(self, k)) > seconds)
+        ]
+        if not capped:
+            return self
+        probe = copy.copy(self)
+        for k in capped:
+            setattr(probe, k, seconds)
+        probe._labels = None
+        return probe
+
+    @classmethod
+    def parse(cls, value) -> dict:
+        # a target given on the command line (e.g. --tcp 8.8.8.8:53) sets the first argument of the probe
+        return {"type": cls.get_type(), cls.get_args()[0]: value}
+
+    @classmethod
+    def prepare(cls, probes):
+        # called once per run with all probes of the class about to be executed, e.g. to resolve targets at once
+        pass
 
     def __call__(self) -> CheckResult:
+        if type(self).acall is not Probe.acall:
+            # probes implementing only the coroutine run on their own loop in the thread engine
+            import asyncio
+
+            return asyncio.run(self.acall())
         return Unk("No check implemented")
 
+    async def acall(self) -> CheckResult:
+        # probes without a native coroutine run on the loop's executor
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(None, self)
+
+    @classmethod
+    def execute_many(cls, probes) -> list:
+        # probes able to group targets (e.g. share one socket) override this, engines call it in batch mode.
+        # It may be a coroutine function, the async engine awaits it on its loop. Batch options configured for the
+        # type (see Engine) are passed as keyword arguments
+        return [probe() for probe in probes]
+
+    @classmethod
+    def can_batch(cls):
+        return cls.execute_many.__func__ is not Probe.execute_many.__func__
+
     def __repr__(self):
         return f"<{self.__class__.__name__}: {self.get_labels()}>"
+
+
+class ProbeSpec:
+    """
+    Registry entry of a probe type. Type and help are known without importing the probe, its module (and with
+    it its dependencies) is imported when the probe is first instantiated or its args are asked for.
+    Without help (e.g. probes of plugins) it is read from the probe when first asked for.
+    """
+
+    def __init__(self, path, type, help=None, args=None):
+        self.path = path
+        self.type = type
+        self.help = help
+        self.args = None if args is None else list(args)
+        self._cls = None
+
+    def load(self):
+        if self._cls is None:
+            self._cls = load(self.path)
+        return self._cls
+
+    def get_type(self):
+        return self.type
+
+    def get_help(self):
+        return self.load().get_help() if self.help is None else self.help
+
+    def get_args(self):
+        # read from the probe, so they can't drift from its fields
+        return self.load().get_args() if self.args is None else self.args
+
+    def validate(self, kwargs):
+        return self.load().validate(kwargs)
+
+    def parse(self, value) -> dict:
+        return {**self.load().parse(value), "type": self.type}
+
+    def __call__(self, **kwargs) -> Probe:
+        return self.load()(**kwargs)
+
+    def __repr__(self):
+        return f"<ProbeSpec {self.type}: {self.path}>"
+
+
+class Call(NamedTuple):
+    probe: Probe
+    type: str
+    options: dict = {}
+
+    def get_probe_key(self):
+        # calls with equal probe keys produce the same result, regardless of their scheduling options
+        return (self.type, repr(sorted(self.probe.get_labels().items())))
+
+    def get_key(self):
+        # identifies a configured check, calls with equal keys run the same check
+        return self.get_probe_key() + (repr(sorted(self.options.items())),)
@@ -0,0 +1,138 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from pipecheck.bench.runner import peak_rss, percentile
+from pipecheck.bench.servers import DnsStubServer, HttpServer, MysqlStubServer, TcpListeners
+from pipecheck.engine import engines
+
+TYPES = ["tcp", "http", "dns", "mysql"]
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m pipecheck.bench",
+        description="Runs pipecheck against local stand-in targets and reports throughput, latency and resource usage",
+        epilog="further arguments are passed to pipecheck (e.g. --batch, --http-keepalive, --mysql-persistent)",
+    )
+    parser.add_argument("-n", "--checks", type=int, default=500, help="checks per scenario (default: %(default)s)")
+    parser.add_argument("-r", "--rounds", type=int, default=1, help="runs of all checks per scenario (default: %(default)s)")
+    parser.add_argument("-t", "--types", nargs="*", choices=TYPES, default=TYPES, help="check types to benchmark")
+    parser.add_argument("-e", "--engines", nargs="*", choices=list(engines), default=list(engines), help="engines to compare")
+    parser.add_argument("--tcp-listeners", type=int, default=10, help="local ports the tcp checks are spread over")
+    parser.add_argument("--http-latency", type=float, default=0.0, help="seconds the HTTP server waits before answering")
+    parser.add_argument("--http-body-size", type=int, default=0, help="bytes of the HTTP response body")
+    parser.add_argument(
+        "--startup-runs", type=int, default=5, help="one-shot pipecheck processes timed for startup, 0 to skip"
+    )
+    parser.add_argument("--json", action="store_true", help="print one json object per scenario instead of a table")
+    return parser.parse_known_args(args)
+
+
+class Targets:
+    """The local servers of a benchmark and the commands pointing at them"""
+
+    def __init__(self, tcp_listeners=10, http_latency=0.0, http_body_size=0, names=1000):
+        self.names = [f"host{i}.bench.test" for i in range(names)]
+        self.tcp = TcpListeners(tcp_listeners)
+        self.http = HttpServer(http_latency, http_body_size)
+        self.dns = DnsStubServer({name: {"A": ["127.0.0.1"]} for name in self.names})
+        self.mysql = MysqlStubServer()
+
+    def command(self, type, i):
+        if type == "tcp":
+            return {"type": "tcp", "host": "127.0.0.1", "port": self.tcp.ports[i % len(self.tcp.ports)]}
+        if type == "http":
+            return {"type": "http", "url": f"{self.http.url}/{i}"}
+        if type == "dns":
+            # distinct names, the resolver cache would answer repeated ones
+            return {"type": "dns", "name": self.names[i % len(self.names)], "ips": ["127.0.0.1"]}
+        return {"type": "mysql", "host": "127.0.0.1", "port": self.mysql.port, "user": "bench", "password": "bench"}
+
+    def args(self, type):
+        return ["--nameserver", self.dns.nameserver] if type == "dns" else []
+
+    def close(self):
+        for server in (self.tcp, self.http, self.dns, self.mysql):
+            server.close()
+
+
+def run_scenario(scenario):
+    out = subprocess.run(
+        [sys.executable, "-m", "pipecheck.bench.runner"], input=json.dumps(scenario), capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit code {out.returncode}")
+    return json.loads(out.stdout)
+
+
+def run_startup(runs, target):
+    # wall time of complete one-shot processes (interpreter start, imports, one tcp check), as in init containers
+    seconds = []
+    errors = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-m", "pipecheck", "--tcp", target], stdout=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+        errors += out.returncode != 0
+    return {
+        "checks": runs,
+        "errors": errors,
+        "seconds": sum(seconds),
+        "checks_per_second": runs / sum(seconds),
+        "p50": percentile(seconds, 50),
+        "p99": percentile(seconds, 99),
+        "peak_rss": peak_rss(resource.RUSAGE_CHILDREN),
+        "peak_threads": None,
+    }
+
+
+def format_row(row):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.2f}"
+
+    return (
+        f"{row['scenario']:<14} {row['engine']:<7} {row['checks']:>7} {row['errors']:>6} "
+        f"{row['checks_per_second'] or 0:>10.1f} {ms(row['p50']):>9} {ms(row['p99']):>9} "
+        f"{row['peak_rss'] / 1024 / 1024:>8.1f} {row['peak_threads'] or '-':>7}"
+    )
+
+
+def main(args=None):
+    (options, pipecheck_args) = parse_args(args)
+    targets = Targets(options.tcp_listeners, options.http_latency, options.http_body_size, options.checks)
+    rows = []
+
+    def report(row):
+        rows.append(row)
+        print(json.dumps(row) if options.json else format_row(row), flush=True)
+
+    if not options.json:
+        print(
+            f"{'scenario':<14} {'engine':<7} {'checks':>7} {'errors':>6} {'checks/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+            f"{'rss MiB':>8} {'threads':>7}"
+        )
+    try:
+        if options.startup_runs > 0:
+            target = f"127.0.0.1:{targets.tcp.ports[0]}"
+            report({"scenario": "startup", "engine": "thread", **run_startup(options.startup_runs, target)})
+        for type in options.types:
+            commands = [targets.command(type, i) for i in range(options.checks)]
+            for engine in options.engines:
+                scenario = {
+                    # checks to the same target would be coalesced, pass --coalesce to measure that
+                    "args": ["--engine", engine, "--no-coalesce"] + targets.args(type) + pipecheck_args,
+                    "commands": commands,
+                    "rounds": options.rounds,
+                }
+                report({"scenario": type, "engine": engine, **run_scenario(scenario)})
+    finally:
+        targets.close()
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+from types import SimpleNamespace
+
+import pipecheck.__main__ as pipecheck_main
+from pipecheck.api import Err
+from pipecheck.cli import parse_args
+
+# runs one benchmark scenario in a fresh interpreter, so peak RSS and thread count belong to this scenario only
+
+
+class Recorder:
+    """Takes the place of the prometheus metrics in run(), keeping durations and errors instead of exporting them"""
+
+    def __init__(self):
+        self.durations = []
+        self.errors = 0
+        self.runs = []
+        self.processing = SimpleNamespace(observe=self.runs.append)
+
+    def observe(self, call, result):
+        if result.duration is not None:
+            self.durations.append(result.duration)
+        if isinstance(result, Err):
+            self.errors += 1
+
+
+class ThreadSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count() - 1)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_scenario(scenario):
+    # scenario: {"args": pipecheck command line options, "commands": probe dicts as in a command file, "rounds": n}
+    args = parse_args(scenario["args"])
+    calls = [pipecheck_main.gen_call(dict(command), args) for command in scenario["commands"]]
+    engine = pipecheck_main.gen_engine(args)
+    rounds = scenario.get("rounds", 1)
+
+    recorder = Recorder()
+    pipecheck_main.metrics = recorder
+    pipecheck_main.no_color = True
+    sampler = ThreadSampler()
+    sampler.start()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), engine:
+        for _ in range(rounds):
+            pipecheck_main.run(calls, engine)
+    sampler.stop()
+
+    seconds = sum(recorder.runs)
+    return {
+        "checks": len(calls) * rounds,
+        "errors": recorder.errors,
+        "seconds": seconds,
+        "checks_per_second": len(calls) * rounds / seconds if seconds else None,
+        "p50": percentile(recorder.durations, 50),
+        "p99": percentile(recorder.durations, 99),
+        "peak_rss": peak_rss(),
+        "peak_threads": sampler.peak,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_scenario(json.load(sys.stdin))))
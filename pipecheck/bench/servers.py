@@ -0,0 +1,304 @@
+import socket
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# local stand-ins for check targets, used by the benchmark and the tests
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    # stand-ins must not be the bottleneck: the default backlog of 5 drops SYNs under load
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+class _UdpServer(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        super().server_bind()
+
+
+class _HttpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _body(self):
+        # /bytes/<n> returns a json body of n bytes, any other path the server's default body
+        if self.path.startswith("/bytes/"):
+            return json_body(int(self.path.split("/")[2]))
+        return self.server.body
+
+    def do_HEAD(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self._body())))
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_HEAD()
+        try:
+            self.wfile.write(self._body())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *_):
+        pass
+
+
+def json_body(size=0):
+    if size <= 0:
+        return b'{"code":200,"description":"OK"}'
+    return b'{"code":200,"data":"' + b"x" * max(0, size - 22) + b'"}'
+
+
+class HttpServer(ThreadingHTTPServer):
+    """HTTP/1.1 server answering every request with 200, after `latency` seconds and with a body of `body_size` bytes"""
+
+    daemon_threads = True
+    request_queue_size = 4096
+
+    def __init__(self, latency=0.0, body_size=0):
+        super().__init__(("127.0.0.1", 0), _HttpHandler)
+        self.latency = latency
+        self.body = json_body(body_size)
+        self.connections = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TcpListeners:
+    """Listening sockets on `count` ports accepting and closing connections"""
+
+    def __init__(self, count=1, backlog=4096):
+        self.sockets = []
+        for _ in range(count):
+            sock = socket.socket()
+            sock.bind(("127.0.0.1", 0))
+            sock.listen(backlog)
+            self.sockets.append(sock)
+            threading.Thread(target=self._accept, args=(sock,), daemon=True).start()
+        self.ports = [sock.getsockname()[1] for sock in self.sockets]
+
+    @staticmethod
+    def _accept(sock):
+        while True:
+            try:
+                (conn, _) = sock.accept()
+            except OSError:
+                return
+            conn.close()
+
+    def close(self):
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+DNS_TYPES = {1: "A", 28: "AAAA", 5: "CNAME"}
+
+
+def _encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.rstrip(".").split(".")) + b"\0"
+
+
+def _decode_question(data):
+    labels = []
+    offset = 12
+    while data[offset]:
+        start = offset + 1
+        offset = start + data[offset]
+        labels.append(data[start:offset].decode())
+    (qtype,) = struct.unpack_from("!H", data, offset + 1)
+    end = offset + 5
+    return ".".join(labels).lower(), qtype, data[12:end]
+
+
+def _encode_rdata(rtype, value):
+    if rtype == "A":
+        return socket.inet_pton(socket.AF_INET, value)
+    if rtype == "AAAA":
+        return socket.inet_pton(socket.AF_INET6, value)
+    return _encode_name(value)
+
+
+def build_answer(zone, data, truncate=False, ttl=300):
+    (qid,) = struct.unpack_from("!H", data)
+    name, qtype, question = _decode_question(data)
+    records = zone.get(name)
+    answers = [] if records is None else [(name, v) for v in records.get(DNS_TYPES.get(qtype), [])]
+    if qtype != 5 and records and "CNAME" in records:
+        target = records["CNAME"][0]
+        answers = [(name, target)] + [(target, v) for v in zone.get(target, {}).get(DNS_TYPES.get(qtype), [])]
+        qtypes = [5] + [qtype] * (len(answers) - 1)
+    else:
+        qtypes = [qtype] * len(answers)
+    flags = 0x8180 | (3 if records is None else 0) | (0x0200 if truncate else 0)
+    if truncate:
+        answers = []
+    body = b"".join(
+        _encode_name(n) + struct.pack("!HHIH", t, 1, ttl, len(r)) + r
+        for (n, v), t in zip(answers, qtypes)
+        for r in [_encode_rdata(DNS_TYPES[t], v)]
+    )
+    return struct.pack("!HHHHHH", qid, flags, 1, len(answers), 0, 0) + question + body
+
+
+class DnsStubServer:
+    """Authoritative DNS stub answering A/AAAA/CNAME queries from a zone dict over UDP and TCP"""
+
+    def __init__(self, zone, truncate=(), ttl=300):
+        self.zone = zone
+        self.truncate = set(truncate)
+        self.ttl = ttl
+        self.queries = []
+        stub = self
+
+        class UdpHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                name = _decode_question(data)[0]
+                stub.queries.append(("udp", name, _decode_question(data)[1]))
+                sock.sendto(build_answer(stub.zone, data, name in stub.truncate, stub.ttl), self.client_address)
+
+        class TcpHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                (length,) = struct.unpack("!H", self.request.recv(2))
+                data = self.request.recv(length)
+                stub.queries.append(("tcp",) + _decode_question(data)[:2])
+                answer = build_answer(stub.zone, data, ttl=stub.ttl)
+                self.request.sendall(struct.pack("!H", len(answer)) + answer)
+
+        (self.tcp, self.udp) = self._bind(TcpHandler, UdpHandler)
+        self.port = self.tcp.server_address[1]
+        self.nameserver = f"127.0.0.1:{self.port}"
+        for server in (self.udp, self.tcp):
+            threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+
+    @staticmethod
+    def _bind(tcp_handler, udp_handler, attempts=10):
+        # TCP and UDP share a port: bind TCP on a free one first, retry with another if its UDP port is taken
+        for attempt in range(attempts):
+            tcp = _TcpServer(("127.0.0.1", 0), tcp_handler)
+            try:
+                return (tcp, _UdpServer(("127.0.0.1", tcp.server_address[1]), udp_handler))
+            except OSError:
+                tcp.server_close()
+                if attempt == attempts - 1:
+                    raise
+
+    def close(self):
+        for server in (self.udp, self.tcp):
+            server.shutdown()
+            server.server_close()
+
+
+CAPABILITIES = 0x00000001 | 0x00000008 | 0x00000200 | 0x00002000 | 0x00008000 | 0x00080000
+COM_QUIT = 0x01
+COM_QUERY = 0x03
+COM_PING = 0x0E
+
+
+def _packet(seq, payload):
+    return struct.pack("<I", len(payload))[:3] + bytes([seq]) + payload
+
+
+def _greeting(connection_id):
+    salt = b"0123456789abcdefghij"
+    return (
+        b"\x0a5.7.0-stub\0"
+        + struct.pack("<I", connection_id)
+        + salt[:8]
+        + b"\0"
+        + struct.pack("<HBHHB", CAPABILITIES & 0xFFFF, 33, 0, CAPABILITIES >> 16, len(salt) + 1)
+        + b"\0" * 10
+        + salt[8:]
+        + b"\0"
+        + b"mysql_native_password\0"
+    )
+
+
+def _ok():
+    return b"\x00\x00\x00" + struct.pack("<HH", 0, 0)
+
+
+def _err(code, message):
+    return b"\xff" + struct.pack("<H", code) + b"#28000" + message.encode()
+
+
+class MysqlStubServer:
+    """
+    Speaks just enough of the MySQL protocol for pymysql: handshake (any password, users in `deny` are rejected),
+    COM_PING and COM_QUERY (always answered with OK). Records connections and commands.
+    """
+
+    def __init__(self, deny=()):
+        self.deny = set(deny)
+        self.connections = 0
+        self.commands = []
+        self._open = []
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def read(self):
+                header = self.request.recv(4, 0x100)
+                if len(header) < 4:
+                    return None, None
+                length = struct.unpack("<I", header[:3] + b"\0")[0]
+                payload = b""
+                while len(payload) < length:
+                    chunk = self.request.recv(length - len(payload))
+                    if not chunk:
+                        return None, None
+                    payload += chunk
+                return header[3], payload
+
+            def handle(self):
+                stub.connections += 1
+                stub._open.append(self.request)
+                self.request.sendall(_packet(0, _greeting(stub.connections)))
+                (seq, response) = self.read()
+                if response is None:
+                    return
+                user = response[32:].split(b"\0")[0].decode()
+                if user in stub.deny:
+                    self.request.sendall(_packet(seq + 1, _err(1045, f"Access denied for user '{user}'")))
+                    return
+                self.request.sendall(_packet(seq + 1, _ok()))
+                while True:
+                    (seq, command) = self.read()
+                    if not command or command[0] == COM_QUIT:
+                        return
+                    stub.commands.append((command[0], command[1:].decode()))
+                    self.request.sendall(_packet(seq + 1, _ok()))
+
+        self.server = _TcpServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def drop_connections(self):
+        for sock in self._open:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+        self._open = []
+
+    def close(self):
+        self.drop_connections()
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,10 +1,77 @@
-from pipecheck.checks.dns import DnsProbe
-from pipecheck.checks.http import HttpProbe
-from pipecheck.checks.icmp import PingProbe
-from pipecheck.checks.mysql import MysqlProbe
-from pipecheck.checks.tcp import TcpProbe
+import warnings
 
-probes = {}
+from pipecheck.api import ProbeSpec
 
-for cls in [HttpProbe, DnsProbe, PingProbe, TcpProbe, MysqlProbe]:
-    probes[cls.get_type()] = cls
+PLUGIN_GROUP = "pipecheck.probes"
+
+
+def get_entry_points(group):
+    from importlib import metadata
+
+    try:
+        found = metadata.entry_points(group=group)
+    except TypeError:
+        # python < 3.10
+        found = metadata.entry_points().get(group, [])
+    return [(ep.name, f"{ep.module}:{ep.attr}") for ep in found]
+
+
+class ProbeRegistry(dict):
+    """
+    Probe specs by check type. The probes of installed plugins, declared as entry points of `group` named by their
+    check type (e.g. `redis = "pipecheck_redis:RedisProbe"`), are registered by load_plugins(), which runs the first
+    time a type that isn't registered is looked up. Built-in types and `reserved` names can't be taken by plugins.
+    """
+
+    def __init__(self, group=PLUGIN_GROUP):
+        super().__init__()
+        self.group = group
+        self.reserved = set()
+        self._plugins_loaded = False
+
+    def load_plugins(self):
+        if self._plugins_loaded:
+            return
+        self._plugins_loaded = True
+        for name, path in get_entry_points(self.group):
+            if super().__contains__(name):
+                warnings.warn(f"ignoring the plugin {path}, check type '{name}' already exists")
+            elif name in self.reserved:
+                warnings.warn(f"ignoring the plugin {path}, check type '{name}' is a command line option")
+            else:
+                self[name] = ProbeSpec(path, name)
+
+    def __contains__(self, type):
+        if not super().__contains__(type) and not self._plugins_loaded:
+            self.load_plugins()
+        return super().__contains__(type)
+
+    def __missing__(self, type):
+        if type not in self:
+            raise KeyError(type)
+        return self[type]
+
+
+# probes are registered by type and help only, each probe module and its dependencies load on first use
+# (the args of a probe are read from its class when first asked for)
+probes = ProbeRegistry()
+
+for spec in [
+    ProbeSpec("pipecheck.checks.http:HttpProbe", "http", "HTTP request checking on response status (not >=400)"),
+    ProbeSpec(
+        "pipecheck.checks.dns:DnsProbe",
+        "dns",
+        """
+    DNS resolution check against given IPv4 (e.g. www.google.com=172.217.23.36)
+    NOTE: it is possible to use subnets as target using CIDR notation
+    """,
+    ),
+    ProbeSpec("pipecheck.checks.icmp:PingProbe", "ping", "ICMP ping check"),
+    ProbeSpec("pipecheck.checks.tcp:TcpProbe", "tcp", "Try simple TCP handshake on given host and port (e.g. 8.8.8.8:53)"),
+    ProbeSpec(
+        "pipecheck.checks.mysql:MysqlProbe",
+        "mysql",
+        "Try MySQL Connection to given host and port using given user and password",
+    ),
+]:
+    probes[spec.get_type()] = spec
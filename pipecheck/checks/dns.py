@@ -1,8 +1,8 @@
-import socket
-
-from netaddr import IPAddress, IPNetwork
+from netaddr import AddrFormatError, IPAddress, IPNetwork
 
 from pipecheck.api import CheckResult, Err, Ok, Probe
+from pipecheck.resolver import ResolveError, resolvers
+from pipecheck.utils import get_ip_matcher
 
 
 class DnsProbe(Probe):
@@ -13,22 +13,67 @@ class DnsProbe(Probe):
 
     name: str = ""
     ips: list = []
+    resolver: str = "system"
+    nameserver: str = None
+    dns_timeout: float = 2.0
+    dns_tcp: bool = False
+    _matcher: object = None
 
-    def __call__(self) -> CheckResult:
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # parse expectations once, the matcher is shared by all probes with the same ips
+        self._matcher = get_ip_matcher(tuple(self.ips))
+
+    @classmethod
+    def check_args(cls, args):
+        for ip in args.get("ips") or ():
+            try:
+                IPNetwork(ip)
+            except (AddrFormatError, TypeError, ValueError):
+                return {"ips": f"'{ip}' is not an IP address or subnet"}
+        return {}
+
+    def _get_resolver(self):
+        resolver = "dns" if self.nameserver else self.resolver
+        if resolver not in resolvers:
+            raise ResolveError(f"unknown resolver '{resolver}'")
+        return resolvers[resolver](nameserver=self.nameserver, timeout=self.dns_timeout, tcp=self.dns_tcp)
+
+    def _evaluate(self, records) -> CheckResult:
         name = self.name
         ips = self.ips
 
-        try:
-            ip = socket.gethostbyname(name)
-        except socket.gaierror as e:
-            return Err(f"DNS resolution for '{name}' failed ({e})")
+        addresses = [r.value for r in records if r.type in ("A", "AAAA")]
+        if not addresses:
+            return Err(f"DNS resolution for '{name}' returned no addresses")
+        ip = ", ".join(addresses)
+
+        # only answers of an ip version present in the expectations are compared
+        matcher = self._matcher
+        compared = [a for a in map(IPAddress, addresses) if a.version in matcher.versions]
+        matched = bool(compared) and all(a in matcher for a in compared)
 
         target = " ".join(ips)
-        if "/" in target:
-            if any(IPAddress(ip) in IPNetwork(t) for t in ips):
+        if matcher.has_networks:
+            if matched:
                 return Ok(f"DNS resolution for '{name}' returned ip '{ip}' in expected subnet '{target}'")
             return Err(f"DNS resolution for '{name}' did not return ip '{ip}' in expected subnet '{target}'")
         elif target:
-            if any(ip == t for t in ips):
+            if matched:
                 return Ok(f"DNS resolution for '{name}' returned expected ip '{ip}'")
             return Err(f"DNS resolution for '{name}' did not return expected ip '{target}' but '{ip}'")
+        return Ok(f"DNS resolution for '{name}' successful ({ip})")
+
+    def __call__(self) -> CheckResult:
+        try:
+            records = self._get_resolver().resolve_sync(self.name)
+        except ResolveError as e:
+            return Err(f"DNS resolution for '{self.name}' failed ({e})")
+        return self._evaluate(records)
+
+    async def acall(self) -> CheckResult:
+        try:
+            records = await self._get_resolver().resolve(self.name)
+        except ResolveError as e:
+            return Err(f"DNS resolution for '{self.name}' failed ({e})")
+        return self._evaluate(records)
@@ -1,10 +1,169 @@
+import codecs
+import contextlib
 import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
 
 import certifi
 import requests
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
 
 from pipecheck.api import CheckResult, Err, Ok, Probe, Warn
 
+# phase durations of the request currently sent by this thread (see HttpProbe._request)
+_timings = threading.local()
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    Records the dns and connect duration of new connections. Resolves the host itself and connects to its addresses
+    one after the other, all within one connect timeout.
+    """
+
+    def _connect(self, info, deadline):
+        (family, type, proto, _, address) = info
+        sock = socket.socket(family, type, proto)
+        try:
+            for option in self.socket_options or []:
+                sock.setsockopt(*option)
+            if deadline is not None:
+                sock.settimeout(max(0.0, deadline - time.monotonic()))
+            if self.source_address:
+                sock.bind(self.source_address)
+            sock.connect(address)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def _new_conn(self):
+        phases = getattr(_timings, "phases", {})
+        timeout = self.timeout if isinstance(self.timeout, (int, float)) else None
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            infos = socket.getaddrinfo(self.host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from None
+        resolved = time.perf_counter()
+        phases["dns"] = resolved - start
+        error = None
+        for info in infos:
+            try:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise socket.timeout()
+                sock = self._connect(info, deadline)
+            except socket.timeout:
+                raise ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={timeout})") from None
+            except OSError as e:
+                error = e
+                continue
+            phases["connect"] = time.perf_counter() - resolved
+            # the connect timeout also applies to the request until urllib3 sets the read timeout
+            sock.settimeout(timeout)
+            return sock
+        raise NewConnectionError(self, f"Failed to establish a new connection: {error}")
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """Records the dns, connect and tls handshake duration of new connections"""
+
+    def connect(self):
+        phases = getattr(_timings, "phases", {})
+        start = time.perf_counter()
+        super().connect()
+        phases["tls"] = max(0.0, time.perf_counter() - start - phases.get("dns", 0) - phases.get("connect", 0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class SessionPool:
+    """
+    Shared requests sessions, one per host and certificate verification setting (False or ca-bundle path).
+    Sessions unused for longer than their idle time are closed, at most `max_hosts` sessions are kept.
+    """
+
+    def __init__(self, max_hosts=256):
+        self.max_hosts = max_hosts
+        self._sessions = OrderedDict()
+        self._ssl_errors = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url, verify):
+        u = urlsplit(url)
+        return (u.scheme, u.hostname, u.port, verify)
+
+    @staticmethod
+    def _create(pool_size):
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _evict(self, now):
+        while self._sessions:
+            key, (session, last_used, idle) = next(iter(self._sessions.items()))
+            if now - last_used < idle and len(self._sessions) <= self.max_hosts:
+                break
+            del self._sessions[key]
+            session.close()
+
+    def get(self, url, verify, pool_size=10, idle=60) -> requests.Session:
+        key = self._key(url, verify)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            if entry and now - entry[1] >= entry[2]:
+                entry[0].close()
+                entry = None
+            session = entry[0] if entry else self._create(pool_size)
+            self._sessions[key] = (session, now, idle)
+            self._evict(now)
+            return session
+
+    def get_ssl_error(self, url, verify):
+        with self._lock:
+            (error, expires) = self._ssl_errors.get(self._key(url, verify), (None, 0))
+            return error if expires > time.monotonic() else None
+
+    def set_ssl_error(self, url, verify, error, ttl=5):
+        # kept briefly, for the checks of the same host in one run: a fixed certificate is noticed on the next run
+        with self._lock:
+            self._ssl_errors[self._key(url, verify)] = (error, time.monotonic() + ttl)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def clear(self):
+        with self._lock:
+            for session, _, _ in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._ssl_errors.clear()
+
+
+sessions = SessionPool()
+
 
 class HttpProbe(Probe):
     """HTTP request checking on response status (not >=400)"""
@@ -12,33 +171,111 @@ class HttpProbe(Probe):
     url: str = ""
     http_status: list = list(range(200, 208)) + list(range(300, 308))
     http_method: str = "HEAD"
-    http_timeout: int = 5
+    http_timeout: float = 5
     http_headers: dict = {}
+    http_keepalive: bool = True
+    http_pool_size: int = 10
+    http_pool_idle: int = 60
+    http_stream: bool = False
+    max_body_bytes: int = 1048576
     content_regex: str = None
     content_exact: str = None
     ca_certs: str = certifi.where()
     insecure: bool = False
-    _last_response = None
+    _last_response: object = None
+    _pattern: object = None
+
+    @classmethod
+    def check_args(cls, args):
+        if args.get("max_body_bytes") is not None and args["max_body_bytes"] < 1:
+            return {"max_body_bytes": f"expected at least 1, got {args['max_body_bytes']}"}
+        return {}
+
+    def _get_pattern(self):
+        if self._pattern is None or self._pattern.pattern != self.content_regex:
+            self._pattern = re.compile(self.content_regex)
+        return self._pattern
+
+    # content checks return True/False, or None while a partial body is not conclusive yet
+    def _check_regex(self, text, complete):
+        m = self._get_pattern().match(text)
+        if m and (complete or m.end() < len(text)):
+            return True
+        return False if complete else None
+
+    def _check_exact(self, text, complete):
+        if complete:
+            return self.content_exact == str(text).strip()
+        return None if self.content_exact.startswith(text.strip()) else False
 
     def _get_content_checks(self):
         checks = []
         if self.content_regex is not None:
-            checks.append((f"regex: {self.content_regex}", lambda x: bool(re.match(self.content_regex, x))))
+            checks.append((f"regex: {self.content_regex}", self._check_regex))
         if self.content_exact is not None:
-            checks.append((f"exact: {self.content_exact}", lambda x: self.content_exact == str(x).strip()))
+            checks.append((f"exact: {self.content_exact}", self._check_exact))
         return checks
 
+    def _stream_content_checks(self, response, checks):
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        text = ""
+        size = 0
+        results = {}
+        for chunk in response.iter_content(chunk_size=min(65536, self.max_body_bytes)):
+            size += len(chunk)
+            text += decoder.decode(chunk)
+            for name, check in checks:
+                result = None if name in results else check(text, False)
+                if result is not None:
+                    results[name] = result
+            if len(results) == len(checks):
+                return results, ""
+            if size >= self.max_body_bytes:
+                return results, f" (stopped reading after {size} bytes)"
+        text += decoder.decode(b"", final=True)
+        for name, check in checks:
+            if name not in results:
+                results[name] = check(text, True)
+        return results, ""
+
+    def _run_content_checks(self, response, checks):
+        if not self.http_stream:
+            return {n: c(response.text, True) for n, c in checks}, ""
+        return self._stream_content_checks(response, checks)
+
+    @contextlib.contextmanager
+    def _send(self, verify):
+        # without keepalive the throwaway session is closed after the (maybe streamed) response has been read
+        kwargs = {"timeout": self.http_timeout, "headers": self.http_headers, "verify": verify, "stream": self.http_stream}
+        if not self.http_keepalive:
+            with SessionPool._create(1) as session, session.request(self.http_method, self.url, **kwargs) as response:
+                yield response
+            return
+        session = sessions.get(self.url, verify, self.http_pool_size, self.http_pool_idle)
+        with session.request(self.http_method, self.url, **kwargs) as response:
+            yield response
+
     def _request(self, verify):
-        response = requests.request(
-            self.http_method, self.url, timeout=self.http_timeout, headers=self.http_headers, verify=verify
-        )
-        self._last_response = response
+        _timings.phases = phases = {}
+        try:
+            with self._send(verify) as response:
+                self._last_response = response
+                connecting = sum(phases.values())
+                phases["first_byte"] = max(0.0, response.elapsed.total_seconds() - connecting)
+                result = self._evaluate(response)
+        finally:
+            del _timings.phases
+        result.phases = phases
+        return result
+
+    def _evaluate(self, response):
         if response.status_code in self.http_status:
             checks = self._get_content_checks()
             if len(checks) > 0:
+                results, note = self._run_content_checks(response, checks)
                 for check in checks:
-                    if not check[1](response.text):
-                        return Err(f"HTTP {self.http_method} to '{self.url}' failed content-check '{check[0]}'")
+                    if not results.get(check[0]):
+                        return Err(f"HTTP {self.http_method} to '{self.url}' failed content-check '{check[0]}'{note}")
                 return Ok(
                     f"HTTP {self.http_method} to '{self.url}' returned {response.status_code}"
                     + " and passed all content checks"
@@ -47,20 +284,29 @@ class HttpProbe(Probe):
                 return Ok(f"HTTP {self.http_method} to '{self.url}' returned {response.status_code}")
         return Err(f"HTTP {self.http_method} to '{self.url}' returned {response.status_code}")
 
+    def _request_insecure(self, ssl_error):
+        result = self._request(verify=False)
+        msg = f"{result.msg}. SSL Certificate verification failed on '{self.url}' ({ssl_error})"
+        if isinstance(result, Ok):
+            return Warn(msg)
+        else:
+            return Err(msg)
+
     def __call__(self) -> CheckResult:
         if self.insecure:
             requests.packages.urllib3.disable_warnings()
 
         try:
-            return self._request(verify=True)
-        except requests.exceptions.SSLError as e:
-            if not self.insecure:
-                return Err(f"HTTP {self.http_method} to '{self.url}' failed ({e})")
-            result = self._request(verify=False)
-            msg = f"{result.msg}. SSL Certificate verification failed on '{self.url}' ({e})"
-            if isinstance(result, Ok):
-                return Warn(msg)
-            else:
-                return Err(msg)
+            # hosts known to fail verification go straight to the unverified pool instead of failing twice
+            ssl_error = sessions.get_ssl_error(self.url, self.ca_certs) if self.insecure and self.http_keepalive else None
+            if ssl_error is None:
+                try:
+                    return self._request(verify=self.ca_certs)
+                except requests.exceptions.SSLError as e:
+                    if not self.insecure:
+                        return Err(f"HTTP {self.http_method} to '{self.url}' failed ({e})")
+                    ssl_error = e
+                    sessions.set_ssl_error(self.url, self.ca_certs, e)
+            return self._request_insecure(ssl_error)
         except Exception as e:
             return Err(f"HTTP {self.http_method} to '{self.url}' failed ({e.__class__}: {e})")
@@ -1,18 +1,148 @@
+import itertools
+import select
+import time
+
 import icmplib
 
 from pipecheck.api import CheckResult, Err, Ok, Probe, Warn
 
+ECHO_REPLY = (0, 129)
+
+
+class MultiPing:
+    """
+    Pings many (probe, address) targets over one shared socket per address family.
+    Requests are spaced by each probe's ping_interval and globally by 1/rate, replies are matched by (source, sequence).
+    The last error sending a request to a target is kept in `errors`.
+    """
+
+    def __init__(self, targets, rate=None, privileged=False):
+        self.targets = targets
+        self.gap = 1.0 / rate if rate else 0.0
+        self.privileged = privileged
+        self.ident = icmplib.utils.unique_identifier()
+        self.sent = [0] * len(targets)
+        self.rtts = [[] for _ in targets]
+        self.errors = [None] * len(targets)
+        self._outstanding = {}
+        self._sequences = itertools.count()
+        self._sockets = {}
+        self._schedule = []
+
+    def _socket(self, address):
+        family = 6 if icmplib.is_ipv6_address(address) else 4
+        if family not in self._sockets:
+            cls = icmplib.ICMPv6Socket if family == 6 else icmplib.ICMPv4Socket
+            self._sockets[family] = cls(privileged=self.privileged)
+        return self._sockets[family]
+
+    def _send(self, k, now):
+        (probe, address) = self.targets[k]
+        request = icmplib.ICMPRequest(destination=address, id=self.ident, sequence=next(self._sequences) & 0xFFFF)
+        try:
+            self._sockets[6 if icmplib.is_ipv6_address(address) else 4].send(request)
+        except icmplib.ICMPLibError as e:
+            self.errors[k] = e
+            return
+        self.sent[k] += 1
+        self._outstanding[(address, request.sequence)] = (k, request, now + float(probe.ping_timeout))
+
+    def _receive(self, timeout):
+        sockets = {s.sock: s for s in self._sockets.values()}
+        ready, _, _ = select.select(list(sockets), [], [], timeout)
+        for sock in ready:
+            try:
+                reply = sockets[sock].receive(None, timeout=0.5)
+            except icmplib.ICMPLibError:
+                continue
+            key = (reply.source, reply.sequence)
+            if reply.type in ECHO_REPLY and key in self._outstanding and (not self.privileged or reply.id == self.ident):
+                (k, request, _) = self._outstanding.pop(key)
+                self.rtts[k].append((reply.time - request.time) * 1000)
+
+    def _next_wakeup(self, next_send):
+        wakeups = [deadline for (_, _, deadline) in self._outstanding.values()]
+        if self._schedule:
+            wakeups.append(max(self._schedule[-1][0], next_send))
+        return min(wakeups, default=None)
+
+    def run(self):
+        start = time.monotonic()
+        self._schedule = sorted(
+            (start + n * float(probe.ping_interval), k)
+            for k, (probe, _) in enumerate(self.targets)
+            for n in range(probe.ping_count)
+        )
+        self._schedule.reverse()
+        for _, address in self.targets:
+            self._socket(address)
+        next_send = start
+        try:
+            while True:
+                now = time.monotonic()
+                while self._schedule and self._schedule[-1][0] <= now and next_send <= now:
+                    self._send(self._schedule.pop()[1], now)
+                    next_send = now + self.gap
+                self._outstanding = {key: v for key, v in self._outstanding.items() if v[2] > now}
+                wakeup = self._next_wakeup(next_send)
+                if wakeup is None:
+                    break
+                self._receive(max(0.0, wakeup - time.monotonic()))
+        finally:
+            for sock in self._sockets.values():
+                sock.close()
+        return [icmplib.Host(address, self.sent[k], self.rtts[k]) for k, (_, address) in enumerate(self.targets)]
+
 
 class PingProbe(Probe):
     """ICMP ping check"""
 
     host: str = ""
     ping_count: int = 1
+    ping_interval: float = 1
+    ping_timeout: float = 2
+    ping_rate: float = None
+    ping_privileged: bool = False
 
-    def __call__(self) -> CheckResult:
-        h = icmplib.ping(self.host, privileged=False, count=self.ping_count)
+    def _evaluate(self, h, error=None) -> CheckResult:
         if h.is_alive:
+            phases = {"rtt": h.avg_rtt / 1000}
             if h.packet_loss > 0.0:
-                return Warn(f"ICMP '{self.host}' ({h.address}) unreliable! packet loss {h.packet_loss*100}%")
-            return Ok(f"ICMP '{self.host}' reachable ({h.avg_rtt}ms)")
+                return Warn(f"ICMP '{self.host}' ({h.address}) unreliable! packet loss {h.packet_loss*100}%", phases)
+            return Ok(f"ICMP '{self.host}' reachable ({h.avg_rtt}ms)", phases)
+        if error is not None:
+            return Err(f"ICMP '{self.host}' unreachable ({error})")
         return Err(f"ICMP '{self.host}' unreachable")
+
+    def _ping_args(self):
+        return {
+            "count": self.ping_count,
+            "interval": float(self.ping_interval),
+            "timeout": float(self.ping_timeout),
+            "privileged": self.ping_privileged,
+        }
+
+    def __call__(self) -> CheckResult:
+        return self._evaluate(icmplib.ping(self.host, **self._ping_args()))
+
+    async def acall(self) -> CheckResult:
+        return self._evaluate(await icmplib.async_ping(self.host, **self._ping_args()))
+
+    @classmethod
+    def execute_many(cls, probes):
+        results = [None] * len(probes)
+        groups = {}  # ping_privileged -> targets, each kind of socket is used only by the probes asking for it
+        for i, probe in enumerate(probes):
+            try:
+                address = icmplib.resolve(probe.host)[0] if icmplib.is_hostname(probe.host) else probe.host
+                groups.setdefault(bool(probe.ping_privileged), []).append((i, address))
+            except icmplib.ICMPLibError as e:
+                results[i] = Err(f"ICMP '{probe.host}' unreachable ({e})")
+
+        # the groups run one after the other, keeping the rate across the whole batch
+        rate = min((float(p.ping_rate) for p in probes if p.ping_rate), default=None)
+        for privileged, targets in groups.items():
+            ping = MultiPing([(probes[i], address) for i, address in targets], rate, privileged)
+            for (i, _), host, error in zip(targets, ping.run(), ping.errors):
+                results[i] = probes[i]._evaluate(host, error)
+        return results
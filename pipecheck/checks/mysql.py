@@ -1,3 +1,5 @@
+import threading
+import time
 from typing import Optional
 
 import pymysql
@@ -5,6 +7,49 @@ import pymysql
 from pipecheck.api import CheckResult, Err, Ok, Probe
 
 
+class ConnectionPool:
+    """
+    Idle MySQL connections kept per (host, port, user, password, database) for persistent checks.
+    At most `pool_size` idle connections are kept per key, connections idle for longer than `idle` seconds are closed.
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, idle=300):
+        now = time.monotonic()
+        with self._lock:
+            connections = self._idle.get(key, [])
+            while connections:
+                (connection, last_used) = connections.pop()
+                if now - last_used < idle:
+                    return connection
+                connection.close()
+        return None
+
+    def release(self, key, connection, pool_size=2):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < pool_size:
+                connections.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def __len__(self):
+        return sum(len(c) for c in self._idle.values())
+
+    def clear(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection, _ in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+connections = ConnectionPool()
+
+
 class MysqlProbe(Probe):
     """Try MySQL Connection to given host and port using given user and password"""
 
@@ -13,22 +58,86 @@ class MysqlProbe(Probe):
     database: Optional[str] = None
     user: str = ""
     password: str = ""
-    timeout: int = 5
+    timeout: float = 5
+    mysql_persistent: bool = False
+    mysql_pool_size: int = 2
+    mysql_pool_idle: int = 300
+    mysql_query: Optional[str] = None
 
-    def __call__(self) -> CheckResult:
+    def _key(self):
+        return (self.host, int(self.port), self.user, self.password, self.database)
+
+    def _connect(self):
         connection = pymysql.connect(
             host=self.host,
-            port=self.port,
+            port=int(self.port),
             user=self.user,
             password=self.password,
             database=self.database,
             connect_timeout=self.timeout,
+            read_timeout=self.timeout,
+            write_timeout=self.timeout,
             defer_connect=True,
         )
         try:
             connection.connect()
-            return Ok(f"MySQL connection successfully established to port {self.port} on {self.host}")
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _check(self, connection):
+        # liveness check on an open connection: COM_PING, or the configured (cheap) query
+        if self.mysql_query is None:
+            connection.ping(reconnect=False)
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(self.mysql_query)
+                cursor.fetchall()
+
+    def _connect_and_check(self):
+        start = time.monotonic()
+        connection = self._connect()
+        connected = time.monotonic()
+        try:
+            if self.mysql_persistent or self.mysql_query is not None:
+                self._check(connection)
+        except Exception:
+            connection.close()
+            raise
+        return connection, (connected - start) * 1000, (time.monotonic() - connected) * 1000
+
+    def _reuse_and_check(self):
+        connection = connections.acquire(self._key(), self.mysql_pool_idle)
+        if connection is None:
+            return self._connect_and_check()
+        start = time.monotonic()
+        try:
+            self._check(connection)
+        except Exception:
+            # stale pooled connection (server restart, wait_timeout, ...), reconnect once
+            connection.close()
+            return self._connect_and_check()
+        return connection, None, (time.monotonic() - start) * 1000
+
+    def _ok(self, connect_ms, query_ms):
+        timings = ["reused connection" if connect_ms is None else f"connect {connect_ms:.3f}ms"]
+        phases = {} if connect_ms is None else {"connect": connect_ms / 1000}
+        if self.mysql_persistent or self.mysql_query is not None:
+            timings.append(f"query {query_ms:.3f}ms")
+            phases["query"] = query_ms / 1000
+        return Ok(
+            f"MySQL connection successfully established to port {self.port} on {self.host} ({', '.join(timings)})", phases
+        )
+
+    def __call__(self) -> CheckResult:
+        try:
+            if not self.mysql_persistent:
+                connection, connect_ms, query_ms = self._connect_and_check()
+                connection.close()
+                return self._ok(connect_ms, query_ms)
+            connection, connect_ms, query_ms = self._reuse_and_check()
+            connections.release(self._key(), connection, int(self.mysql_pool_size))
+            return self._ok(connect_ms, query_ms)
         except Exception as e:
             return Err(f"MySQL connection failed on port {self.port} for {self.host} ({e})")
-        finally:
-            connection.close()
@@ -1,23 +1,223 @@
+import concurrent.futures
+import errno
+import heapq
+import selectors
 import socket
+import time
 
 from pipecheck.api import CheckResult, Err, Ok, Probe
 
+CONNECTING = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+MAX_INFLIGHT = 512
+FALLBACK_DELAY = 0.25  # seconds, as recommended by RFC 8305
+
+
+def _interleave(infos):
+    # happy eyeballs (RFC 8305): alternate address families, starting with the first one returned
+    families = {}
+    for info in infos:
+        families.setdefault(info[0], []).append(info)
+    queues = list(families.values())
+    ordered = []
+    while any(queues):
+        for q in queues:
+            if q:
+                ordered.append(q.pop(0))
+    return ordered
+
+
+class TcpSweep:
+    """
+    Connects to many targets with non-blocking sockets on one selector.
+    At most `max_inflight` sockets are open at once. Each target tries its addresses happy-eyeballs style,
+    starting the next address after `fallback_delay` or as soon as the previous attempt failed.
+    Returns (latency in ms or None, error or None) per target.
+    """
+
+    def __init__(self, targets, max_inflight=MAX_INFLIGHT, fallback_delay=FALLBACK_DELAY):
+        # targets: (addrinfo list, timeout) tuples
+        if max_inflight < 1:
+            raise ValueError(f"expected at least 1 socket in flight, got {max_inflight}")
+        self.targets = targets
+        self.max_inflight = max_inflight
+        self.fallback_delay = fallback_delay
+        self.results = [None] * len(targets)
+        self._pending = [list(infos) for infos, _ in targets]
+        self._attempts = [[] for _ in targets]
+        self._errors = [None] * len(targets)
+        self._started = [0.0] * len(targets)
+        self._timers = []
+        self._inflight = 0
+        self._done = 0
+        self._selector = None
+
+    def _finish(self, k, now, error=None):
+        for sock in self._attempts[k]:
+            self._close(sock)
+        self._attempts[k] = []
+        self._pending[k] = []
+        latency = None if error else (now - self._started[k]) * 1000
+        self.results[k] = (latency, error)
+        self._done += 1
+
+    def _close(self, sock):
+        self._selector.unregister(sock)
+        sock.close()
+        self._inflight -= 1
+
+    def _attempt(self, k, now):
+        (family, type, proto, _, address) = self._pending[k].pop(0)
+        try:
+            sock = socket.socket(family, type, proto)
+        except OSError as e:
+            return self._failed(k, now, e)
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_WRITE, k)
+        self._inflight += 1
+        self._attempts[k].append(sock)
+        code = sock.connect_ex(address)
+        if code == 0:
+            return self._finish(k, now)
+        if code not in CONNECTING:
+            self._attempts[k].remove(sock)
+            self._close(sock)
+            return self._failed(k, now, OSError(code, errno.errorcode.get(code, "connect failed")))
+        if self._pending[k]:
+            heapq.heappush(self._timers, (now + self.fallback_delay, k, len(self._pending[k])))
+
+    def _failed(self, k, now, error):
+        self._errors[k] = error
+        if self._pending[k]:
+            self._attempt(k, now)
+        elif not self._attempts[k]:
+            self._finish(k, now, error)
+
+    def _start(self, k, now):
+        self._started[k] = now
+        if not self._pending[k]:
+            return self._finish(k, now, "no address")
+        heapq.heappush(self._timers, (now + float(self.targets[k][1]), k, -1))
+        self._attempt(k, now)
+
+    def _ready(self, sock, k, now):
+        code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if code == 0:
+            return self._finish(k, now)
+        self._attempts[k].remove(sock)
+        self._close(sock)
+        self._failed(k, now, OSError(code, errno.errorcode.get(code, "connect failed")))
+
+    def _timer(self, k, remaining, now):
+        if self.results[k] is not None:
+            return
+        if remaining < 0:
+            self._finish(k, now, "timed out")
+        elif len(self._pending[k]) == remaining:
+            self._attempt(k, now)
+
+    def run(self):
+        queued = iter(range(len(self.targets)))
+        waiting = len(self.targets)
+        self._selector = selectors.DefaultSelector()
+        try:
+            while True:
+                now = time.monotonic()
+                while self._inflight < self.max_inflight and waiting > 0:
+                    self._start(next(queued), now)
+                    waiting -= 1
+                while self._timers and self._timers[0][0] <= now:
+                    (_, k, remaining) = heapq.heappop(self._timers)
+                    self._timer(k, remaining, now)
+                if self._done == len(self.targets):
+                    break
+                # finished targets leave stale timers behind, they are skipped when popped
+                timeout = max(0.0, self._timers[0][0] - now) if self._timers else None
+                for key, _ in self._selector.select(timeout):
+                    if self.results[key.data] is None:
+                        self._ready(key.fileobj, key.data, time.monotonic())
+        finally:
+            for attempts in self._attempts:
+                for sock in attempts:
+                    sock.close()
+            self._selector.close()
+        return self.results
+
 
 class TcpProbe(Probe):
     """Try simple TCP handshake on given host and port (e.g. 8.8.8.8:53)"""
 
     host: str = ""
     port: int = 0
-    tcp_timeout: int = 5
+    tcp_timeout: float = 5
+
+    def _ok(self, latency):
+        return Ok(
+            f"TCP connection successfully established to port {self.port} on {self.host} ({latency:.3f}ms)",
+            {"connect": latency / 1000},
+        )
+
+    def _err(self, e):
+        return Err(f"TCP connection failed on port {self.port} for {self.host} ({e})")
+
+    def _addresses(self, infos):
+        # host addresses are resolved once for all ports, the port of the probe goes into each socket address
+        return [
+            (family, type, proto, name, (address[0], self.port) + address[2:]) for family, type, proto, name, address in infos
+        ]
+
+    @staticmethod
+    def _resolve(host):
+        try:
+            return _interleave(socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+        except Exception as e:
+            return e
+
+    @classmethod
+    def _resolve_all(cls, hosts):
+        hosts = list(hosts)
+        if len(hosts) < 2:
+            return {host: cls._resolve(host) for host in hosts}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(hosts))) as executor:
+            return dict(zip(hosts, executor.map(cls._resolve, hosts)))
 
     def __call__(self) -> CheckResult:
-        s = socket.socket()
-        s.settimeout(self.tcp_timeout)
+        # a single check connects directly, the sweep pays off for batches
+        start = time.monotonic()
+        try:
+            socket.create_connection((self.host, self.port), timeout=float(self.tcp_timeout)).close()
+        except Exception as e:
+            return self._err(e)
+        return self._ok((time.monotonic() - start) * 1000)
+
+    async def acall(self) -> CheckResult:
+        import asyncio
 
+        start = time.monotonic()
         try:
-            s.connect((self.host, self.port))
-            return Ok(f"TCP connection successfully established to port {self.port} on {self.host}")
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, happy_eyeballs_delay=FALLBACK_DELAY),
+                self.tcp_timeout,
+            )
+        except asyncio.TimeoutError:
+            return self._err("timed out")
         except Exception as e:
-            return Err(f"TCP connection failed on port {self.port} for {self.host} ({e})")
-        finally:
-            s.close()
+            return self._err(e)
+        writer.close()
+        return self._ok((time.monotonic() - start) * 1000)
+
+    @classmethod
+    def execute_many(cls, probes, max_inflight=MAX_INFLIGHT, fallback_delay=FALLBACK_DELAY):
+        results = [None] * len(probes)
+        resolved = cls._resolve_all({probe.host for probe in probes})
+        targets = []
+        for i, probe in enumerate(probes):
+            infos = resolved[probe.host]
+            if isinstance(infos, Exception):
+                results[i] = probe._err(infos)
+            else:
+                targets.append((i, probe._addresses(infos)))
+
+        sweep = TcpSweep([(infos, probes[i].tcp_timeout) for i, infos in targets], max_inflight, fallback_delay)
+        for (i, _), (latency, error) in zip(targets, sweep.run()):
+            results[i] = probes[i]._err(error) if error else probes[i]._ok(latency)
+        return results
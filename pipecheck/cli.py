@@ -1,9 +1,16 @@
 import argparse
+import sys
 from urllib.parse import urlparse
 
 from pipecheck import __version__
 from pipecheck.checks import probes
 from pipecheck.cli_backport import BooleanOptionalAction
+from pipecheck.engine import engines
+from pipecheck.metrics import URL_MODES
+from pipecheck.output import OUTPUT_FORMATS
+
+# names of pipecheck.resolver.resolvers, listed here so parsing arguments doesn't import asyncio
+RESOLVERS = ["system", "dns"]
 
 
 def parse_args(args=None):
@@ -15,12 +22,36 @@ def parse_args(args=None):
 
     parser.add_argument("-M", "--no-color", action=BooleanOptionalAction, help="disable output colorization")
 
+    parser.add_argument(
+        "-o",
+        "--output",
+        nargs="?",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="sets the output format. 'jsonl' writes a JSON object per result and a summary (default: %(default)s)",
+    )
+
     parser.add_argument("--version", action="version", version="pipecheck {version}".format(version=__version__))
 
     parser.add_argument("-f", "--file", nargs="?", type=str, help="provide a yaml file as configuration")
 
     parser.add_argument("--tcp-timeout", nargs="?", type=float, default=2.0, help="sets the tcp timeout in seconds (e.g 10.5)")
 
+    parser.add_argument(
+        "--tcp-inflight",
+        nargs="?",
+        type=at_least_one,
+        help="limits the open connection attempts of a batched TCP sweep (default: 512)",
+    )
+
+    parser.add_argument(
+        "--tcp-fallback-delay",
+        nargs="?",
+        type=float,
+        help="seconds before the next address of a dual-stack host is tried in parallel by a batched TCP sweep "
+        + "(default: 0.25)",
+    )
+
     parser.add_argument("--http-status", nargs="*", type=int, help="sets acceptable HTTP status-codes (e.g 200 301 405)")
 
     parser.add_argument(
@@ -29,8 +60,74 @@ def parse_args(args=None):
 
     parser.add_argument("--http-timeout", nargs="?", type=int, help="sets the tcp timeout in seconds (e.g 2)")
 
+    parser.add_argument(
+        "--http-keepalive",
+        action=BooleanOptionalAction,
+        help="reuse pooled HTTP connections across runs. Disable to measure every handshake",
+    )
+
+    parser.add_argument("--http-pool-size", nargs="?", type=int, help="sets the max. pooled HTTP connections per host")
+
+    parser.add_argument(
+        "--http-pool-idle", nargs="?", type=int, help="sets the seconds after which unused HTTP connections are closed"
+    )
+
+    parser.add_argument(
+        "--http-stream",
+        action=BooleanOptionalAction,
+        help="read HTTP bodies in chunks and stop as soon as all content checks are decided",
+    )
+
+    parser.add_argument(
+        "--max-body-bytes",
+        nargs="?",
+        type=at_least_one,
+        help="sets the max. bytes of a HTTP body read in stream mode (e.g 65536)",
+    )
+
+    parser.add_argument(
+        "--resolver",
+        nargs="?",
+        choices=RESOLVERS,
+        help="sets the DNS resolver. 'dns' queries the nameserver directly (default: system)",
+    )
+
+    parser.add_argument(
+        "--nameserver", nargs="?", help="sets the nameserver used by DNS checks (e.g 1.1.1.1:53). Implies '--resolver dns'"
+    )
+
+    parser.add_argument("--dns-timeout", nargs="?", type=float, help="sets the DNS query timeout in seconds (e.g 2.0)")
+
+    parser.add_argument("--dns-tcp", action=BooleanOptionalAction, help="send DNS queries over TCP instead of UDP")
+
+    parser.add_argument(
+        "--mysql-persistent", action=BooleanOptionalAction, help="keep MySQL connections open and reuse them across runs"
+    )
+
+    parser.add_argument("--mysql-pool-size", nargs="?", type=int, help="sets the idle MySQL connections kept per target")
+
+    parser.add_argument(
+        "--mysql-pool-idle", nargs="?", type=int, help="sets the seconds after which unused MySQL connections are closed"
+    )
+
+    parser.add_argument(
+        "--mysql-query", nargs="?", type=str, help="query used as MySQL liveness check instead of ping (e.g 'SELECT 1')"
+    )
+
     parser.add_argument("--ping-count", nargs="?", default=1, help="sets the amount of ICMP ping requests sent")
 
+    parser.add_argument("--ping-interval", nargs="?", type=float, help="sets the seconds between ICMP ping requests")
+
+    parser.add_argument("--ping-timeout", nargs="?", type=float, help="sets the seconds to wait for an ICMP echo reply")
+
+    parser.add_argument(
+        "--ping-rate", nargs="?", type=float, help="limits the ICMP requests per second sent by a batch (see --batch)"
+    )
+
+    parser.add_argument(
+        "--ping-privileged", action=BooleanOptionalAction, help="use raw ICMP sockets (requires root/CAP_NET_RAW)"
+    )
+
     parser.add_argument("--ca-certs", nargs="?", help="sets path to custom ca-bundle. If not set bundled Root-CAs are used.")
 
     parser.add_argument(
@@ -46,14 +143,241 @@ def parse_args(args=None):
         help="don't exit but repeat checks in given interval. Also activates prometheus exporter",
     )
 
+    parser.add_argument(
+        "--fail-fast",
+        action=BooleanOptionalAction,
+        help="exit on the first failed check, cancelling the outstanding ones (ignored in interval mode)",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        nargs="?",
+        type=float,
+        metavar="SECONDS",
+        help="bounds the total run time, unfinished checks fail and probe timeouts are capped to the time left "
+        + "(ignored in interval mode)",
+    )
+
+    parser.add_argument(
+        "--wait",
+        nargs="?",
+        type=float,
+        const=0,
+        metavar="SECONDS",
+        help="re-runs failing checks until all pass, giving up after SECONDS (without a value: no time limit)",
+    )
+
+    parser.add_argument(
+        "--wait-backoff",
+        nargs="?",
+        type=float,
+        help="seconds before the first retry in wait mode, doubled on every attempt (default: 1)",
+    )
+
+    parser.add_argument(
+        "--wait-max-backoff", nargs="?", type=float, help="max. seconds between two attempts in wait mode (default: 30)"
+    )
+
+    parser.add_argument(
+        "--jitter",
+        nargs="?",
+        type=float,
+        default=1.0,
+        help="spreads the first run of each check over this fraction of its interval (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--reload-interval",
+        nargs="?",
+        type=float,
+        default=2.0,
+        help="seconds between checks of the command file for changes in interval mode, 0 to reload on SIGHUP only "
+        + "(default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--push",
+        nargs="?",
+        metavar="URL",
+        help="pushes all results to a pipecheck aggregator (e.g http://aggregator:9000)",
+    )
+
+    parser.add_argument(
+        "--vantage", nargs="?", help="name of this agent in the results pushed to an aggregator (default: hostname)"
+    )
+
+    parser.add_argument(
+        "--aggregate",
+        action=BooleanOptionalAction,
+        help="runs as aggregator: accepts results pushed by agents and exports them per target and vantage point "
+        + "on the prometheus port",
+    )
+
+    parser.add_argument(
+        "--quorum",
+        nargs="?",
+        type=int,
+        help="vantage points which must see a target fail for it to be down (default: a majority)",
+    )
+
+    parser.add_argument(
+        "--vantage-ttl",
+        nargs="?",
+        type=float,
+        help="seconds after which the results of a vantage point which stopped pushing are dropped (default: 120)",
+    )
+
+    parser.add_argument(
+        "--shards",
+        nargs="?",
+        type=int,
+        help="splits the checks between this many replicas, each running only its own shard (e.g 3)",
+    )
+
+    parser.add_argument(
+        "--shard-index",
+        nargs="?",
+        type=int,
+        help="shard of this replica, 0 to shards-1 (default: PIPECHECK_SHARD_INDEX, required with --shards)",
+    )
+
     parser.add_argument("-p", "--prom-port", nargs="?", default=9000, type=int, help="promtheus exporter port")
 
-    for probe in probes:
-        parser.add_argument("--%s" % probes[probe].get_type(), nargs="*", help=probes[probe].get_help())
+    parser.add_argument(
+        "--histogram-buckets",
+        nargs="*",
+        type=float,
+        metavar="SECONDS",
+        help="sets the buckets of the check duration histograms (e.g 0.01 0.1 1 10)",
+    )
+
+    parser.add_argument(
+        "--metric-labels",
+        nargs="*",
+        metavar="LABEL",
+        help="sets the check arguments exported as metric labels (default: url host port name)",
+    )
+
+    parser.add_argument(
+        "--metric-url",
+        nargs="?",
+        choices=URL_MODES,
+        help="exports urls in full, without query ('path') or only scheme and host ('host') (default: full)",
+    )
+
+    parser.add_argument(
+        "--metric-max-label-length",
+        nargs="?",
+        type=int,
+        help="label values longer than this are shortened to a prefix and a hash (default: 128)",
+    )
+
+    parser.add_argument(
+        "--metric-max-series",
+        nargs="?",
+        type=int,
+        help="limits the label sets per check type, further checks share one overflow series (default: 1000)",
+    )
+
+    parser.add_argument(
+        "--metric-ttl", nargs="?", type=float, help="removes series of checks not reported for this many seconds"
+    )
+
+    parser.add_argument(
+        "-e",
+        "--engine",
+        nargs="?",
+        choices=list(engines),
+        default="thread",
+        help="sets the execution engine. 'async' runs all probes on one event loop, those without a coroutine (http, mysql) "
+        + "on up to 100 threads (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        nargs="?",
+        type=int,
+        help="limits the number of probes in flight (default: 10 for thread, 1000 for async engine)",
+    )
+
+    parser.add_argument(
+        "--batch",
+        nargs="*",
+        metavar="TYPE",
+        help="runs due checks of these types together (e.g. all pings over one socket). Without types all supported",
+    )
+
+    parser.add_argument(
+        "--coalesce",
+        action=BooleanOptionalAction,
+        default=True,
+        help="runs identical checks (same type and arguments) once and reports the result for each (default: on)",
+    )
+
+    parser.add_argument(
+        "--result-ttl",
+        nargs="?",
+        type=float,
+        metavar="SECONDS",
+        help="reuses the result of a coalesced check for this many seconds instead of probing again",
+    )
+
+    parser.add_argument("--host-concurrency", nargs="?", type=int, help="limits the checks in flight per target host (e.g 5)")
+
+    parser.add_argument(
+        "--host-rate", nargs="?", type=float, help="limits the checks started per second per target host (e.g 20)"
+    )
+
+    parser.add_argument(
+        "--type-concurrency",
+        nargs="*",
+        type=type_limit,
+        metavar="TYPE=N",
+        help="limits the checks in flight per check type (e.g http=20 mysql=2)",
+    )
+
+    parser.add_argument(
+        "--type-rate",
+        nargs="*",
+        type=type_limit,
+        metavar="TYPE=N",
+        help="limits the checks started per second per check type (e.g http=50)",
+    )
+
+    parser.add_argument(
+        "--rate-burst",
+        nargs="?",
+        type=float,
+        help="checks a rate limit lets start at once after being idle (default: 1)",
+    )
+
+    # a plugin named like an option would conflict with it on the command line and in the parsed arguments
+    probes.reserved.update(a.dest for a in parser._actions)
+    probes.reserved.update(s.lstrip("-") for a in parser._actions for s in a.option_strings)
+    types = list(probes)
+    add_check_arguments(parser, types)
+    if needs_plugins(parser, sys.argv[1:] if args is None else args):
+        probes.load_plugins()
+        add_check_arguments(parser, [t for t in probes if t not in types])
 
     return vars(parser.parse_args(args=args))
 
 
+def add_check_arguments(parser, types):
+    for probe in types:
+        # help of plugins isn't known without importing them
+        help = probes[probe].help or f"check provided by the plugin {probes[probe].path}"
+        parser.add_argument("--%s" % probes[probe].get_type(), dest=probe, nargs="*", help=help)
+
+
+def needs_plugins(parser, args):
+    # plugins are looked up for options which aren't known without them, and to list their types in --help
+    return any(
+        a in ("-h", "--help") or a.startswith("--") and a.split("=")[0] not in parser._option_string_actions for a in args
+    )
+
+
 def parse_dns(x):
     if "=" in x:
         (hostname, target) = x.split("=")
@@ -68,8 +392,8 @@ def parse_dns(x):
 
 
 def parse_tcp(x):
-    (host, port) = x.split(":")
-    return {"type": "tcp", "host": host, "port": int(port)}
+    (host, _, port) = x.rpartition(":")
+    return {"type": "tcp", "host": host.strip("[]"), "port": int(port)}
 
 
 def parse_mysql(x):
@@ -99,11 +423,30 @@ def parse_ping(x):
     return {"type": "ping", "host": x}
 
 
+# command line targets of the built-in probes, plugins parse theirs with Probe.parse()
+PARSERS = {"dns": parse_dns, "tcp": parse_tcp, "mysql": parse_mysql, "http": parse_http, "ping": parse_ping}
+
+
+def type_limit(x):
+    (type, _, value) = x.partition("=")
+    if type not in probes or not value:
+        raise argparse.ArgumentTypeError(f"expected TYPE=N with a check type ({', '.join(probes)}), got '{x}'")
+    return (type, float(value))
+
+
+def at_least_one(x):
+    if int(x) < 1:
+        raise argparse.ArgumentTypeError(f"expected at least 1, got {x}")
+    return int(x)
+
+
 def get_commands_and_config_from_args(args: dict):
     commands = []
-    for k, v in args.items():
-        if v is None or k not in probes:
+    # only registered types, a lookup of every argument would load the plugins
+    for k in list(probes):
+        if args.get(k) is None:
             continue
-        for param in v:
-            commands.append(globals()[f"parse_{k}"](param))
+        parse = PARSERS.get(k, probes[k].parse)
+        for param in args[k]:
+            commands.append(parse(param))
     return (commands, args)
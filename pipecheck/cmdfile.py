@@ -1,11 +1,101 @@
 import sys
 
-import yaml
+from pipecheck.checks import probes
+
+# yaml is imported on first load, so the check extraction can be used without it
+
+
+class ConfigError(ValueError):
+    """Invalid checks in a command file, with all errors found and their YAML paths"""
+
+    def __init__(self, source, errors):
+        self.errors = list(errors)
+        super().__init__(f"{len(self.errors)} invalid checks in {source}:\n" + "\n".join(f"  {e}" for e in self.errors))
+
+
+def _get_loader():
+    import yaml
+
+    # the libyaml based loader is several times faster than the pure python one
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _open(filepath):
+    return sys.stdin if filepath == "-" else open(filepath, "r")
 
 
 def get_config_from_yamlfile(filepath):
-    if filepath == "-":
-        return yaml.load(sys.stdin, Loader=yaml.FullLoader)
+    import yaml
+
+    stream = _open(filepath)
+    try:
+        return yaml.load(stream, Loader=_get_loader())
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_documents(filepath):
+    """Yields the documents of a (multi-document) YAML file one by one"""
+    import yaml
+
+    stream = _open(filepath)
+    try:
+        yield from yaml.load_all(stream, Loader=_get_loader())
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def iter_checks(config, prefix=()):
+    """
+    Yields (path, check) of the checks in a config, in document order: a check is a mapping with a `type`, nested
+    mappings of a check are not part of it. Walks the document with a stack instead of recursion.
+    """
+    stack = [(config, tuple(prefix))]
+    while stack:
+        (x, path) = stack.pop()
+        if isinstance(x, dict):
+            if "type" in x:
+                yield (path, {k: v for k, v in x.items() if not isinstance(v, dict)})
+            else:
+                stack.extend((x[key], path + (str(key),)) for key in reversed(list(x)))
+        elif isinstance(x, list):
+            stack.extend((x[i], path + (str(i),)) for i in reversed(range(len(x))))
+
+
+def get_check_id(path, check):
+    # the path of keys leading to the check (e.g. 'a.a1.check1') unless it sets an id
+    return check.get("id", ".".join(path) or None)
+
+
+def validate_check(check, options=()):
+    """Returns the errors of a check: unknown type, arguments not known to its probe or not of their field's type"""
+    if check["type"] not in probes:
+        return [f"unknown check type '{check['type']}' (one of {', '.join(probes)})"]
+    known = set(probes[check["type"]].get_args()) | set(options) | {"type"}
+    unknown = [f"unknown argument '{k}' of {check['type']} check" for k in check if k not in known]
+    return unknown + probes[check["type"]].validate(check)
+
+
+def get_checks_from_yamlfile(filepath, options=()):
+    """
+    Returns (id, check) of all checks in a (multi-document) YAML file. Checks of the n-th document (n > 0) get ids
+    prefixed with 'n.'. Every check is validated against the arguments of its probe (and `options`), all errors are
+    raised at once as ConfigError.
+    """
+    import yaml
 
-    with open(filepath, "r") as yaml_file:
-        return yaml.load(yaml_file, Loader=yaml.FullLoader)
+    checks = []
+    errors = []
+    try:
+        for n, document in enumerate(load_documents(filepath)):
+            for path, check in iter_checks(document, prefix=(str(n),) if n else ()):
+                where = ".".join(path) or "<root>"
+                errors.extend(f"{where}: {e}" for e in validate_check(check, options))
+                checks.append((get_check_id(path, check), check))
+    except yaml.YAMLError as e:
+        errors.append(str(e).replace("\n", " "))
+    if errors:
+        raise ConfigError(filepath, errors)
+    return checks
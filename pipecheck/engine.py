@@ -0,0 +1,305 @@
+import concurrent.futures
+import copy
+import inspect
+import queue
+import threading
+import time
+
+from pipecheck.api import Call, Err, Probe
+from pipecheck.graph import CheckGraph
+
+
+def _failed(call, e):
+    return Err(f"{call[1]} check failed ({e.__class__.__name__}: {e})")
+
+
+def _timed(results, start):
+    # batched probes share the duration of their batch, unless the probe set one itself
+    elapsed = time.perf_counter() - start
+    for result in results:
+        if result.duration is None:
+            result.duration = elapsed
+    return results
+
+
+def _reused(result):
+    # a result shared by several calls is measured once, the others get a copy without timings
+    result = copy.copy(result)
+    result.duration = None
+    result.phases = {}
+    return result
+
+
+class Engine:
+    """
+    Runs probe calls. submit() returns a concurrent.futures.Future per call, execute() yields
+    (call, result) pairs as soon as they complete, starting calls with `depends_on` once their dependencies
+    succeeded and skipping them otherwise (see pipecheck.graph). Engines can be used as context manager to keep
+    their workers alive across several runs.
+    Calls of the probe types in `batch` (an empty collection means all types supporting it) are grouped and
+    handed to Probe.execute_many() at once, None disables batching. Probe.prepare() is called once per probe class
+    with the probes of every submit_many().
+    With `coalesce` calls with equal probe keys (same type and arguments) share one execution while it is in
+    flight, and for `result_ttl` seconds after it completed. Every call still gets its own future, only the first
+    call of an execution gets its result with duration and phases.
+    Batches get the keyword arguments in `batch_options` for their type, e.g. {"tcp": {"max_inflight": 100}}.
+    Calls are held back by `limits` (pipecheck.limits.Limits) until their target host and type admit them, calls with
+    a limit aren't batched but submitted one by one.
+    execute() gives up after `timeout` seconds, reporting the unfinished calls as Err and capping the probe timeouts
+    to the time left. Calls still running when execute() is left early are cancelled or, if already running,
+    abandoned: engines don't wait for them when stopped.
+    """
+
+    concurrency: int = 10
+    abandoned: bool = False
+
+    def __init__(self, concurrency=None, batch=None, coalesce=False, result_ttl=None, limits=None, batch_options=None):
+        if concurrency:
+            self.concurrency = concurrency
+        self.batch = None if batch is None else set(batch)
+        self.batch_options = batch_options or {}
+        self.coalesce = coalesce
+        self.result_ttl = result_ttl
+        self.limits = limits
+        self._users = 0
+        self._lock = threading.Lock()
+        self._shared_lock = threading.Lock()
+        self._inflight = {}  # probe key -> future
+        self._results = {}  # probe key -> (expiry, result)
+        self._next_prune = 0.0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def submit(self, call) -> concurrent.futures.Future:
+        raise NotImplementedError()
+
+    def submit_batch(self, cls, probes, options=None) -> concurrent.futures.Future:
+        raise NotImplementedError()
+
+    def _batches(self, call):
+        if self.batch is None or (self.batch and call[1] not in self.batch) or not type(call[0]).can_batch():
+            return False
+        # a batch runs as one call, its checks couldn't be held back one by one
+        return self.limits is None or not self.limits.applies(call)
+
+    @staticmethod
+    def _fan_out(calls, future):
+        futures = [concurrent.futures.Future() for _ in calls]
+
+        def done(f):
+            if f.cancelled():
+                for child in futures:
+                    child.cancel()
+                return
+            try:
+                results = f.result()
+                if len(results) != len(calls):
+                    raise ValueError(f"got {len(results)} results for {len(calls)} probes")
+            except Exception as e:
+                results = [_failed(call, e) for call in calls]
+            for child, result in zip(futures, results):
+                child.set_running_or_notify_cancel()
+                child.set_result(result)
+
+        future.add_done_callback(done)
+        return futures
+
+    @staticmethod
+    def _prepare(calls):
+        # Probe.prepare() once per probe class, the calls of a class whose preparation raised fail right away
+        classes = {}
+        for i, call in enumerate(calls):
+            if type(call[0]).prepare.__func__ is not Probe.prepare.__func__:
+                classes.setdefault(type(call[0]), []).append(i)
+        failed = {}
+        for cls, indexes in classes.items():
+            try:
+                cls.prepare([calls[i][0] for i in indexes])
+            except Exception as e:
+                for i in indexes:
+                    failed[i] = concurrent.futures.Future()
+                    failed[i].set_result(_failed(calls[i], e))
+        return failed
+
+    def _submit_many(self, calls):
+        futures = self._prepare(calls)
+        groups = {}
+        for i, call in enumerate(calls):
+            if i in futures:
+                continue
+            if self._batches(call):
+                groups.setdefault((type(call[0]), call[1]), []).append(i)
+            elif self.limits is not None:
+                futures[i] = self.limits.submit(call, self.submit)
+            else:
+                futures[i] = self.submit(call)
+        for (cls, type_), indexes in groups.items():
+            batch = [calls[i] for i in indexes]
+            future = self.submit_batch(cls, [call[0] for call in batch], self.batch_options.get(type_))
+            futures.update(zip(indexes, self._fan_out(batch, future)))
+        return [futures[i] for i in range(len(calls))]
+
+    @staticmethod
+    def _follow(future, reused=False):
+        child = concurrent.futures.Future()
+
+        def done(f):
+            if f.cancelled():
+                child.cancel()
+                return
+            child.set_running_or_notify_cancel()
+            if f.exception() is not None:
+                child.set_exception(f.exception())
+            elif reused:
+                child.set_result(_reused(f.result()))
+            else:
+                child.set_result(f.result())
+
+        future.add_done_callback(done)
+        return child
+
+    def _settle(self, key, future):
+        with self._shared_lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if self.result_ttl and not future.cancelled() and future.exception() is None:
+                self._results[key] = (time.monotonic() + self.result_ttl, future.result())
+
+    def _cached(self, key, now):
+        if now >= self._next_prune:
+            # results of checks which aren't submitted anymore would never be replaced
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            self._next_prune = now + (self.result_ttl or 0)
+        if key in self._results and self._results[key][0] > now:
+            future = concurrent.futures.Future()
+            future.set_result(self._results[key][1])
+            return future
+        return self._inflight.get(key)
+
+    def submit_many(self, calls) -> list:
+        if not self.coalesce:
+            return self._submit_many(calls)
+        keys = [Call(*call).get_probe_key() for call in calls]
+        shared = {}
+        launch = {}
+        with self._shared_lock:
+            now = time.monotonic()
+            for key, call in zip(keys, calls):
+                if key not in shared and key not in launch:
+                    future = self._cached(key, now)
+                    if future is None:
+                        launch[key] = call
+                    else:
+                        shared[key] = future
+            started = dict(zip(launch, self._submit_many(list(launch.values()))))
+            self._inflight.update(started)
+            shared.update(started)
+        for key, future in started.items():
+            future.add_done_callback(lambda f, key=key: self._settle(key, f))
+        followers = []
+        measured = set(started)
+        for key in keys:
+            followers.append(self._follow(shared[key], reused=key not in measured))
+            measured.discard(key)
+        return followers
+
+    def __enter__(self):
+        with self._lock:
+            if self._users == 0:
+                self.abandoned = False
+                self.start()
+            self._users += 1
+        return self
+
+    def __exit__(self, *_):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                self.stop()
+
+    def _launch(self, graph, indexes, done, outstanding, deadline):
+        calls = [Call(*graph.calls[i]) for i in indexes]
+        if deadline is not None:
+            # the probes run with capped copies, the configured ones are reused as they are by later runs
+            calls = [call._replace(probe=call.probe.limit_timeout(max(0.001, deadline - time.monotonic()))) for call in calls]
+        for i, future in zip(indexes, self.submit_many(calls)):
+            outstanding[i] = future
+            future.add_done_callback(lambda f, i=i: done.put((i, f)))
+
+    def _abandon(self, outstanding):
+        # left early (deadline, or the caller stopped consuming), calls still running are abandoned
+        if outstanding:
+            self.abandoned = True
+            for future in outstanding.values():
+                future.cancel()
+
+    def execute(self, calls, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self:
+            graph = CheckGraph(calls)
+            done = queue.Queue()
+            outstanding = {}
+            pending = len(graph)
+            try:
+                self._launch(graph, graph.start(), done, outstanding, deadline)
+                while pending:
+                    try:
+                        (i, future) = done.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        for k in graph.pending():
+                            yield graph.calls[k], Err(f"{graph.calls[k][1]} check aborted, deadline of {timeout}s exceeded")
+                        return
+                    del outstanding[i]
+                    result = future.result()
+                    (ready, skips) = graph.complete(i, result)
+                    self._launch(graph, ready, done, outstanding, deadline)
+                    for k, result in [(i, result)] + skips:
+                        pending -= 1
+                        yield graph.calls[k], result
+            finally:
+                self._abandon(outstanding)
+
+
+class ThreadEngine(Engine):
+    """Runs every probe on a thread pool (one blocking probe per worker)"""
+
+    _executor = None
+
+    @staticmethod
+    def _call(call):
+        start = time.perf_counter()
+        try:
+            result = call[0]()
+        except Exception as e:
+            result = _failed(call, e)
+        return _timed([result], start)[0]
+
+    @staticmethod
+    def _call_batch(cls, probes, options):
+        start = time.perf_counter()
+        results = cls.execute_many(probes, **(options or {}))
+        if inspect.iscoroutine(results):
+            import asyncio
+
+            results = asyncio.run(results)
+        return _timed(results, start)
+
+    def start(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def stop(self):
+        self._executor.shutdown(wait=not self.abandoned)
+
+    def submit(self, call):
+        return self._executor.submit(self._call, call)
+
+    def submit_batch(self, cls, probes, options=None):
+        return self._executor.submit(self._call_batch, cls, probes, options)
+
+
+# engines by name, loaded with pipecheck.api.load() when selected
+engines = {"thread": "pipecheck.engine:ThreadEngine", "async": "pipecheck.engine_async:AsyncEngine"}
@@ -0,0 +1,74 @@
+import asyncio
+import concurrent.futures
+import functools
+import threading
+import time
+
+from pipecheck.engine import Engine, _failed, _timed
+
+
+class AsyncEngine(Engine):
+    """
+    Runs all probes on one asyncio event loop. Probes without a coroutine fall back to a thread pool of `threads`
+    workers, by default as many as the concurrency allows up to `max_threads`.
+    """
+
+    concurrency: int = 1000
+    max_threads: int = 100
+    threads: int = None
+    _loop = None
+    _thread = None
+    _semaphore = None
+
+    def __init__(
+        self, concurrency=None, batch=None, coalesce=False, result_ttl=None, limits=None, batch_options=None, threads=None
+    ):
+        super().__init__(concurrency, batch, coalesce, result_ttl, limits, batch_options)
+        self.threads = threads or min(self.concurrency, self.max_threads)
+
+    async def _setup(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _call(self, call):
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                result = await call[0].acall()
+            except Exception as e:
+                result = _failed(call, e)
+            return _timed([result], start)[0]
+
+    async def _call_batch(self, cls, probes, options):
+        execute = functools.partial(cls.execute_many, probes, **(options or {}))
+        async with self._semaphore:
+            start = time.perf_counter()
+            if asyncio.iscoroutinefunction(cls.execute_many):
+                return _timed(await execute(), start)
+            return _timed(await asyncio.get_running_loop().run_in_executor(None, execute), start)
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if not self.abandoned:
+            await asyncio.get_running_loop().shutdown_default_executor()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=self.threads))
+        self._thread = threading.Thread(target=self._loop.run_forever, name="pipecheck-async", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def submit(self, call):
+        return asyncio.run_coroutine_threadsafe(self._call(call), self._loop)
+
+    def submit_batch(self, cls, probes, options=None):
+        return asyncio.run_coroutine_threadsafe(self._call_batch(cls, probes, options), self._loop)
@@ -0,0 +1,124 @@
+from pipecheck.api import Call, Err, Unk
+
+
+def failed(result):
+    return isinstance(result, (Err, Unk))
+
+
+def skipped(call, dependency):
+    return Unk(f"{call[1]} check skipped, depends on failed check '{dependency}'")
+
+
+def get_dependencies(call):
+    return (call[2].get("depends_on") or []) if len(call) > 2 else []
+
+
+def _find_cycle(dependencies):
+    # iterative depth-first search, returns the ids of the first cycle found
+    state = {}  # "open" while on the current path, "done" once all its dependencies were visited
+    for root in dependencies:
+        if root in state:
+            continue
+        state[root] = "open"
+        path = [root]
+        stack = [iter(dependencies[root])]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                state[path.pop()] = "done"
+                stack.pop()
+            elif state.get(child) == "open":
+                start = path.index(child)
+                return path[start:] + [child]
+            elif child not in state:
+                state[child] = "open"
+                path.append(child)
+                stack.append(iter(dependencies.get(child, [])))
+    return None
+
+
+def resolve_dependencies(calls):
+    """
+    Replaces the `depends_on` references of calls by check ids. A reference is a check id or a unique suffix of one
+    (e.g. 'db_dns' for 'backend.db_dns'). Raises ValueError for duplicate ids and unknown, ambiguous or cyclic references.
+    """
+    calls = [Call(*call) for call in calls]
+    ids = [str(call.options["id"]) for call in calls if call.options.get("id") is not None]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate check ids: {', '.join(duplicates)}")
+
+    def find(reference):
+        reference = str(reference)
+        matches = [i for i in ids if i == reference] or [i for i in ids if i.endswith(f".{reference}")]
+        if len(matches) != 1:
+            raise ValueError(f"{'ambiguous' if matches else 'unknown'} check '{reference}' in depends_on")
+        return matches[0]
+
+    resolved = []
+    dependencies = {}
+    for call in calls:
+        references = call.options.get("depends_on")
+        if references is not None:
+            if call.options.get("id") is None:
+                raise ValueError(f"{call.type} check with depends_on needs an id")
+            references = [references] if isinstance(references, str) else references
+            call = call._replace(options={**call.options, "depends_on": [find(r) for r in references]})
+        if call.options.get("id") is not None:
+            dependencies[str(call.options["id"])] = get_dependencies(call)
+        resolved.append(call)
+
+    cycle = _find_cycle(dependencies)
+    if cycle:
+        raise ValueError(f"cyclic depends_on: {' -> '.join(cycle)}")
+    return resolved
+
+
+class CheckGraph:
+    """
+    Order of execution of calls with dependencies: a call is ready once all its dependencies completed without
+    failing, dependents of failed (Err) or skipped calls are skipped. Dependencies not among the calls are ignored.
+    """
+
+    def __init__(self, calls):
+        self.calls = list(calls)
+        index = {str(call[2]["id"]): i for i, call in enumerate(self.calls) if len(call) > 2 and call[2].get("id") is not None}
+        self._waiting = [0] * len(self.calls)
+        self._dependents = [[] for _ in self.calls]
+        self._done = [False] * len(self.calls)
+        for i, call in enumerate(self.calls):
+            for dependency in get_dependencies(call):
+                if dependency in index:
+                    self._waiting[i] += 1
+                    self._dependents[index[dependency]].append(i)
+
+    def __len__(self):
+        return len(self.calls)
+
+    def pending(self):
+        return [i for i, done in enumerate(self._done) if not done]
+
+    def start(self):
+        return [i for i, waiting in enumerate(self._waiting) if waiting == 0]
+
+    def complete(self, i, result):
+        """Marks call i as done, returns the calls ready now and (index, result) of the calls skipped because of it"""
+        self._done[i] = True
+        ready = []
+        skips = []
+        completed = [(i, result)]
+        while completed:
+            (k, result) = completed.pop()
+            for j in self._dependents[k]:
+                if self._done[j]:
+                    continue
+                if failed(result):
+                    self._done[j] = True
+                    skip = skipped(self.calls[j], self.calls[k][2]["id"])
+                    skips.append((j, skip))
+                    completed.append((j, skip))
+                    continue
+                self._waiting[j] -= 1
+                if self._waiting[j] == 0:
+                    ready.append(j)
+        return ready, skips
@@ -0,0 +1,214 @@
+import collections
+import concurrent.futures
+import threading
+import time
+from urllib.parse import urlsplit
+
+LIMIT_OPTIONS = ["host_concurrency", "host_rate", "type_concurrency", "type_rate"]
+
+
+def get_host(call):
+    labels = call[0].get_labels()
+    if labels.get("host"):
+        return labels["host"]
+    if labels.get("url"):
+        return urlsplit(labels["url"]).hostname
+    return None
+
+
+class TokenBucket:
+    """Admits `rate` starts per second on average and up to `burst` at once"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait(self, now):
+        # seconds until the next token is available, 0 if there is one
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # tolerance for float rounding, a timer due for the next token must find it
+        return 0.0 if self.tokens >= 1 - 1e-9 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Limit:
+    def __init__(self, concurrency=None, rate=None, burst=1):
+        self.concurrency = None
+        self.bucket = None
+        self.active = 0
+        self.tighten(concurrency, rate, burst)
+
+    def tighten(self, concurrency=None, rate=None, burst=1):
+        if concurrency and (self.concurrency is None or int(concurrency) < self.concurrency):
+            self.concurrency = int(concurrency)
+        if rate and (self.bucket is None or float(rate) < self.bucket.rate):
+            self.bucket = TokenBucket(rate, burst)
+
+    def wait(self, now):
+        # None while at the concurrency cap (a finishing call makes room), else the seconds until the rate admits a start
+        if self.concurrency and self.active >= self.concurrency:
+            return None
+        return self.bucket.wait(now) if self.bucket else 0.0
+
+    def start(self):
+        self.active += 1
+        if self.bucket:
+            self.bucket.take()
+
+
+def _copy(source, target):
+    if source.cancelled():
+        target.set_exception(concurrent.futures.CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class Limits:
+    """
+    Holds calls back until the limits of their target host (`host` or the host of `url`) and probe type admit them:
+    at most `concurrency` in flight and, with a rate, starts spaced by a token bucket allowing `burst` at once.
+    Checks can set the limits of their host and type with the `host_concurrency`, `host_rate`, `type_concurrency` and
+    `type_rate` options, the strictest value applies.
+    Calls waiting for one target don't hold back calls to others.
+    """
+
+    def __init__(self, host_concurrency=None, host_rate=None, type_concurrency=None, type_rate=None, burst=1):
+        self.host_concurrency = host_concurrency
+        self.host_rate = host_rate
+        self.type_concurrency = type_concurrency or {}
+        self.type_rate = type_rate or {}
+        self.burst = burst
+        self._limits = {}  # ("host" or "type", name) -> Limit
+        self._queues = {}  # limit keys -> deque of waiting (call, submit, future)
+        self._timer = None  # (due, threading.Timer) of the next token
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _limit(self, key, concurrency, rate):
+        if key in self._limits:
+            self._limits[key].tighten(concurrency, rate, self.burst)
+        else:
+            self._limits[key] = Limit(concurrency, rate, self.burst)
+        return key
+
+    def _settings(self, call):
+        # (limit key, concurrency, rate) of the limits applying to a call
+        options = call[2] if len(call) > 2 else {}
+        settings = []
+        host = get_host(call)
+        concurrency = options.get("host_concurrency") or self.host_concurrency
+        rate = options.get("host_rate") or self.host_rate
+        if host and (concurrency or rate):
+            settings.append((("host", host), concurrency, rate))
+        concurrency = options.get("type_concurrency") or self.type_concurrency.get(call[1])
+        rate = options.get("type_rate") or self.type_rate.get(call[1])
+        if concurrency or rate:
+            settings.append((("type", call[1]), concurrency, rate))
+        return settings
+
+    def _keys(self, call):
+        return tuple(self._limit(key, concurrency, rate) for key, concurrency, rate in self._settings(call))
+
+    def applies(self, call) -> bool:
+        """Whether a host or type limit holds `call` back"""
+        return bool(self._settings(call))
+
+    def submit(self, call, submit) -> concurrent.futures.Future:
+        """Returns the future of submit(call), which is called as soon as the limits of `call` admit it"""
+        with self._lock:
+            keys = self._keys(call)
+            if keys:
+                future = concurrent.futures.Future()
+                self._queues.setdefault(keys, collections.deque()).append((call, submit, future))
+        if not keys:
+            return submit(call)
+        self._pump()
+        return future
+
+    def reset(self):
+        """
+        Forgets the limits set by the options of earlier calls, e.g. after a reload changed or removed them: the limits
+        are rebuilt from the waiting calls and the calls submitted from now on. Calls in flight stay counted.
+        """
+        with self._lock:
+            (limits, self._limits) = (self._limits, {})
+            for queue in self._queues.values():
+                for call, _, _ in queue:
+                    self._keys(call)
+            for key, limit in limits.items():
+                if limit.active:
+                    self._limits.setdefault(key, Limit(burst=self.burst)).active = limit.active
+        self._pump()
+
+    def _release(self, keys):
+        with self._lock:
+            for key in keys:
+                self._limits[key].active -= 1
+
+    def _wake(self, due, now):
+        if self._timer is not None and self._timer[0] > now:
+            if self._timer[0] <= due:
+                return
+            self._timer[1].cancel()
+        timer = threading.Timer(due - now, self._pump)
+        timer.daemon = True
+        self._timer = (due, timer)
+        timer.start()
+
+    def _admit(self):
+        started = []
+        with self._lock:
+            now = time.monotonic()
+            due = None
+            for keys in list(self._queues):
+                queue = self._queues[keys]
+                while queue:
+                    waits = [self._limits[key].wait(now) for key in keys]
+                    if None in waits:
+                        break
+                    if max(waits) > 0:
+                        due = now + max(waits) if due is None else min(due, now + max(waits))
+                        break
+                    for key in keys:
+                        self._limits[key].start()
+                    started.append((keys, queue.popleft()))
+                if not queue:
+                    del self._queues[keys]
+            if due is not None:
+                self._wake(due, now)
+        return started
+
+    def _pump(self):
+        # calls finishing while this thread starts others are picked up by the loop instead of recursing
+        if getattr(self._local, "pumping", False):
+            self._local.again = True
+            return
+        self._local.pumping = True
+        try:
+            self._local.again = True
+            while self._local.again:
+                self._local.again = False
+                for keys, (call, submit, future) in self._admit():
+                    if not future.set_running_or_notify_cancel():
+                        self._done(keys)
+                        continue
+                    submit(call).add_done_callback(lambda f, keys=keys, future=future: self._done(keys, f, future))
+        finally:
+            self._local.pumping = False
+
+    def _done(self, keys, source=None, target=None):
+        self._release(keys)
+        if source is not None:
+            _copy(source, target)
+        self._pump()
+
+    def __len__(self):
+        # calls waiting for their limits
+        return sum(len(queue) for queue in self._queues.values())
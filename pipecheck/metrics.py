@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from pipecheck.api import Call, CheckResult
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CHECK_STATE_LABLES = ["url", "host", "port", "name"]
+URL_MODES = ["full", "path", "host"]
+OVERFLOW = "__overflow__"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_state_label_names(cls):
+    return [k for k in cls.get_args() if k in CHECK_STATE_LABLES]
+
+
+def get_state_labels(call: Call):
+    labels = call[0].get_labels()
+    return {k: labels[k] for k in _get_state_label_names(type(call[0]))}
+
+
+def shorten(value, max_length):
+    value = str(value)
+    if len(value) <= max_length:
+        return value
+    digest = hashlib.sha1(value.encode()).hexdigest()[:10]
+    return f"{value[:max(0, max_length - 11)]}~{digest}"
+
+
+def group_url(url, mode):
+    if mode == "full":
+        return url
+    u = urlsplit(url)
+    return urlunsplit((u.scheme, u.netloc, u.path if mode == "path" else "", "", ""))
+
+
+class _Series:
+    """The bound metric children of one label set, so observing a result doesn't look them up again"""
+
+    __slots__ = ("labels", "state", "duration", "phases", "updated")
+
+    def __init__(self, labels, state):
+        self.labels = labels
+        self.state = state
+        self.duration = None
+        self.phases = {}
+        self.updated = None
+
+
+class CheckMetrics:
+    """
+    Prometheus metrics per check type: the state enum, a histogram of the execution duration and
+    a histogram of the phase durations reported by the probe (e.g. dns, connect, tls, first_byte).
+    Label cardinality is bounded: only `labels` are exported, urls are grouped by `url_mode`, long values are
+    shortened to a prefix and hash, and label sets beyond `max_series` per type share one overflow series.
+    Series not updated for `series_ttl` seconds, or dropped by retain(), are removed from the registry.
+    """
+
+    def __init__(
+        self,
+        probes,
+        buckets=DEFAULT_BUCKETS,
+        labels=CHECK_STATE_LABLES,
+        url_mode="full",
+        max_label_length=128,
+        max_series=1000,
+        series_ttl=None,
+        registry=None,
+    ):
+        # prometheus_client is only imported once metrics are needed (interval mode)
+        from prometheus_client import REGISTRY, Counter, Enum, Gauge, Histogram, Summary
+
+        registry = REGISTRY if registry is None else registry
+        self.url_mode = url_mode
+        self.max_label_length = max_label_length
+        self.max_series = max_series
+        self.series_ttl = series_ttl
+        self.labels = {}
+        self.states = {}
+        self.durations = {}
+        self.phases = {}
+        self._series = {}  # type -> {label values: _Series}
+        self._probe_labels = {}  # probe -> its labels
+        self._last_expire = time.monotonic()
+        self._lock = threading.Lock()
+        self.series = Gauge("pipecheck_metric_series", "Label sets exported per check type", ["type"], registry=registry)
+        self.processing = Summary(
+            "checks_processing_seconds", "Time spent dispatching checks and processing their results", registry=registry
+        )
+        self.skipped = Counter(
+            "checks_skipped", "Checks skipped because the previous run was still in progress", ["type"], registry=registry
+        )
+        for check in probes:
+            self.labels[check] = [x for x in probes[check].get_args() if x in labels]
+            self.states[check] = Enum(
+                f"{check}_check_state",
+                f"State of check {check}",
+                self.labels[check],
+                states=["Ok", "Warn", "Err", "Unk"],
+                registry=registry,
+            )
+            self.durations[check] = Histogram(
+                f"{check}_check_duration_seconds",
+                f"Duration of check {check}",
+                self.labels[check],
+                buckets=buckets,
+                registry=registry,
+            )
+            self.phases[check] = Histogram(
+                f"{check}_check_phase_duration_seconds",
+                f"Duration of the phases of check {check}",
+                self.labels[check] + ["phase"],
+                buckets=buckets,
+                registry=registry,
+            )
+            self._series[check] = {}
+
+    def get_labels(self, call: Call):
+        values = call[0].get_labels()
+        labels = {}
+        for k in self.labels[call[1]]:
+            value = group_url(values[k], self.url_mode) if k == "url" and values[k] else values[k]
+            labels[k] = shorten(value, self.max_label_length)
+        return labels
+
+    def _get_probe_labels(self, call: Call):
+        # computed once per probe, then every result of it is a dict lookup
+        labels = self._probe_labels.get(call[0])
+        if labels is None:
+            labels = self._probe_labels[call[0]] = self.get_labels(call)
+        return labels
+
+    def _track(self, check, labels, now) -> "_Series":
+        series = self._series[check]
+        key = tuple(labels.values())
+        if key not in series and len(series) >= self.max_series:
+            labels = {k: OVERFLOW for k in labels}
+            key = tuple(labels.values())
+        if key not in series:
+            series[key] = _Series(labels, self.states[check].labels(**labels))
+            self.series.labels(check).set(len(series))
+        series[key].updated = now
+        return series[key]
+
+    def _remove(self, check, key):
+        entry = self._series[check].pop(key)
+        children = [(self.states[check], key)]
+        children += [(self.durations[check], key)] if entry.duration is not None else []
+        children += [(self.phases[check], key + (phase,)) for phase in entry.phases]
+        for metric, values in children:
+            metric.remove(*values)
+        self.series.labels(check).set(len(self._series[check]))
+
+    def observe(self, call: Call, result: CheckResult):
+        now = time.monotonic()
+        check = call[1]
+        with self._lock:
+            entry = self._track(check, self._get_probe_labels(call), now)
+            entry.state.state(result.__class__.__name__)
+            if result.duration is not None:
+                if entry.duration is None:
+                    entry.duration = self.durations[check].labels(**entry.labels)
+                entry.duration.observe(result.duration)
+            for phase, seconds in result.phases.items():
+                if phase not in entry.phases:
+                    entry.phases[phase] = self.phases[check].labels(phase=phase, **entry.labels)
+                entry.phases[phase].observe(seconds)
+            if self.series_ttl and now - self._last_expire >= min(self.series_ttl, 60):
+                self._expire(now)
+
+    def _expire(self, now):
+        self._last_expire = now
+        for check, series in self._series.items():
+            for key in [k for k, entry in series.items() if now - entry.updated > self.series_ttl]:
+                self._remove(check, key)
+
+    def expire(self, now=None):
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+
+    def retain(self, calls):
+        # drops the series of all checks not in `calls` (e.g. after a config reload)
+        keep = {(call[1], tuple(self.get_labels(call).values())) for call in calls}
+        with self._lock:
+            probes = {call[0] for call in calls}
+            self._probe_labels = {probe: labels for probe, labels in self._probe_labels.items() if probe in probes}
+            for check, series in self._series.items():
+                for key in [k for k in series if k[:1] != (OVERFLOW,) and (check, k) not in keep]:
+                    self._remove(check, key)
+
+    def __len__(self):
+        return sum(len(series) for series in self._series.values())
@@ -0,0 +1,51 @@
+import datetime
+import json
+import sys
+from collections import Counter
+
+from pipecheck.api import Call, CheckResult
+from pipecheck.metrics import get_state_labels
+
+OUTPUT_FORMATS = ["text", "jsonl"]
+
+
+class JsonLinesWriter:
+    """
+    Writes a JSON object per result (check id, type, labels, status, message, duration, phases, timestamp).
+    Lines are buffered and written at once by flush(), summary() adds a line with the counts per status.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.counts = Counter()
+        self._lines = []
+
+    def write(self, call: Call, result: CheckResult):
+        status = result.__class__.__name__.lower()
+        self.counts[status] += 1
+        record = {
+            "id": call[2].get("id") if len(call) > 2 else None,
+            "type": call[1],
+            "labels": get_state_labels(call),
+            "status": status,
+            "message": result.msg,
+            "duration": result.duration,
+            "phases": result.phases,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        }
+        self._lines.append(json.dumps(record, default=str))
+
+    def summary(self, seconds=None):
+        record = {"summary": True, "checks": sum(self.counts.values())}
+        record.update({status: self.counts[status] for status in ["ok", "warn", "err", "unk"]})
+        record["seconds"] = seconds
+        self._lines.append(json.dumps(record))
+        self.counts.clear()
+
+    def flush(self):
+        if not self._lines:
+            return
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(self._lines) + "\n")
+        stream.flush()
+        self._lines = []
@@ -0,0 +1,58 @@
+import os
+import time
+
+
+class ConfigReloader:
+    """
+    Reloads the checks when the command file changes (polling its mtime every `poll_interval` seconds) or when
+    requested, e.g. by SIGHUP. `load` returns the new calls and `on_change` applies them. If loading fails the
+    error is passed to `on_error` and the current checks are kept.
+    """
+
+    def __init__(self, path, load, on_change, on_error=None, poll_interval=2.0):
+        self.path = path
+        self.load = load
+        self.on_change = on_change
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self._requested = False
+        self._next_poll = time.monotonic() + poll_interval
+        self._stat = self._get_stat()
+
+    def _get_stat(self):
+        if self.path is None or self.path == "-":
+            return None
+        try:
+            # follows symlinks, so swapped kubernetes configmap mounts are noticed as well
+            s = os.stat(self.path)
+            return (s.st_mtime_ns, s.st_size, s.st_ino)
+        except OSError:
+            return None
+
+    def request(self, *_):
+        self._requested = True
+
+    def _changed(self):
+        now = time.monotonic()
+        if not self.poll_interval or now < self._next_poll:
+            return False
+        self._next_poll = now + self.poll_interval
+        stat = self._get_stat()
+        if stat is None or stat == self._stat:
+            return False
+        self._stat = stat
+        return True
+
+    def poll(self):
+        if not (self._changed() or self._requested):
+            return False
+        self._requested = False
+        self._stat = self._get_stat()
+        try:
+            calls = self.load()
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+            return False
+        self.on_change(calls)
+        return True
@@ -0,0 +1,248 @@
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+from typing import NamedTuple
+
+TYPES = {"A": 1, "AAAA": 28, "CNAME": 5}
+TYPE_NAMES = {v: k for k, v in TYPES.items()}
+RCODES = {0: "NOERROR", 1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+
+
+class ResolveError(Exception):
+    pass
+
+
+class Record(NamedTuple):
+    name: str
+    type: str
+    ttl: int
+    value: str
+
+
+class Response(NamedTuple):
+    id: int
+    rcode: int
+    truncated: bool
+    records: list
+
+
+def build_query(qid, name, qtype):
+    labels = name.rstrip(".").encode("idna").split(b".")
+    qname = b"".join(bytes([len(label)]) + label for label in labels) + b"\0"
+    return struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0) + qname + struct.pack("!HH", TYPES[qtype], 1)
+
+
+def _read_name(data, offset):
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack_from("!H", data, offset)[0] & 0x3FFF
+            continue
+        offset += 1
+        if length == 0:
+            return ".".join(labels), offset if end is None else end
+        labels.append(data[offset:][:length].decode("ascii", "replace"))
+        offset += length
+    raise ResolveError("malformed name in response")
+
+
+def _read_value(data, offset, rtype, length):
+    if rtype == TYPES["A"]:
+        return socket.inet_ntop(socket.AF_INET, data[offset:][:length])
+    if rtype == TYPES["AAAA"]:
+        return socket.inet_ntop(socket.AF_INET6, data[offset:][:length])
+    return _read_name(data, offset)[0]
+
+
+def parse_response(data):
+    try:
+        (qid, flags, qdcount, ancount, _, _) = struct.unpack_from("!HHHHHH", data)
+        offset = 12
+        for _ in range(qdcount):
+            offset = _read_name(data, offset)[1] + 4
+        records = []
+        for _ in range(ancount):
+            name, offset = _read_name(data, offset)
+            (rtype, _, ttl, length) = struct.unpack_from("!HHIH", data, offset)
+            offset += 10
+            if rtype in TYPE_NAMES:
+                records.append(Record(name, TYPE_NAMES[rtype], ttl, _read_value(data, offset, rtype, length)))
+            offset += length
+    except (IndexError, struct.error, ValueError) as e:
+        raise ResolveError(f"malformed response ({e})") from None
+    return Response(qid, flags & 0x000F, bool(flags & 0x0200), records)
+
+
+def get_system_nameserver(path="/etc/resolv.conf"):
+    try:
+        with open(path, "r") as resolv_conf:
+            for line in resolv_conf:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    return fields[1]
+    except OSError:
+        pass
+    return "127.0.0.1"
+
+
+def parse_nameserver(nameserver, port=53):
+    if nameserver.startswith("["):
+        (host, _, rest) = nameserver[1:].partition("]")
+        return (host, int(rest[1:]) if rest.startswith(":") else port)
+    if nameserver.count(":") == 1:
+        (host, p) = nameserver.split(":")
+        return (host, int(p))
+    return (nameserver, port)
+
+
+class DnsCache:
+    """In-process answer cache. Answers are kept for their smallest TTL, empty answers for `negative_ttl`"""
+
+    def __init__(self, max_entries=10000, negative_ttl=30):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            (expires, records) = self._entries.get(key, (0, None))
+            return records if expires > time.monotonic() else None
+
+    def set(self, key, records):
+        ttl = min((r.ttl for r in records), default=self.negative_ttl)
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + ttl, records)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = DnsCache()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid, future):
+        self.qid = qid
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        try:
+            response = parse_response(data)
+        except ResolveError:
+            return
+        if response.id == self.qid and not self.future.done():
+            self.future.set_result(response)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class DnsResolver:
+    """
+    Stub resolver speaking DNS directly to one nameserver (UDP, falling back to TCP on truncated answers).
+    A, AAAA and CNAME records are queried in parallel, answers are cached according to their TTL.
+    NOTE: search domains and /etc/hosts are not taken into account
+    """
+
+    def __init__(self, nameserver=None, timeout=2.0, tcp=False, cache=cache):
+        (self.host, self.port) = parse_nameserver(nameserver or get_system_nameserver())
+        self.timeout = timeout
+        self.tcp = tcp
+        self.cache = cache
+
+    async def _udp(self, qid, query):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpProtocol(qid, future), remote_addr=(self.host, self.port)
+        )
+        try:
+            transport.sendto(query)
+            return await future
+        finally:
+            transport.close()
+
+    async def _tcp(self, query):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+            return parse_response(await reader.readexactly(length))
+        finally:
+            writer.close()
+
+    async def _exchange(self, qid, query):
+        response = None
+        if not self.tcp:
+            response = await self._udp(qid, query)
+        if response is None or response.truncated:
+            response = await self._tcp(query)
+        return response
+
+    async def query(self, name, qtype):
+        key = (self.host, self.port, name.lower().rstrip("."), qtype)
+        records = self.cache.get(key) if self.cache is not None else None
+        if records is not None:
+            return records
+        qid = random.getrandbits(16)
+        try:
+            query = build_query(qid, name, qtype)
+            response = await asyncio.wait_for(self._exchange(qid, query), self.timeout)
+        except asyncio.TimeoutError:
+            raise ResolveError(f"no response from {self.host}:{self.port} within {self.timeout}s") from None
+        except (OSError, UnicodeError, asyncio.IncompleteReadError) as e:
+            raise ResolveError(e) from None
+        if response.rcode != 0:
+            raise ResolveError(f"{RCODES.get(response.rcode, response.rcode)} from {self.host}:{self.port}")
+        if self.cache is not None:
+            self.cache.set(key, response.records)
+        return response.records
+
+    async def resolve(self, name, qtypes=("A", "AAAA", "CNAME")):
+        answers = await asyncio.gather(*(self.query(name, t) for t in qtypes))
+        records = []
+        for record in (r for answer in answers for r in answer):
+            if record not in records:
+                records.append(record)
+        return records
+
+    def resolve_sync(self, name, qtypes=("A", "AAAA", "CNAME")):
+        return asyncio.run(self.resolve(name, qtypes))
+
+
+class SystemResolver:
+    """Resolves through the os resolver (libc), returning a single IPv4 address"""
+
+    def __init__(self, nameserver=None, timeout=None, tcp=False, cache=None):
+        pass
+
+    async def resolve(self, name):
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(name, None, family=socket.AF_INET)
+        except (socket.gaierror, UnicodeError) as e:
+            raise ResolveError(e) from None
+        return [Record(name, "A", 0, infos[0][4][0])]
+
+    def resolve_sync(self, name):
+        try:
+            return [Record(name, "A", 0, socket.gethostbyname(name))]
+        except (socket.gaierror, UnicodeError) as e:
+            raise ResolveError(e) from None
+
+
+resolvers = {"system": SystemResolver, "dns": DnsResolver}
@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import queue
+import random
+import time
+from collections import Counter
+
+from pipecheck.api import Call
+from pipecheck.graph import failed, get_dependencies, skipped
+
+
+class Scheduler:
+    """
+    Runs every call on its own interval (heap keyed by next due time) instead of sweeping all calls at once.
+    Start times are spread by a random offset of up to `jitter` x interval, calls which are still running when
+    they are due again are skipped instead of queued. Calls with `depends_on` are skipped (Unk result) while the last
+    result of one of their dependencies failed. `on_step` gets the seconds a step spent dispatching calls and
+    reporting results, without the time waiting for them.
+    """
+
+    def __init__(self, engine, interval, jitter=1.0, on_result=None, on_skip=None, on_step=None):
+        self.engine = engine
+        self.interval = interval
+        self.jitter = jitter
+        self.on_result = on_result
+        self.on_skip = on_skip
+        self.on_step = on_step
+        self._heap = []
+        self._keys = itertools.count()
+        self._running = set()
+        self._scheduled = set()
+        self._results = {}  # check id -> last result
+        self._done = queue.Queue()
+
+    def get_interval(self, call: Call) -> float:
+        return float(call.options.get("interval") or self.interval)
+
+    def add(self, call):
+        call = Call(*call)
+        offset = random.uniform(0, self.jitter * self.get_interval(call))
+        key = next(self._keys)
+        self._scheduled.add(key)
+        heapq.heappush(self._heap, (time.monotonic() + offset, key, call))
+
+    def update(self, calls):
+        """
+        Replaces the scheduled calls by `calls`, matched by Call.get_key(). Unchanged checks keep their probe
+        (and with it its state) and their schedule, only added checks are scheduled and removed ones dropped.
+        Returns the number of added and removed calls.
+        """
+        calls = [Call(*call) for call in calls]
+        wanted = Counter(call.get_key() for call in calls)
+        kept = []
+        for entry in sorted(self._heap):
+            check = entry[2].get_key()
+            if wanted[check] > 0:
+                wanted[check] -= 1
+                kept.append(entry)
+        removed = len(self._heap) - len(kept)
+        self._heap = kept
+        self._scheduled = {entry[1] for entry in kept}
+        heapq.heapify(self._heap)
+        added = 0
+        for call in calls:
+            if wanted[call.get_key()] > 0:
+                wanted[call.get_key()] -= 1
+                self.add(call)
+                added += 1
+        # a changed check may keep its id, its new version decides about its dependents once it ran
+        kept_ids = {str(entry[2].options.get("id")) for entry in kept}
+        self._results = {id: result for id, result in self._results.items() if id in kept_ids}
+        return added, removed
+
+    def calls(self):
+        return [entry[2] for entry in self._heap]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _dispatch(self, now):
+        due_calls = []
+        while self._heap and self._heap[0][0] <= now:
+            due, key, call = heapq.heappop(self._heap)
+            failed_dependency = self._failed_dependency(call)
+            if key in self._running:
+                if self.on_skip:
+                    self.on_skip(call)
+            elif failed_dependency is not None:
+                self._report(key, call, skipped(call, failed_dependency))
+            else:
+                self._running.add(key)
+                due_calls.append((key, call))
+            interval = self.get_interval(call)
+            due += interval
+            if due <= now:
+                due = now + interval
+            heapq.heappush(self._heap, (due, key, call))
+        # calls due at the same time are submitted together, so the engine can batch them
+        futures = self.engine.submit_many([call for _, call in due_calls])
+        for (key, call), future in zip(due_calls, futures):
+            future.add_done_callback(lambda f, key=key, call=call: self._done.put((key, call, f)))
+
+    def _failed_dependency(self, call):
+        for dependency in get_dependencies(call):
+            if dependency in self._results and failed(self._results[dependency]):
+                return dependency
+        return None
+
+    def _report(self, key, call, result):
+        # results of checks removed by update() while running are dropped
+        if key not in self._scheduled:
+            return
+        if call.options.get("id") is not None:
+            self._results[str(call.options["id"])] = result
+        if self.on_result:
+            self.on_result(call, result)
+
+    def _collect(self, timeout):
+        # returns the seconds spent reporting the results, from the first one on
+        start = None
+        try:
+            item = self._done.get(timeout=timeout)
+            start = time.monotonic()
+            while True:
+                key, call, future = item
+                self._running.discard(key)
+                self._report(key, call, future.result())
+                item = self._done.get_nowait()
+        except queue.Empty:
+            pass
+        return 0.0 if start is None else time.monotonic() - start
+
+    def step(self, timeout=None):
+        now = time.monotonic()
+        self._dispatch(now)
+        busy = time.monotonic() - now
+        wait = self._heap[0][0] - now if self._heap else None
+        if timeout is not None:
+            wait = timeout if wait is None else min(wait, timeout)
+        busy += self._collect(wait)
+        if self.on_step:
+            self.on_step(busy)
+
+    def run(self, duration=None):
+        end = None if duration is None else time.monotonic() + duration
+        with self.engine:
+            while end is None or time.monotonic() < end:
+                self.step(None if end is None else max(0, end - time.monotonic()))
@@ -0,0 +1,72 @@
+import bisect
+import hashlib
+import os
+
+from pipecheck.api import Call
+from pipecheck.graph import get_dependencies
+
+VIRTUAL_NODES = 128
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(str(value).encode()).digest()[:8], "big")
+
+
+def get_shard_index(index=None, environ=None):
+    """Index of this replica: `index` if given, else PIPECHECK_SHARD_INDEX"""
+    if index is not None:
+        return int(index)
+    environ = os.environ if environ is None else environ
+    value = environ.get("PIPECHECK_SHARD_INDEX", "")
+    if not value.strip().isdigit():
+        raise ValueError(f"can't determine the shard index from PIPECHECK_SHARD_INDEX='{value}', set it or --shard-index")
+    return int(value)
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto `shards` shards: every shard owns VIRTUAL_NODES points on a ring and a key
+    belongs to the shard of the next point. Going from N to N+1 shards moves about 1/(N+1) of the keys.
+    """
+
+    def __init__(self, shards, virtual_nodes=VIRTUAL_NODES):
+        if shards < 1:
+            raise ValueError(f"expected at least 1 shard, got {shards}")
+        points = sorted((_hash(f"{shard}-{node}"), shard) for shard in range(shards) for node in range(virtual_nodes))
+        self.shards = shards
+        self._hashes = [h for h, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def get_shard(self, key):
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[i]
+
+
+def get_shard_keys(calls):
+    """
+    Stable key per call: its check id, or its type and labels without one. Checks connected by depends_on share
+    the key of the group, so a check and its dependencies end up on the same shard.
+    """
+    calls = [Call(*call) for call in calls]
+    keys = [str(c.options["id"]) if c.options.get("id") is not None else repr(c.get_probe_key()) for c in calls]
+    parents = {}
+
+    def find(key):
+        while parents.get(key, key) != key:
+            key = parents[key]
+        return key
+
+    for key, call in zip(keys, calls):
+        for dependency in get_dependencies(call):
+            (a, b) = sorted([find(key), find(str(dependency))])
+            parents[b] = a
+    return [find(key) for key in keys]
+
+
+def select_shard(calls, shards, index):
+    """Returns the calls of shard `index` (0 <= index < shards)"""
+    if not 0 <= index < shards:
+        raise ValueError(f"shard index {index} out of range for {shards} shards")
+    calls = list(calls)
+    ring = HashRing(shards)
+    return [call for call, key in zip(calls, get_shard_keys(calls)) if ring.get_shard(key) == index]
@@ -1,3 +1,9 @@
+import bisect
+import functools
+
+from netaddr import IPAddress, IPNetwork
+
+
 def mergedicts(dict1, dict2):
     for k in set(dict1.keys()).union(dict2.keys()):
         if k in dict1 and k in dict2:
@@ -12,3 +18,42 @@ def mergedicts(dict1, dict2):
             yield (k, dict1[k])
         else:
             yield (k, dict2[k])
+
+
+class IpMatcher:
+    """
+    Membership test for IPv4/IPv6 addresses against a list of IPs and CIDR subnets.
+    Targets are parsed once into sorted, merged address ranges, lookups are a binary search (O(log n)).
+    """
+
+    def __init__(self, targets=()):
+        ranges = {4: [], 6: []}
+        for target in targets:
+            net = IPNetwork(target)
+            ranges[net.version].append((net.first, net.last))
+        self.has_networks = any("/" in str(t) for t in targets)
+        self.versions = {v for v, r in ranges.items() if r}
+        self._starts = {}
+        self._ends = {}
+        for version, r in ranges.items():
+            merged = []
+            for start, end in sorted(r):
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[version] = [start for start, _ in merged]
+            self._ends[version] = [end for _, end in merged]
+
+    def __contains__(self, ip):
+        ip = ip if isinstance(ip, IPAddress) else IPAddress(ip)
+        i = bisect.bisect_right(self._starts[ip.version], ip.value) - 1
+        return i >= 0 and ip.value <= self._ends[ip.version][i]
+
+    def __len__(self):
+        return sum(len(s) for s in self._starts.values())
+
+
+@functools.lru_cache(maxsize=1024)
+def get_ip_matcher(targets: tuple) -> IpMatcher:
+    return IpMatcher(targets)
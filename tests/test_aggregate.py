@@ -0,0 +1,140 @@
+import gzip
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+import requests
+from parameterized import parameterized
+
+from pipecheck.aggregate import (
+    MAX_PUSH_BYTES,
+    MAX_RECORDS_BYTES,
+    Aggregator,
+    AggregatorServer,
+    ResultPusher,
+    get_target,
+    quorum_state,
+)
+from pipecheck.api import Call, Err, Ok
+from pipecheck.checks.tcp import TcpProbe
+
+
+class AggregateTests(unittest.TestCase):
+    @parameterized.expand(
+        [
+            (["ok", "ok", "ok"], None, "Ok"),
+            (["ok", "err", "ok"], None, "Warn"),
+            (["err", "err", "ok"], None, "Err"),
+            (["ok", "warn"], None, "Warn"),
+            (["err", "err", "ok"], 3, "Warn"),
+            (["err", "unk"], 2, "Unk"),
+            ([], None, "Unk"),
+        ]
+    )
+    def test_quorum_state(self, statuses, quorum, expected):
+        self.assertEqual(quorum_state(statuses, quorum), expected)
+
+    def test_get_target(self):
+        self.assertEqual(get_target({"id": "db", "labels": {"host": "db"}}), "db")
+        self.assertEqual(get_target({"id": None, "labels": {"port": 3306, "host": "db"}}), "host=db,port=3306")
+
+    def test_matrix(self):
+        aggregator = Aggregator(max_age=60)
+        record = {"type": "tcp", "id": "db", "labels": {}, "status": "ok"}
+        aggregator.add("eu", [record, {"summary": True, "checks": 1}], now=0)
+        aggregator.add("us", [{**record, "status": "err"}], now=30)
+        self.assertEqual(set(aggregator.matrix(now=40)[("tcp", "db")]), {"eu", "us"})
+        self.assertEqual(aggregator.states(now=40), {("tcp", "db"): "Warn"})
+        self.assertEqual(set(aggregator.matrix(now=70)[("tcp", "db")]), {"us"})
+        self.assertEqual(aggregator.matrix(now=100), {})
+
+
+class AggregatorServerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = AggregatorServer(Aggregator(), 0, host="127.0.0.1")
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.port}"
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        return super().tearDown()
+
+    def test_push(self):
+        call = Call(TcpProbe(host="db", port=3306), "tcp", {})
+        for vantage, result in [("eu", Ok("up")), ("us", Err("down")), ("ap", Err("down"))]:
+            pusher = ResultPusher(self.url, vantage)
+            pusher.write(call, result)
+            pusher.close()
+        self.assertEqual(self.server.aggregator.states(), {("tcp", "host=db,port=3306"): "Err"})
+        metrics = requests.get(f"{self.url}/metrics").text
+        self.assertIn('pipecheck_target_state{state="Err",target="host=db,port=3306",type="tcp"} 1.0', metrics)
+        self.assertIn('pipecheck_target_failing_vantages{target="host=db,port=3306",type="tcp"} 2.0', metrics)
+
+    def test_push_error(self):
+        errors = []
+        pusher = ResultPusher("http://127.0.0.1:1", "eu", on_error=errors.append)
+        pusher.write(Call(TcpProbe(host="db", port=3306), "tcp", {}), Ok("up"))
+        pusher.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(requests.post(f"{self.url}/push").status_code, 400)
+
+    def test_push_in_background(self):
+        # a peer never accepting leaves the requests hanging until their timeout
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(0)
+        errors = []
+        pusher = ResultPusher(f"http://127.0.0.1:{listener.getsockname()[1]}", "eu", timeout=0.5, on_error=errors.append)
+        try:
+            start = time.monotonic()
+            for _ in range(3):
+                pusher.write(Call(TcpProbe(host="db", port=3306), "tcp", {}), Ok("up"))
+                pusher.flush()
+            self.assertLess(time.monotonic() - start, 0.1)
+            pusher.close(timeout=5)
+        finally:
+            listener.close()
+        self.assertEqual(len(errors), 1)
+
+    def test_push_batches(self):
+        pusher = ResultPusher(self.url, "eu", batch_size=2, flush_interval=60)
+        for port in range(5):
+            pusher.write(Call(TcpProbe(host="db", port=port), "tcp", {}), Ok("up"))
+        pusher.flush()
+        time.sleep(0.5)
+        self.assertEqual(len(self.server.aggregator.matrix()), 4)
+        pusher.close()
+        self.assertEqual(len(self.server.aggregator.matrix()), 5)
+
+    def test_push_too_large(self):
+        bomb = gzip.compress(b"\n" * (MAX_RECORDS_BYTES + 1))
+        headers = {"Content-Encoding": "gzip"}
+        self.assertEqual(requests.post(f"{self.url}/push?vantage=eu", data=bomb, headers=headers).status_code, 413)
+        headers = {"Content-Length": str(MAX_PUSH_BYTES + 1)}
+        self.assertEqual(requests.post(f"{self.url}/push?vantage=eu", data=b"", headers=headers).status_code, 413)
+
+    def test_agents(self):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(8)
+        target = f"127.0.0.1:{listener.getsockname()[1]}"
+        try:
+            for vantage in ["eu", "us"]:
+                subprocess.run(
+                    [sys.executable, "-m", "pipecheck", "--push", self.url, "--vantage", vantage, "--tcp", target],
+                    capture_output=True,
+                    check=True,
+                )
+        finally:
+            listener.close()
+        results = self.server.aggregator.matrix()[("tcp", f"host=127.0.0.1,port={target.split(':')[1]}")]
+        self.assertEqual({v: r["status"] for v, r in results.items()}, {"eu": "ok", "us": "ok"})
+
+
+if __name__ == "__main__":
+    unittest.main()
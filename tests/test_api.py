@@ -1,6 +1,9 @@
 import unittest
 
-from pipecheck.api import Probe
+from parameterized import parameterized
+
+from pipecheck.api import Probe, ProbeSpec
+from pipecheck.checks import probes
 
 
 class ApiCheckTests(unittest.TestCase):
@@ -8,6 +11,93 @@ class ApiCheckTests(unittest.TestCase):
         probe = Probe()
         self.assertEqual(probe.get_help(), probe.__doc__)
 
+    @parameterized.expand([(name,) for name in probes])
+    def test_probe_spec_matches_probe(self, name):
+        spec = probes[name]
+        cls = spec.load()
+        self.assertEqual(spec.get_type(), cls.get_type())
+        self.assertEqual(spec.get_help(), cls.get_help())
+        self.assertEqual(spec.get_args(), cls.get_args())
+
+    def test_probe_spec_lazy(self):
+        spec = ProbeSpec("pipecheck.api:Probe", "test", "help", [])
+        self.assertIsNone(spec._cls)
+        self.assertIsInstance(spec(), Probe)
+        self.assertIs(spec.load(), Probe)
+
+    def test_probe_spec_without_metadata(self):
+        spec = ProbeSpec("pipecheck.checks.tcp:TcpProbe", "sock")
+        self.assertIsNone(spec._cls)
+        self.assertEqual(spec.get_args()[:2], ["host", "port"])
+        self.assertEqual(spec.get_help(), spec.load().get_help())
+        self.assertEqual(spec.parse("localhost"), {"type": "sock", "host": "localhost"})
+
+    @parameterized.expand([("longer", 5, 2), ("shorter", 1, 1)])
+    def test_limit_timeout(self, _, timeout, expected):
+        probe = probes["tcp"](host="localhost", tcp_timeout=timeout)
+        capped = probe.limit_timeout(2)
+        self.assertEqual(capped.tcp_timeout, expected)
+        self.assertEqual(probe.tcp_timeout, timeout)
+        self.assertEqual(capped.host, "localhost")
+
+    def test_limit_timeout_all(self):
+        probe = probes["mysql"](host="localhost")
+        capped = probe.limit_timeout(0.5)
+        self.assertEqual(capped.timeout, 0.5)
+        self.assertEqual(capped.port, 3306)
+
+    @parameterized.expand(
+        [
+            ("ping", {"host": "a", "ping_count": "3"}, "ping_count", 3),
+            ("tcp", {"host": "a", "port": "53", "tcp_timeout": "1.5"}, "tcp_timeout", 1.5),
+            ("tcp", {"host": "a", "port": 53.0}, "port", 53),
+            ("http", {"url": "x", "insecure": "yes"}, "insecure", True),
+            ("http", {"url": "x", "http_status": 204}, "http_status", [204]),
+            ("mysql", {"host": "a", "database": 1}, "database", "1"),
+        ]
+    )
+    def test_coercion(self, check, kwargs, arg, expected):
+        value = getattr(probes[check](**kwargs), arg)
+        self.assertEqual(value, expected)
+        self.assertIs(type(value), type(expected))
+
+    @parameterized.expand(
+        [
+            ("tcp", {"port": "http"}),
+            ("tcp", {"port": 1.5}),
+            ("http", {"insecure": "maybe"}),
+            ("http", {"http_headers": ["a"]}),
+            ("http", {"max_body_bytes": 0}),
+            ("dns", {"name": ["a"]}),
+            ("dns", {"ips": ["1.2.3.4", "not-an-ip"]}),
+        ]
+    )
+    def test_invalid_args(self, check, kwargs):
+        (arg,) = kwargs
+        self.assertRaisesRegex(ValueError, f"invalid argument '{arg}' of {check} check", probes[check], **kwargs)
+        self.assertEqual(len(probes[check].validate(kwargs)), 1)
+
+    def test_slots(self):
+        probe = probes["tcp"](host="localhost", port=53)
+        self.assertIn("host", type(probe).__slots__)
+        self.assertEqual(probe.__dict__, {})
+        probe.conn = None
+        self.assertNotIn("conn", probe.get_labels())
+        self.assertEqual(probe.get_labels(), {**probe.get_defaults(), "host": "localhost", "port": 53})
+        self.assertIs(probe.get_labels(), probe.get_labels())
+        self.assertEqual(probe.limit_timeout(1).get_labels()["tcp_timeout"], 1)
+        self.assertNotEqual(probe.get_labels()["tcp_timeout"], 1)
+        self.assertIs(probe.limit_timeout(1000), probe)
+
+    def test_unannotated_argument(self):
+        with self.assertRaisesRegex(TypeError, "argument 'host' of probe HostProbe has no type annotation"):
+            type("HostProbe", (Probe,), {"host": "x"})
+
+    def test_inherited_default(self):
+        cls = type("HttpsProbe", (probes["tcp"].load(),), {"port": 443})
+        self.assertEqual(cls(host="localhost").port, 443)
+        self.assertEqual(probes["tcp"](host="localhost").port, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
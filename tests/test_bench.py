@@ -0,0 +1,46 @@
+import contextlib
+import io
+import time
+import unittest
+
+import requests
+
+from pipecheck.bench.__main__ import main
+from pipecheck.bench.servers import HttpServer, TcpListeners
+
+
+class BenchServerTests(unittest.TestCase):
+    def test_http_server(self):
+        server = HttpServer(latency=0.2, body_size=1000)
+        try:
+            start = time.perf_counter()
+            response = requests.get(f"{server.url}/")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+            self.assertEqual(len(response.content), 1000)
+            self.assertEqual(len(requests.get(f"{server.url}/bytes/50").content), 50)
+        finally:
+            server.close()
+
+    def test_tcp_listeners(self):
+        listeners = TcpListeners(3)
+        self.assertEqual(len(set(listeners.ports)), 3)
+        listeners.close()
+
+
+class BenchTests(unittest.TestCase):
+    def test_bench(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            rows = main(["-n", "5", "-t", "tcp", "mysql", "--startup-runs", "1", "--json", "--batch"])
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        self.assertEqual(
+            [(r["scenario"], r["engine"]) for r in rows][:3], [("startup", "thread"), ("tcp", "thread"), ("tcp", "async")]
+        )
+        for row in rows:
+            self.assertEqual(row["errors"], 0, row)
+            self.assertGreater(row["checks_per_second"], 0)
+            self.assertGreater(row["peak_rss"], 0)
+        self.assertEqual([r["checks"] for r in rows[1:]], [5] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
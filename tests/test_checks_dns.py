@@ -1,10 +1,19 @@
+import asyncio
 import unittest
 from typing import Type
 
 from parameterized import parameterized
 
 from pipecheck.api import Err, Ok
+from pipecheck.bench.servers import DnsStubServer
 from pipecheck.checks.dns import DnsProbe
+from pipecheck.resolver import cache
+
+ZONE = {
+    "svc.example": {"A": ["10.0.0.1", "10.0.0.2"], "AAAA": ["fd00::1"]},
+    "alias.example": {"CNAME": ["svc.example"]},
+    "v6.example": {"AAAA": ["fd00::6"]},
+}
 
 
 class CheckDnsTests(unittest.TestCase):
@@ -26,5 +35,41 @@ class CheckDnsTests(unittest.TestCase):
         self.assertIsInstance(result, return_type, result.msg)
 
 
+class CheckDnsResolverTests(unittest.TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.server = DnsStubServer(ZONE)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.close()
+        return super().tearDown()
+
+    @parameterized.expand(
+        [
+            ("svc.example", [], Ok),
+            ("svc.example", ["10.0.0.1", "10.0.0.2"], Ok),
+            ("svc.example", ["10.0.0.1"], Err),
+            ("svc.example", ["10.0.0.0/24"], Ok),
+            ("svc.example", ["10.0.0.0/24", "fd00::/64"], Ok),
+            ("svc.example", ["10.0.0.0/24", "fd01::/64"], Err),
+            ("alias.example", ["10.0.0.0/24"], Ok),
+            ("v6.example", ["fd00::6"], Ok),
+            ("v6.example", ["10.0.0.1"], Err),
+            ("missing.example", [], Err),
+        ]
+    )
+    def test_dns_nameserver(self, target, ips, return_type: Type):
+        probe = DnsProbe(name=target, ips=ips, nameserver=self.server.nameserver, dns_timeout=1.0)
+        result = probe()
+        self.assertIsInstance(result, return_type, result.msg)
+        result = asyncio.run(probe.acall())
+        self.assertIsInstance(result, return_type, result.msg)
+
+    def test_dns_resolver_unknown(self):
+        result = DnsProbe(name="svc.example", resolver="nope")()
+        self.assertIsInstance(result, Err)
+
+
 if __name__ == "__main__":
     unittest.main()
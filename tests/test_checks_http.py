@@ -1,14 +1,19 @@
 import os
+import socket
 import unittest
 from typing import Type
+from unittest import mock
 
 from parameterized import parameterized
+from urllib3.exceptions import ConnectTimeoutError
 
 from pipecheck.api import Err, Ok, Warn
-from pipecheck.checks.http import HttpProbe
+from pipecheck.bench.servers import HttpServer
+from pipecheck.checks.http import HttpProbe, SessionPool, TimedHTTPConnection, sessions
 
 httpbin_baseurl = os.getenv("HTTPSTAT_BASEURL") or "https://httpbin.org"
 badssl_baseurl = os.getenv("BADSSL_BASEURL") or "https://self-signed.badssl.com"
+big_path = f"/bytes/{8 * 1024 * 1024}"
 
 
 class CheckHttpTests(unittest.TestCase):
@@ -84,5 +89,155 @@ class CheckHttpTests(unittest.TestCase):
         self.assertIsInstance(result, return_type, result.msg)
 
 
+class HttpPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        sessions.clear()
+        self.server = HttpServer()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        sessions.clear()
+        self.server.close()
+        return super().tearDown()
+
+    @parameterized.expand([("keepalive", True, 1), ("fresh", False, 5)])
+    def test_http_connection_reuse(self, _, keepalive: bool, connections: int):
+        probe = HttpProbe(url=f"{self.server.url}/health", http_method="GET", http_keepalive=keepalive)
+        for _ in range(5):
+            result = probe()
+            self.assertIsInstance(result, Ok, result.msg)
+        self.assertEqual(self.server.connections, connections)
+
+    def test_http_shared_across_probes(self):
+        for path in ["a", "b", "c"]:
+            result = HttpProbe(url=f"{self.server.url}/{path}")()
+            self.assertIsInstance(result, Ok, result.msg)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(sessions), 1)
+
+    def test_http_phases(self):
+        probe = HttpProbe(url=f"{self.server.url.replace('127.0.0.1', 'localhost')}/health")
+        first = probe()
+        second = probe()
+        self.assertEqual(set(first.phases), {"dns", "connect", "first_byte"})
+        self.assertEqual(set(second.phases), {"first_byte"})
+
+    def test_connection_fallback(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        infos = [(socket.AF_INET, socket.SOCK_STREAM, 0, "", closed.getsockname()), self.server_addrinfo()]
+        closed.close()
+        conn = TimedHTTPConnection("localhost", self.server.server_address[1], timeout=2)
+        with mock.patch("socket.getaddrinfo", return_value=infos):
+            sock = conn._new_conn()
+        self.assertEqual(sock.getpeername(), infos[1][4])
+        self.assertEqual(sock.gettimeout(), 2)
+        sock.close()
+
+    def test_connection_deadline(self):
+        conn = TimedHTTPConnection("localhost", self.server.server_address[1], timeout=0)
+        with mock.patch("socket.getaddrinfo", return_value=[self.server_addrinfo()] * 2):
+            self.assertRaises(ConnectTimeoutError, conn._new_conn)
+
+    def server_addrinfo(self):
+        return (socket.AF_INET, socket.SOCK_STREAM, 0, "", ("127.0.0.1", self.server.server_address[1]))
+
+    def test_pool_keys(self):
+        pool = SessionPool()
+        url = f"{self.server.url}/"
+        self.assertIs(pool.get(url, "/ca.pem"), pool.get(url, "/ca.pem"))
+        self.assertIsNot(pool.get(url, "/ca.pem"), pool.get(url, "/other-ca.pem"))
+        self.assertIsNot(pool.get(url, "/ca.pem"), pool.get(url, False))
+        self.assertIsNot(pool.get("http://a.example/", False), pool.get("http://b.example/", False))
+
+    def test_pool_eviction(self):
+        pool = SessionPool(max_hosts=2)
+        first = pool.get("http://a.example/", False)
+        pool.get("http://b.example/", False)
+        pool.get("http://c.example/", False)
+        self.assertEqual(len(pool), 2)
+        self.assertIsNot(pool.get("http://a.example/", False), first)
+        idle = pool.get("http://d.example/", False, idle=0)
+        self.assertIsNot(pool.get("http://d.example/", False, idle=0), idle)
+
+    def test_pool_ssl_errors(self):
+        pool = SessionPool()
+        pool.set_ssl_error("https://a.example/x", "/ca.pem", "self signed")
+        self.assertEqual(pool.get_ssl_error("https://a.example/y", "/ca.pem"), "self signed")
+        self.assertIsNone(pool.get_ssl_error("https://a.example/y", "/other-ca.pem"))
+        pool.set_ssl_error("https://b.example/", "/ca.pem", "expired", ttl=0)
+        self.assertIsNone(pool.get_ssl_error("https://b.example/", "/ca.pem"))
+
+
+class HttpStreamTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = HttpServer()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        sessions.clear()
+        self.server.close()
+        return super().tearDown()
+
+    @parameterized.expand(
+        [
+            ("regex ok", False, {"content_regex": '{"code":200.*'}, Ok),
+            ("regex fail", False, {"content_regex": '.*"THIS DOES NOT EXIST".*'}, Err),
+            ("exact ok", False, {"content_exact": '{"code":200,"description":"OK"}'}, Ok),
+            ("exact fail", False, {"content_exact": "INVALID CONTENT"}, Err),
+            ("invalid regex", False, {"content_regex": "[.*"}, Err),
+            ("stream regex ok", True, {"content_regex": '{"code":200.*'}, Ok),
+            ("stream regex anchored ok", True, {"content_regex": '.*"OK"}$'}, Ok),
+            ("stream regex fail", True, {"content_regex": '.*"THIS DOES NOT EXIST".*'}, Err),
+            ("stream exact ok", True, {"content_exact": '{"code":200,"description":"OK"}'}, Ok),
+            ("stream exact prefix", True, {"content_exact": '{"code":200'}, Err),
+            ("stream exact fail", True, {"content_exact": "INVALID CONTENT"}, Err),
+        ]
+    )
+    def test_http_content_checks(self, _: str, stream: bool, checks: dict, return_type: Type):
+        probe = HttpProbe(url=f"{self.server.url}/small", http_method="GET", http_stream=stream, **checks)
+        result = probe()
+        self.assertIsInstance(result, return_type, result.msg)
+
+    def test_http_stream_stops_on_match(self):
+        probe = HttpProbe(url=f"{self.server.url}{big_path}", http_method="GET", http_stream=True, content_regex='{"code":200')
+        result = probe()
+        self.assertIsInstance(result, Ok, result.msg)
+        self.assertLess(probe._last_response.raw.tell(), 1024 * 1024)
+
+    def test_http_stream_max_body_bytes(self):
+        probe = HttpProbe(
+            url=f"{self.server.url}{big_path}",
+            http_method="GET",
+            http_stream=True,
+            max_body_bytes=100000,
+            content_regex=".*END",
+        )
+        result = probe()
+        self.assertIsInstance(result, Err)
+        self.assertIn("stopped reading after", result.msg)
+        self.assertLess(probe._last_response.raw.tell(), 200000)
+
+    def test_http_stream_without_keepalive(self):
+        probe = HttpProbe(
+            url=f"{self.server.url}{big_path}",
+            http_method="GET",
+            http_stream=True,
+            http_keepalive=False,
+            max_body_bytes=2 * 1024 * 1024,
+            content_regex=".*END",
+        )
+        result = probe()
+        self.assertIn(f"stopped reading after {2 * 1024 * 1024} bytes", result.msg)
+        self.assertTrue(probe._last_response.raw.closed)
+
+    def test_http_regex_compiled_once(self):
+        probe = HttpProbe(url=f"{self.server.url}/small", http_method="GET", content_regex='{"code":200.*')
+        probe()
+        pattern = probe._pattern
+        probe()
+        self.assertIs(probe._pattern, pattern)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import icmplib
+from parameterized import parameterized
+
+from pipecheck.api import Err, Ok
+from pipecheck.checks.icmp import MultiPing, PingProbe
+
+
+class FailingSocket:
+    """ICMP socket failing to send every request"""
+
+    sock = None
+
+    def send(self, request):
+        raise icmplib.ICMPLibError("network unreachable")
+
+    def close(self):
+        pass
+
+
+class CheckIcmpBatchGroupTests(unittest.TestCase):
+    def test_send_error(self):
+        with mock.patch.object(MultiPing, "_socket", lambda self, _: self._sockets.setdefault(4, FailingSocket())):
+            results = PingProbe.execute_many([PingProbe(host="127.0.0.1")])
+        self.assertIsInstance(results[0], Err)
+        self.assertEqual(results[0].msg, "ICMP '127.0.0.1' unreachable (network unreachable)")
+
+    def test_privileged_groups(self):
+        runs = []
+
+        def run(self):
+            runs.append((self.privileged, [address for _, address in self.targets]))
+            return [icmplib.Host(address, 1, [1.0]) for _, address in self.targets]
+
+        probes = [PingProbe(host=f"127.0.0.{i}", ping_privileged=i % 2 == 0) for i in range(1, 5)]
+        with mock.patch.object(MultiPing, "run", run):
+            results = PingProbe.execute_many(probes)
+        self.assertEqual(sorted(runs), [(False, ["127.0.0.1", "127.0.0.3"]), (True, ["127.0.0.2", "127.0.0.4"])])
+        self.assertEqual([r.msg for r in results], [f"ICMP '127.0.0.{i}' reachable (1.0ms)" for i in range(1, 5)])
+
+
+@unittest.skipUnless(hasattr(os, "geteuid") and os.geteuid() == 0, "raw ICMP sockets require root")
+class CheckIcmpBatchTests(unittest.TestCase):
+    def probe(self, host, **kwargs):
+        return PingProbe(host=host, ping_privileged=True, ping_timeout=0.5, **kwargs)
+
+    def test_execute_many(self):
+        probes = [self.probe("127.0.0.1"), self.probe("127.0.0.2"), self.probe("::1"), self.probe("name.invalid")]
+        results = PingProbe.execute_many(probes)
+        self.assertEqual(len(results), 4)
+        for result in results[:3]:
+            self.assertIsInstance(result, Ok, result.msg)
+        self.assertIsInstance(results[3], Err)
+        self.assertIn("name.invalid", results[3].msg)
+
+    def test_unreachable(self):
+        results = PingProbe.execute_many([self.probe("127.0.0.1"), self.probe("127.255.255.255")])
+        self.assertIsInstance(results[0], Ok, results[0].msg)
+        self.assertIsInstance(results[1], Err)
+
+    @parameterized.expand([(2, 0.1, None, 0.1), (1, 1, 20, 0.2)])
+    def test_spacing(self, count, interval, rate, min_duration):
+        probes = [self.probe(f"127.0.0.{i}", ping_count=count, ping_interval=interval) for i in range(1, 6)]
+        start = time.monotonic()
+        hosts = MultiPing([(p, p.host) for p in probes], rate=rate, privileged=True).run()
+        self.assertGreaterEqual(time.monotonic() - start, min_duration)
+        for host in hosts:
+            self.assertEqual(host.packets_sent, count)
+            self.assertEqual(host.packets_received, count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from parameterized import parameterized
+
+from pipecheck.api import Err, Ok
+from pipecheck.bench.servers import COM_PING, COM_QUERY, MysqlStubServer
+from pipecheck.checks.mysql import MysqlProbe, connections
+
+
+class CheckMysqlPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        connections.clear()
+        self.server = MysqlStubServer(deny=["denied"])
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        connections.clear()
+        self.server.close()
+        return super().tearDown()
+
+    def probe(self, **kwargs):
+        return MysqlProbe(host="127.0.0.1", port=self.server.port, user="monitor", password="secret", timeout=2, **kwargs)
+
+    def checks(self):
+        return [c for c in self.server.commands if c[0] == COM_PING or c[1] != "SET NAMES utf8mb4"]
+
+    def test_default_reconnects(self):
+        for _ in range(3):
+            result = self.probe()()
+            self.assertIsInstance(result, Ok, result.msg)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(len(connections), 0)
+
+    @parameterized.expand([("ping", None, (COM_PING, "")), ("query", "SELECT 1", (COM_QUERY, "SELECT 1"))])
+    def test_persistent(self, _, query, expected_command):
+        results = [self.probe(mysql_persistent=True, mysql_query=query)() for _ in range(3)]
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.checks(), [expected_command] * 3)
+        self.assertRegex(results[0].msg, r"\(connect [\d.]+ms, query [\d.]+ms\)$")
+        self.assertRegex(results[2].msg, r"\(reused connection, query [\d.]+ms\)$")
+
+    def test_reconnect_on_failure(self):
+        probe = self.probe(mysql_persistent=True)
+        self.assertIsInstance(probe(), Ok)
+        self.server.drop_connections()
+        result = probe()
+        self.assertIsInstance(result, Ok, result.msg)
+        self.assertIn("connect", result.msg)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_pool_size(self):
+        probe = self.probe()
+        opened = [probe._connect() for _ in range(3)]
+        for connection in opened:
+            connections.release(probe._key(), connection, pool_size=2)
+        self.assertEqual(len(connections), 2)
+        self.assertFalse(opened[2].open)
+        self.assertIs(connections.acquire(probe._key()), opened[1])
+
+    def test_idle_timeout(self):
+        probe = self.probe(mysql_persistent=True, mysql_pool_idle=0)
+        probe()
+        probe()
+        self.assertEqual(self.server.connections, 2)
+
+    def test_denied(self):
+        result = MysqlProbe(host="127.0.0.1", port=self.server.port, user="denied", mysql_persistent=True)()
+        self.assertIsInstance(result, Err)
+        self.assertIn("Access denied", result.msg)
+        self.assertEqual(len(connections), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
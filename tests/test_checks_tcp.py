@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pipecheck.api import Err, Ok
+from pipecheck.checks.tcp import TcpProbe, TcpSweep
+
+
+def listener(family=socket.AF_INET, host="127.0.0.1", accept=True):
+    sock = socket.socket(family)
+    sock.bind((host, 0))
+    sock.listen(0 if not accept else 1024)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            conn.close()
+
+    if accept:
+        threading.Thread(target=serve, daemon=True).start()
+    return sock
+
+
+def addrinfo(sock):
+    return (sock.family, socket.SOCK_STREAM, 0, "", sock.getsockname())
+
+
+def closed_addrinfo():
+    sock = listener(accept=False)
+    info = addrinfo(sock)
+    sock.close()
+    return info
+
+
+def stalled_addrinfo():
+    # a listener not accepting with a zero backlog leaves further connects hanging
+    sockets = [listener(accept=False)]
+    for _ in range(4):
+        sockets.append(socket.socket())
+        sockets[-1].setblocking(False)
+        sockets[-1].connect_ex(sockets[0].getsockname())
+    return sockets, addrinfo(sockets[0])
+
+
+def close_all(sockets):
+    for sock in sockets:
+        sock.close()
+
+
+class RecordingSweep(TcpSweep):
+    """Sweep recording the peak number of open sockets"""
+
+    peak = 0
+
+    def _attempt(self, k, now):
+        super()._attempt(k, now)
+        self.peak = max(self.peak, self._inflight)
+
+
+class CheckTcpSweepTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.v4 = listener()
+        self.port = self.v4.getsockname()[1]
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.v4.close()
+        return super().tearDown()
+
+    def test_execute_many(self):
+        probes = [
+            TcpProbe(host="127.0.0.1", port=self.port),
+            TcpProbe(host="127.0.0.1", port=closed_addrinfo()[4][1]),
+            TcpProbe(host="name.invalid", port=80),
+        ]
+        results = TcpProbe.execute_many(probes)
+        self.assertIsInstance(results[0], Ok, results[0].msg)
+        self.assertRegex(results[0].msg, r"\(\d+\.\d+ms\)$")
+        self.assertIsInstance(results[1], Err)
+        self.assertIsInstance(results[2], Err)
+
+    def test_execute_many_resolves_hosts_once(self):
+        probes = [TcpProbe(host="localhost", port=self.port), TcpProbe(host="localhost", port=closed_addrinfo()[4][1])]
+        with mock.patch("socket.getaddrinfo", return_value=[addrinfo(self.v4)]) as getaddrinfo:
+            results = TcpProbe.execute_many(probes, max_inflight=1, fallback_delay=0.05)
+        getaddrinfo.assert_called_once_with("localhost", None, type=socket.SOCK_STREAM)
+        self.assertIsInstance(results[0], Ok, results[0].msg)
+        self.assertIsInstance(results[1], Err)
+
+    def test_ipv6(self):
+        v6 = listener(socket.AF_INET6, "::1")
+        result = TcpProbe(host="::1", port=v6.getsockname()[1])()
+        v6.close()
+        self.assertIsInstance(result, Ok, result.msg)
+
+    def test_single(self):
+        result = TcpProbe(host="127.0.0.1", port=self.port)()
+        self.assertIsInstance(result, Ok, result.msg)
+        self.assertIn("connect", result.phases)
+        self.assertIsInstance(TcpProbe(host="127.0.0.1", port=closed_addrinfo()[4][1])(), Err)
+
+    def test_no_inflight(self):
+        self.assertRaises(ValueError, TcpSweep, [([addrinfo(self.v4)], 2.0)], max_inflight=0)
+
+    def test_inflight_limit(self):
+        sweep = RecordingSweep([([addrinfo(self.v4)], 2.0)] * 300, max_inflight=20)
+        results = sweep.run()
+        self.assertTrue(all(error is None for _, error in results), results)
+        self.assertLessEqual(sweep.peak, 20)
+
+    def test_timeout(self):
+        (stalled, info) = stalled_addrinfo()
+        start = time.monotonic()
+        results = TcpSweep([([info], 0.2)] * 3).run()
+        close_all(stalled)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual([error for _, error in results], ["timed out"] * 3)
+
+    def test_fallback(self):
+        (stalled, info) = stalled_addrinfo()
+        results = TcpSweep([([info, addrinfo(self.v4)], 2.0)], fallback_delay=0.05).run()
+        close_all(stalled)
+        (latency, error) = results[0]
+        self.assertIsNone(error)
+        self.assertGreaterEqual(latency, 50)
+        self.assertLess(latency, 1000)
+
+    def test_fallback_on_error(self):
+        results = TcpSweep([([closed_addrinfo(), addrinfo(self.v4)], 2.0)], fallback_delay=10).run()
+        self.assertIsNone(results[0][1])
+        self.assertLess(results[0][0], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
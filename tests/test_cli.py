@@ -1,4 +1,6 @@
+import io
 import unittest
+from unittest import mock
 
 from parameterized import parameterized
 
@@ -27,16 +29,33 @@ class CliTests(unittest.TestCase):
                 {"http": ["https://httpstat.us/200"], "tcp": ["8.8.8.8:53"], "dns": ["one.one.one.one=1.1.1.1,1.0.0.1"]},
             ),
             (["-i", "30", "-p", "9990"], {"prom_port": 9990, "interval": 30}),
+            (["--tcp", "8.8.8.8:53"], {"engine": "thread", "concurrency": None}),
+            (["-e", "async", "-c", "500"], {"engine": "async", "concurrency": 500}),
+            (["-i", "30", "--jitter", "0.5"], {"interval": 30, "jitter": 0.5}),
+            (
+                ["--host-concurrency", "5", "--type-rate", "http=50", "mysql=2"],
+                {"host_concurrency": 5, "type_rate": [("http", 50.0), ("mysql", 2.0)]},
+            ),
+            (["--shards", "3", "--shard-index", "1"], {"shards": 3, "shard_index": 1}),
+            (["--push", "http://aggregator:9000", "--vantage", "eu"], {"push": "http://aggregator:9000", "vantage": "eu"}),
+            (["--aggregate", "--quorum", "2"], {"aggregate": True, "quorum": 2}),
+            (["--tcp-inflight", "100", "--tcp-fallback-delay", "0.1"], {"tcp_inflight": 100, "tcp_fallback_delay": 0.1}),
         ]
     )
     def test_cli_parser(self, params, expected_args):
         args = parse_args(params)
         self.assertSubset(args, expected_args)
 
+    @mock.patch("sys.stderr", new_callable=io.StringIO)
+    def test_cli_invalid_inflight(self, mock_stderr):
+        self.assertRaises(SystemExit, parse_args, ["--tcp-inflight", "0"])
+        self.assertIn("expected at least 1, got 0", mock_stderr.getvalue())
+
     @parameterized.expand(
         [
             ({"http": ["https://httpstat.us/200"]}, [{"type": "http", "url": "https://httpstat.us/200"}]),
             ({"tcp": ["8.8.8.8:53"]}, [{"type": "tcp", "host": "8.8.8.8", "port": 53}]),
+            ({"tcp": ["[2001:db8::1]:443"]}, [{"type": "tcp", "host": "2001:db8::1", "port": 443}]),
             (
                 {"dns": ["one.one.one.one=1.1.1.1,1.0.0.1"]},
                 [{"type": "dns", "name": "one.one.one.one", "ips": ["1.1.1.1", "1.0.0.1"]}],
@@ -1,10 +1,12 @@
+import os
 import sys
+import tempfile
 import unittest
 from io import StringIO
 
 import yaml
 
-from pipecheck.cmdfile import get_config_from_yamlfile
+from pipecheck.cmdfile import ConfigError, get_checks_from_yamlfile, get_config_from_yamlfile, iter_checks
 
 
 def stub_stdin(testcase_inst, inputs):
@@ -32,3 +34,50 @@ class CmdfileTests(unittest.TestCase):
             stub_stdin(self, yaml_file.read())
         data = get_config_from_yamlfile("-")
         self.assertEqual(self.test_data, data)
+
+
+class CheckFileTests(unittest.TestCase):
+    def write(self, content):
+        (fd, path) = tempfile.mkstemp(suffix=".yaml")
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_example(self):
+        checks = get_checks_from_yamlfile("example.yaml", ["id"])
+        self.assertEqual(
+            [id for id, _ in checks], ["a.a1.check1", "a.a1.check2", "a.a2.check3", "a.a2.check4", "b", "c.c1.c11.c111.check5"]
+        )
+        self.assertEqual(checks[1][1], {"type": "tcp", "host": "8.8.8.8", "port": 53})
+
+    def test_multiple_documents(self):
+        path = self.write("web:\n  type: http\n  url: http://web\n---\n- type: tcp\n  host: db\n  port: 3306\n  id: db\n---\n")
+        checks = get_checks_from_yamlfile(path, ["id"])
+        self.assertEqual([id for id, _ in checks], ["web", "db"])
+        path = self.write("- type: ping\n  host: a\n---\n- type: ping\n  host: b\n")
+        self.assertEqual([id for id, _ in get_checks_from_yamlfile(path)], ["0", "1.0"])
+
+    def test_all_errors(self):
+        path = self.write(
+            "a:\n  type: htp\n  url: x\nb:\n  - type: tcp\n    host: db\n    prot: 1\n    interval: 5\n"
+            + "  - type: tcp\n    host: db\n    port: http\n"
+        )
+        with self.assertRaises(ConfigError) as context:
+            get_checks_from_yamlfile(path, ["interval"])
+        self.assertEqual(len(context.exception.errors), 3)
+        self.assertIn("a: unknown check type 'htp'", context.exception.errors[0])
+        self.assertEqual(context.exception.errors[1], "b.0: unknown argument 'prot' of tcp check")
+        self.assertIn("b.1: invalid argument 'port' of tcp check", context.exception.errors[2])
+
+    def test_syntax_error(self):
+        path = self.write("a:\n  type: tcp\n   host: [\n")
+        self.assertRaisesRegex(ConfigError, "line", get_checks_from_yamlfile, path)
+
+    def test_deep_nesting(self):
+        config = {"type": "ping", "host": "a"}
+        for i in range(5000):
+            config = {f"k{i % 10}": config}
+        ((path, check),) = list(iter_checks(config))
+        self.assertEqual(len(path), 5000)
+        self.assertEqual(check, {"type": "ping", "host": "a"})
@@ -0,0 +1,308 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from typing import ClassVar
+
+from parameterized import parameterized
+
+from pipecheck.api import CheckResult, Err, Ok, Probe
+from pipecheck.checks.tcp import TcpProbe
+from pipecheck.engine import ThreadEngine
+from pipecheck.engine_async import AsyncEngine
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+class SyncProbe(Probe):
+    """Probe without a native coroutine"""
+
+    value: str = ""
+
+    def __call__(self) -> CheckResult:
+        return Ok(f"sync {self.value} in {threading.current_thread().name}")
+
+
+class BrokenProbe(Probe):
+    """Probe raising instead of returning a result"""
+
+    def __call__(self) -> CheckResult:
+        raise RuntimeError("boom")
+
+
+class CountingProbe(Probe):
+    """Probe recording how many instances run at the same time"""
+
+    _active = 0
+    _peak = 0
+
+    async def acall(self) -> CheckResult:
+        cls = self.__class__
+        cls._active += 1
+        cls._peak = max(cls._peak, cls._active)
+        await asyncio.sleep(0.01)
+        cls._active -= 1
+        return Ok("counted")
+
+
+class RecordingProbe(Probe):
+    """Probe recording its executions, waiting for `release` if set"""
+
+    value: str = ""
+    _executions = []
+    release: ClassVar[object] = None
+
+    def __call__(self) -> CheckResult:
+        RecordingProbe._executions.append(self.value)
+        if RecordingProbe.release is not None:
+            RecordingProbe.release.wait(5)
+        return Ok(f"recorded {self.value}")
+
+
+class SleepProbe(Probe):
+    """Probe sleeping for `delay` seconds, failing at once with delay 0"""
+
+    delay: float = 0.0
+    timeout: float = 10.0
+
+    def __call__(self) -> CheckResult:
+        if not self.delay:
+            return Err("failed")
+        time.sleep(min(float(self.delay), float(self.timeout)))
+        return Ok("slept")
+
+
+class HangingProbe(Probe):
+    """Probe ignoring its timeout, taking 5 seconds"""
+
+    timeout: float = 10.0
+
+    def __call__(self) -> CheckResult:
+        time.sleep(5)
+        return Ok("finished")
+
+
+class BatchProbe(Probe):
+    """Probe recording the batches it was executed in"""
+
+    value: str = ""
+    _batches = []
+
+    def __call__(self) -> CheckResult:
+        return Ok(f"single {self.value}")
+
+    @classmethod
+    def execute_many(cls, probes, prefix="batched"):
+        cls._batches.append(len(probes))
+        if any(p.value == "fail" for p in probes):
+            raise RuntimeError("batch failed")
+        return [Ok(f"{prefix} {p.value}") for p in probes]
+
+
+class CoroutineProbe(Probe):
+    """Probe implementing only the coroutine and batch hooks, recording its preparations"""
+
+    value: str = ""
+    _prepared = []
+
+    @classmethod
+    def prepare(cls, probes):
+        cls._prepared.append(len(probes))
+        if any(p.value == "unprepared" for p in probes):
+            raise RuntimeError("prepare failed")
+
+    async def acall(self) -> CheckResult:
+        await asyncio.sleep(0)
+        return Ok(f"coroutine {self.value}")
+
+    @classmethod
+    async def execute_many(cls, probes):
+        await asyncio.sleep(0)
+        return [Ok(f"batched coroutine {p.value}") for p in probes]
+
+
+class EngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(128)
+        self.open_port = self.listener.getsockname()[1]
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.listener.close()
+        return super().tearDown()
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_execute_tcp(self, _, engine_cls):
+        calls = [
+            (TcpProbe(host="127.0.0.1", port=self.open_port, tcp_timeout=1.0), "tcp"),
+            (TcpProbe(host="127.0.0.1", port=free_port(), tcp_timeout=1.0), "tcp"),
+        ]
+        results = {call[0].port: result for call, result in engine_cls().execute(calls)}
+        self.assertIsInstance(results[self.open_port], Ok, results[self.open_port].msg)
+        self.assertIsInstance(results[calls[1][0].port], Err)
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_execute_exception(self, _, engine_cls):
+        results = [result for _, result in engine_cls().execute([(BrokenProbe(), "broken")])]
+        self.assertIsInstance(results[0], Err)
+        self.assertIn("boom", results[0].msg)
+
+    def test_async_sync_fallback(self):
+        calls = [(SyncProbe(value=str(i)), "sync") for i in range(20)]
+        results = [result for _, result in AsyncEngine(threads=2).execute(calls)]
+        self.assertEqual(len(results), 20)
+        for result in results:
+            self.assertIsInstance(result, Ok)
+            self.assertNotIn("MainThread", result.msg)
+
+    def test_async_concurrency_limit(self):
+        calls = [(CountingProbe(), "counting") for _ in range(50)]
+        results = list(AsyncEngine(concurrency=5).execute(calls))
+        self.assertEqual(len(results), 50)
+        self.assertEqual(CountingProbe._peak, 5)
+
+    @parameterized.expand([("default", {}, 100), ("concurrency", {"concurrency": 20}, 20), ("threads", {"threads": 5}, 5)])
+    def test_async_threads(self, _, kwargs, threads):
+        self.assertEqual(AsyncEngine(**kwargs).threads, threads)
+
+    def test_async_many_tcp(self):
+        calls = [(TcpProbe(host="127.0.0.1", port=self.open_port, tcp_timeout=2.0), "tcp") for _ in range(100)]
+        results = [result for _, result in AsyncEngine().execute(calls)]
+        self.assertEqual(len(results), 100)
+        self.assertTrue(all(isinstance(r, Ok) for r in results), [r.msg for r in results if not isinstance(r, Ok)])
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_batch_fan_out(self, _, engine_cls):
+        BatchProbe._batches = []
+        calls = [(BatchProbe(value=str(i)), "batch") for i in range(5)] + [(SyncProbe(value="x"), "sync")]
+        results = {call[0].value: result for call, result in engine_cls(batch=[]).execute(calls)}
+        self.assertEqual(BatchProbe._batches, [5])
+        self.assertEqual(results["3"].msg, "batched 3")
+        self.assertTrue(results["x"].msg.startswith("sync x"))
+
+    @parameterized.expand([("disabled", None, "single"), ("other_type", ["ping"], "single"), ("type", ["batch"], "batched")])
+    def test_batch_selection(self, _, batch, expected):
+        BatchProbe._batches = []
+        results = [result for _, result in ThreadEngine(batch=batch).execute([(BatchProbe(value="1"), "batch")])]
+        self.assertEqual(results[0].msg, f"{expected} 1")
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_batch_options(self, _, engine_cls):
+        calls = [(BatchProbe(value="1"), "batch"), (BatchProbe(value="2"), "other")]
+        engine = engine_cls(batch=[], batch_options={"batch": {"prefix": "swept"}})
+        results = {call[1]: result for call, result in engine.execute(calls)}
+        self.assertEqual(results["batch"].msg, "swept 1")
+        self.assertEqual(results["other"].msg, "batched 2")
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_batch_exception(self, _, engine_cls):
+        calls = [(BatchProbe(value="fail"), "batch"), (BatchProbe(value="1"), "batch")]
+        results = [result for _, result in engine_cls(batch=[]).execute(calls)]
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertIsInstance(result, Err)
+            self.assertIn("batch failed", result.msg)
+
+    @parameterized.expand(
+        [
+            ("thread", ThreadEngine, None, "coroutine"),
+            ("async", AsyncEngine, None, "coroutine"),
+            ("thread_batch", ThreadEngine, [], "batched coroutine"),
+            ("async_batch", AsyncEngine, [], "batched coroutine"),
+        ]
+    )
+    def test_coroutine_probe(self, _, engine_cls, batch, expected):
+        CoroutineProbe._prepared = []
+        calls = [(CoroutineProbe(value=str(i)), "coroutine") for i in range(3)] + [(SyncProbe(value="x"), "sync")]
+        results = {call[0].value: result for call, result in engine_cls(batch=batch).execute(calls)}
+        self.assertEqual(CoroutineProbe._prepared, [3])
+        self.assertEqual(results["2"].msg, f"{expected} 2")
+        self.assertTrue(results["x"].msg.startswith("sync x"))
+
+    def test_prepare_exception(self):
+        calls = [(CoroutineProbe(value="unprepared"), "coroutine"), (SyncProbe(value="x"), "sync")]
+        results = [result for _, result in ThreadEngine().execute(calls)]
+        self.assertEqual(sorted(type(r).__name__ for r in results), ["Err", "Ok"])
+        self.assertIn("prepare failed", [r for r in results if isinstance(r, Err)][0].msg)
+
+    @parameterized.expand([("thread", ThreadEngine, None), ("async", AsyncEngine, None), ("batch", ThreadEngine, [])])
+    def test_duration(self, _, engine_cls, batch):
+        calls = [(BatchProbe(value="1"), "batch"), (CountingProbe(), "counting")]
+        for _, result in engine_cls(batch=batch).execute(calls):
+            self.assertIsNotNone(result.duration)
+            self.assertGreaterEqual(result.duration, 0.0)
+
+    @parameterized.expand(
+        [("thread", ThreadEngine, True, 2), ("async", AsyncEngine, True, 2), ("off", ThreadEngine, False, 6)]
+    )
+    def test_coalesce(self, _, engine_cls, coalesce, executions):
+        RecordingProbe._executions = []
+        calls = [(RecordingProbe(value="a"), "recording", {"interval": i}) for i in range(5)]
+        calls.append((RecordingProbe(value="b"), "recording"))
+        results = list(engine_cls(coalesce=coalesce).execute(calls))
+        self.assertEqual(len(RecordingProbe._executions), executions)
+        self.assertEqual(sorted(id(call) for call, _ in results), sorted(id(call) for call in calls))
+        self.assertEqual(sorted(r.msg for _, r in results), ["recorded a"] * 5 + ["recorded b"])
+        self.assertEqual(sum(r.duration is not None for _, r in results), executions)
+
+    def test_coalesce_in_flight(self):
+        RecordingProbe._executions = []
+        RecordingProbe.release = threading.Event()
+        try:
+            with ThreadEngine(coalesce=True) as engine:
+                first = engine.submit_many([(RecordingProbe(value="a"), "recording")])
+                second = engine.submit_many([(RecordingProbe(value="a"), "recording")])
+                RecordingProbe.release.set()
+                self.assertEqual(first[0].result(5).msg, second[0].result(5).msg)
+                self.assertIsNotNone(first[0].result(5).duration)
+                self.assertIsNone(second[0].result(5).duration)
+                third = engine.submit_many([(RecordingProbe(value="a"), "recording")])
+                third[0].result(5)
+        finally:
+            RecordingProbe.release = None
+        self.assertEqual(RecordingProbe._executions, ["a", "a"])
+
+    @parameterized.expand([("ttl", 60, 1), ("no_ttl", None, 2)])
+    def test_result_ttl(self, _, result_ttl, executions):
+        RecordingProbe._executions = []
+        with ThreadEngine(coalesce=True, result_ttl=result_ttl) as engine:
+            results = [list(engine.execute([(RecordingProbe(value="a"), "recording")]))[0][1] for _ in range(2)]
+        self.assertEqual(len(RecordingProbe._executions), executions)
+        # a reused result isn't measured again
+        self.assertEqual(results[1].duration is None, executions == 1)
+        self.assertIsNotNone(results[0].duration)
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_timeout(self, _, engine_cls):
+        calls = [(HangingProbe(), "hanging"), (SleepProbe(delay=0.01), "sleep")]
+        start = time.monotonic()
+        results = {call[1]: result for call, result in engine_cls().execute(calls, timeout=0.3)}
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(results["hanging"].msg, "hanging check aborted, deadline of 0.3s exceeded")
+        self.assertEqual(calls[1][0].timeout, 10.0)
+
+    def test_leave_early(self):
+        engine = ThreadEngine()
+        start = time.monotonic()
+        for _, result in engine.execute([(SleepProbe(delay=5), "sleep"), (SleepProbe(), "sleep")]):
+            self.assertIsInstance(result, Err)
+            break
+        self.assertTrue(engine.abandoned)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_can_batch(self):
+        self.assertTrue(BatchProbe.can_batch())
+        self.assertFalse(SyncProbe.can_batch())
+
+
+if __name__ == "__main__":
+    unittest.main()
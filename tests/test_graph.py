@@ -0,0 +1,102 @@
+import unittest
+
+from parameterized import parameterized
+
+from pipecheck.api import Call, CheckResult, Err, Ok, Probe, Unk
+from pipecheck.engine import ThreadEngine
+from pipecheck.engine_async import AsyncEngine
+from pipecheck.graph import CheckGraph, resolve_dependencies
+from pipecheck.scheduler import Scheduler
+
+
+class StateProbe(Probe):
+    """Probe returning Ok or Err depending on its state, recording its executions"""
+
+    state: str = "ok"
+    _executions = []
+
+    def __call__(self) -> CheckResult:
+        StateProbe._executions.append(self.state)
+        return Ok("up") if self.state == "ok" else Err("down")
+
+
+def check(id, state="ok", depends_on=None):
+    options = {"id": id}
+    if depends_on is not None:
+        options["depends_on"] = depends_on
+    return Call(StateProbe(state=state), "state", options)
+
+
+class GraphTests(unittest.TestCase):
+    def setUp(self) -> None:
+        StateProbe._executions = []
+        return super().setUp()
+
+    def test_resolve(self):
+        calls = resolve_dependencies([check("db.dns"), check("db.tcp", depends_on="dns"), check("app", depends_on=["db.tcp"])])
+        self.assertEqual([c.options.get("depends_on") for c in calls], [None, ["db.dns"], ["db.tcp"]])
+
+    @parameterized.expand(
+        [
+            ("unknown", [check("a", depends_on=["b"])], "unknown check 'b'"),
+            ("ambiguous", [check("x.dns"), check("y.dns"), check("a", depends_on=["dns"])], "ambiguous check 'dns'"),
+            ("duplicate", [check("a"), check("a")], "duplicate check ids: a"),
+            ("self", [check("a", depends_on=["a"])], "cyclic depends_on: a -> a"),
+            (
+                "cycle",
+                [check("a", depends_on=["c"]), check("b", depends_on=["a"]), check("c", depends_on=["b"])],
+                "cyclic depends_on: a -> c -> b -> a",
+            ),
+            ("no_id", [Call(StateProbe(), "state", {"depends_on": ["a"]}), check("a")], "needs an id"),
+        ]
+    )
+    def test_resolve_errors(self, _, calls, message):
+        with self.assertRaises(ValueError) as e:
+            resolve_dependencies(calls)
+        self.assertIn(message, str(e.exception))
+
+    def test_graph(self):
+        graph = CheckGraph([check("a"), check("b", depends_on=["a"]), check("c", depends_on=["a", "b"]), check("d")])
+        self.assertEqual(graph.start(), [0, 3])
+        self.assertEqual(graph.complete(0, Ok("")), ([1], []))
+        self.assertEqual(graph.complete(1, Ok("")), ([2], []))
+
+    def test_graph_skips_transitively(self):
+        graph = CheckGraph([check("a"), check("b", depends_on=["a"]), check("c", depends_on=["b"]), check("d")])
+        (ready, skips) = graph.complete(0, Err(""))
+        self.assertEqual(ready, [])
+        self.assertEqual([i for i, _ in skips], [1, 2])
+        self.assertTrue(all(isinstance(r, Unk) for _, r in skips))
+        self.assertIn("depends on failed check 'b'", skips[1][1].msg)
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_execute(self, _, engine_cls):
+        calls = [
+            check("dns", state="err"),
+            check("tcp", depends_on=["dns"]),
+            check("mysql", depends_on=["tcp"]),
+            check("other"),
+            check("app", depends_on=["other"]),
+        ]
+        results = {call.options["id"]: result for call, result in engine_cls().execute(calls)}
+        self.assertEqual(len(results), 5)
+        self.assertEqual([type(results[i]) for i in ["dns", "tcp", "mysql", "other", "app"]], [Err, Unk, Unk, Ok, Ok])
+        self.assertEqual(sorted(StateProbe._executions), ["err", "ok", "ok"])
+
+    def test_execute_order(self):
+        order = [call.options["id"] for call, _ in ThreadEngine().execute([check("b", depends_on=["a"]), check("a")])]
+        self.assertEqual(order, ["a", "b"])
+
+    def test_scheduler(self):
+        results = []
+        scheduler = Scheduler(ThreadEngine(), 0.05, jitter=0, on_result=lambda c, r: results.append((c.options["id"], r)))
+        scheduler.add(check("dns", state="err"))
+        scheduler.run(0.02)
+        scheduler.add(check("tcp", depends_on=["dns"]))
+        scheduler.run(0.02)
+        self.assertEqual([(i, type(r)) for i, r in results], [("dns", Err), ("tcp", Unk)])
+        self.assertEqual(StateProbe._executions, ["err"])
+
+
+if __name__ == "__main__":
+    unittest.main()
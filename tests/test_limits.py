@@ -0,0 +1,134 @@
+import threading
+import time
+import unittest
+
+from parameterized import parameterized
+
+from pipecheck.api import CheckResult, Ok, Probe
+from pipecheck.engine import ThreadEngine
+from pipecheck.engine_async import AsyncEngine
+from pipecheck.limits import Limits, TokenBucket, get_host
+
+
+class HostProbe(Probe):
+    """Probe recording the peak of concurrent executions per host and their start times"""
+
+    host: str = ""
+    url: str = ""
+    _active = {}
+    _peak = {}
+    _starts = []
+    _lock = threading.Lock()
+
+    def __call__(self) -> CheckResult:
+        cls = self.__class__
+        host = get_host((self, "host"))
+        with cls._lock:
+            cls._active[host] = cls._active.get(host, 0) + 1
+            cls._peak[host] = max(cls._peak.get(host, 0), cls._active[host])
+            cls._starts.append(time.monotonic())
+        time.sleep(0.02)
+        with cls._lock:
+            cls._active[host] -= 1
+        return Ok(f"done {host}")
+
+
+class BatchProbe(Probe):
+    """Probe recording the batches it was executed in"""
+
+    value: str = ""
+    _batches = []
+
+    def __call__(self) -> CheckResult:
+        return Ok(f"single {self.value}")
+
+    @classmethod
+    def execute_many(cls, probes):
+        cls._batches.append(len(probes))
+        return [Ok(f"batched {p.value}") for p in probes]
+
+
+class LimitsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        HostProbe._active = {}
+        HostProbe._peak = {}
+        HostProbe._starts = []
+        return super().setUp()
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10, burst=2)
+        now = bucket.updated
+        for _ in range(2):
+            self.assertEqual(bucket.wait(now), 0.0)
+            bucket.take()
+        self.assertAlmostEqual(bucket.wait(now), 0.1)
+        self.assertEqual(bucket.wait(now + 0.1), 0.0)
+
+    @parameterized.expand([("host", {"host": "a"}), ("url", {"url": "http://a:8080/x"})])
+    def test_get_host(self, _, args):
+        self.assertEqual(get_host((HostProbe(**args), "host")), "a")
+
+    @parameterized.expand([("thread", ThreadEngine), ("async", AsyncEngine)])
+    def test_host_concurrency(self, _, engine_cls):
+        calls = [(HostProbe(host="a"), "host") for _ in range(6)] + [(HostProbe(host="b"), "host") for _ in range(6)]
+        results = list(engine_cls(concurrency=20, limits=Limits(host_concurrency=2)).execute(calls))
+        self.assertEqual(len(results), 12)
+        self.assertEqual(HostProbe._peak, {"a": 2, "b": 2})
+
+    def test_host_concurrency_option(self):
+        calls = [(HostProbe(host="a"), "host", {"host_concurrency": 1}) for _ in range(3)]
+        calls += [(HostProbe(host="b"), "host") for _ in range(3)]
+        list(ThreadEngine(concurrency=20, limits=Limits()).execute(calls))
+        self.assertEqual(HostProbe._peak, {"a": 1, "b": 3})
+
+    def test_reset(self):
+        limits = Limits()
+        engine = ThreadEngine(concurrency=20, limits=limits)
+        list(engine.execute([(HostProbe(host="a"), "host", {"host_concurrency": 1}), (HostProbe(host="b"), "host")]))
+        limits.reset()
+        calls = [(HostProbe(host="a"), "host", {"host_concurrency": 2}) for _ in range(4)]
+        list(engine.execute(calls))
+        self.assertEqual(HostProbe._peak, {"a": 2, "b": 1})
+        self.assertEqual(list(limits._limits), [("host", "a")])
+
+    def test_type_concurrency(self):
+        calls = [(HostProbe(host=str(i)), "host") for i in range(6)]
+        limits = Limits(type_concurrency={"host": 3})
+        list(ThreadEngine(concurrency=20, limits=limits).execute(calls))
+        self.assertEqual(len(HostProbe._starts), 6)
+        self.assertEqual(len(limits), 0)
+        starts = sorted(HostProbe._starts)
+        self.assertGreaterEqual(starts[3] - starts[0], 0.015)
+
+    def test_type_concurrency_option(self):
+        calls = [(HostProbe(host=str(i)), "host", {"type_concurrency": 1 + i % 2}) for i in range(4)]
+        list(ThreadEngine(concurrency=20, limits=Limits()).execute(calls))
+        starts = sorted(HostProbe._starts)
+        self.assertTrue(all(b - a >= 0.015 for a, b in zip(starts, starts[1:])), starts)
+
+    @parameterized.expand(
+        [("limited", Limits(type_concurrency={"batch": 1}), [], "single"), ("unlimited", Limits(), [1], "batched")]
+    )
+    def test_batch(self, _, limits, batches, expected):
+        BatchProbe._batches = []
+        results = [result for _, result in ThreadEngine(batch=[], limits=limits).execute([(BatchProbe(value="1"), "batch")])]
+        self.assertEqual(BatchProbe._batches, batches)
+        self.assertEqual(results[0].msg, f"{expected} 1")
+
+    def test_host_rate(self):
+        calls = [(HostProbe(host="a"), "host") for _ in range(5)]
+        start = time.monotonic()
+        list(ThreadEngine(concurrency=20, limits=Limits(host_rate=50)).execute(calls))
+        # the first call starts right away, the others are spaced by 1/50 s
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        starts = sorted(HostProbe._starts)
+        self.assertTrue(all(b - a >= 0.015 for a, b in zip(starts, starts[1:])), starts)
+
+    def test_unlimited(self):
+        calls = [(HostProbe(host="a"), "host") for _ in range(5)]
+        list(ThreadEngine(concurrency=20, limits=Limits()).execute(calls))
+        self.assertEqual(HostProbe._peak, {"a": 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,45 @@
 import io
+import json
+import time
 import unittest
 import unittest.mock
 
 from parameterized import parameterized
 
-from pipecheck.__main__ import gen_call, get_commands_from_config, print_result, run
-from pipecheck.api import Err, Ok, Warn
+from pipecheck.__main__ import gen_call, get_commands_from_config, get_named_commands_from_config, print_result, run, run_wait
+from pipecheck.api import CheckResult, Err, Ok, Probe, Unk, Warn
 from pipecheck.checks.dns import DnsProbe
 from pipecheck.checks.http import HttpProbe
 from pipecheck.checks.icmp import PingProbe
 from pipecheck.checks.tcp import TcpProbe
+from pipecheck.output import JsonLinesWriter
 
 CRED = "\33[31m"
 CGREEN = "\33[32m"
 CYELLOW = "\33[33m"
+CBLUE = "\33[34m"
+
+
+class SlowProbe(Probe):
+    """Probe taking 5 seconds"""
+
+    def __call__(self) -> CheckResult:
+        time.sleep(5)
+        return Ok("slow")
+
+
+class FlakyProbe(Probe):
+    """Probe failing until its `failures` are used up"""
+
+    name: str = ""
+    failures: int = 0
+    _executions = []
+
+    def __call__(self) -> CheckResult:
+        FlakyProbe._executions.append(self.name)
+        if FlakyProbe._executions.count(self.name) <= int(self.failures):
+            return Err(f"{self.name} down")
+        return Ok(f"{self.name} up")
 
 
 class MainTests(unittest.TestCase):
@@ -22,6 +48,7 @@ class MainTests(unittest.TestCase):
             (Ok("Test Result"), CGREEN, ["OK", "Test Result"]),
             (Warn("Test Result"), CYELLOW, ["WARN", "Test Result"]),
             (Err("Test Result"), CRED, ["ERR", "Test Result"]),
+            (Unk("Test Result"), CBLUE, ["SKIP", "Test Result"]),
         ]
     )
     @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
@@ -52,7 +79,12 @@ class MainTests(unittest.TestCase):
     def test_gen_call(self, command, config, expected_call):
         call = gen_call(command, config)
         self.assertEqual(call[1], expected_call[0].get_type())
-        self.assertDictEqual(call[0].__dict__, expected_call[1])
+        self.assertDictEqual(call[0].get_labels(), {**expected_call[0].get_defaults(), **expected_call[1]})
+
+    def test_gen_call_options(self):
+        call = gen_call({"type": "tcp", "host": "8.8.8.8", "port": 53, "interval": 10}, {"interval": 30})
+        self.assertDictEqual(call.options, {"interval": 10})
+        self.assertDictEqual(call.probe.get_labels(), {**TcpProbe.get_defaults(), "host": "8.8.8.8", "port": 53})
 
     def test_run_success(self):
         exit_code = run([(HttpProbe(url="https://httpbin.org/status/200"), "http")])
@@ -62,6 +94,62 @@ class MainTests(unittest.TestCase):
         exit_code = run([(HttpProbe(url="https://httpbin.org/status/500"), "http")])
         self.assertEqual(exit_code, 1)
 
+    @unittest.mock.patch("sys.stderr", new_callable=io.StringIO)
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_run_fail_fast(self, mock_stdout, mock_stderr):
+        start = time.monotonic()
+        calls = [(TcpProbe(host="127.0.0.1", port=1), "tcp"), (SlowProbe(), "slow"), (SlowProbe(), "slow")]
+        exit_code = run(calls, fail_fast=True)
+        self.assertEqual(exit_code, 1)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertIn("2 outstanding checks cancelled", mock_stderr.getvalue())
+
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_run_deadline(self, mock_stdout):
+        start = time.monotonic()
+        exit_code = run([(SlowProbe(), "slow")], deadline=0.2)
+        self.assertEqual(exit_code, 1)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertIn("deadline of 0.2s exceeded", mock_stdout.getvalue())
+
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_run_jsonl(self, mock_stdout):
+        FlakyProbe._executions = []
+        calls = [(FlakyProbe(name="a"), "flaky"), (FlakyProbe(name="b", failures=1), "flaky")]
+        with unittest.mock.patch("pipecheck.__main__.output", JsonLinesWriter()):
+            exit_code = run(calls)
+        self.assertEqual(exit_code, 1)
+        lines = [json.loads(line) for line in mock_stdout.getvalue().splitlines()]
+        self.assertEqual(sorted(line["message"] for line in lines[:2]), ["a up", "b down"])
+        self.assertEqual(lines[2]["checks"], 2)
+        self.assertEqual(lines[2]["err"], 1)
+
+    @unittest.mock.patch("sys.stderr", new_callable=io.StringIO)
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_run_wait(self, mock_stdout, mock_stderr):
+        FlakyProbe._executions = []
+        calls = [(FlakyProbe(name="a"), "flaky"), (FlakyProbe(name="b", failures=2), "flaky")]
+        exit_code = run_wait(calls, timeout=5, backoff=0.01)
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(FlakyProbe._executions, ["a", "b", "b", "b"])
+        self.assertEqual(mock_stdout.getvalue().count("up"), 2)
+        self.assertNotIn("down", mock_stdout.getvalue())
+        self.assertIn("attempt 3", mock_stderr.getvalue())
+
+    @unittest.mock.patch("sys.stderr", new_callable=io.StringIO)
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_run_wait_timeout(self, mock_stdout, mock_stderr):
+        FlakyProbe._executions = []
+        slept = []
+        calls = [(FlakyProbe(name="a", failures=100), "flaky")]
+        exit_code = run_wait(calls, timeout=10, backoff=1, max_backoff=4, clock=lambda: sum(slept), sleep=slept.append)
+        self.assertEqual(exit_code, 1)
+        self.assertLess(sum(slept), 10)
+        self.assertTrue(all(min(4, 2**i) / 2 <= delay <= min(4, 2**i) for i, delay in enumerate(slept)), slept)
+        self.assertEqual(len(FlakyProbe._executions), len(slept) + 1)
+        self.assertIn("a down", mock_stdout.getvalue())
+        self.assertIn("gave up waiting", mock_stderr.getvalue())
+
     @parameterized.expand(
         [
             ({"type": "ping", "host": "8.8.8.8"}, [{"type": "ping", "host": "8.8.8.8"}]),
@@ -81,6 +169,19 @@ class MainTests(unittest.TestCase):
         for i in range(0, len(expected_commands)):
             self.assertEqual(commands[i], expected_commands[i])
 
+    def test_get_named_commands(self):
+        config = {
+            "db": {"dns": {"type": "dns", "name": "db"}, "tcp": {"type": "tcp", "host": "db", "depends_on": "dns"}},
+            "list": [{"type": "ping", "host": "a"}, {"type": "ping", "host": "b", "id": "ping_b"}],
+        }
+        ids = [id for id, _ in get_named_commands_from_config(config)]
+        self.assertEqual(ids, ["db.dns", "db.tcp", "list.0", "ping_b"])
+
+    def test_gen_call_dependencies(self):
+        call = gen_call({"type": "tcp", "host": "db", "port": 3306, "id": "db.tcp", "depends_on": ["db.dns"]}, {})
+        self.assertDictEqual(call.options, {"id": "db.tcp", "depends_on": ["db.dns"]})
+        self.assertDictEqual(call.probe.get_labels(), {**TcpProbe.get_defaults(), "host": "db", "port": 3306})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,103 @@
+import time
+import unittest
+
+from parameterized import parameterized
+from prometheus_client import CollectorRegistry
+
+from pipecheck.api import Call, Err, Ok
+from pipecheck.checks.http import HttpProbe
+from pipecheck.checks.tcp import TcpProbe
+from pipecheck.metrics import OVERFLOW, CheckMetrics, group_url, shorten
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = self.create(buckets=(0.1, 1.0))
+        return super().setUp()
+
+    def create(self, **kwargs):
+        self.registry = CollectorRegistry()
+        return CheckMetrics({"tcp": TcpProbe, "http": HttpProbe}, registry=self.registry, **kwargs)
+
+    def sample(self, name, **labels):
+        return self.registry.get_sample_value(name, labels)
+
+    def test_observe(self):
+        call = Call(TcpProbe(host="127.0.0.1", port=53), "tcp")
+        result = Ok("ok", {"connect": 0.05})
+        result.duration = 0.5
+        self.metrics.observe(call, result)
+        labels = {"host": "127.0.0.1", "port": "53"}
+        self.assertEqual(self.sample("tcp_check_state", tcp_check_state="Ok", **labels), 1.0)
+        self.assertEqual(self.sample("tcp_check_duration_seconds_bucket", le="0.1", **labels), 0.0)
+        self.assertEqual(self.sample("tcp_check_duration_seconds_bucket", le="1.0", **labels), 1.0)
+        self.assertEqual(self.sample("tcp_check_phase_duration_seconds_sum", phase="connect", **labels), 0.05)
+
+    def test_observe_without_timings(self):
+        call = Call(HttpProbe(url="http://localhost"), "http")
+        self.metrics.observe(call, Err("failed"))
+        self.assertEqual(self.sample("http_check_state", http_check_state="Err", url="http://localhost"), 1.0)
+        self.assertIsNone(self.sample("http_check_duration_seconds_count", url="http://localhost"))
+
+    def observe_tcp(self, metrics, port, phases=None):
+        metrics.observe(Call(TcpProbe(host="127.0.0.1", port=port), "tcp"), Ok("ok", phases))
+
+    def test_label_selection(self):
+        metrics = self.create(labels=["host"])
+        self.observe_tcp(metrics, 53)
+        self.observe_tcp(metrics, 80)
+        self.assertEqual(self.sample("tcp_check_state", tcp_check_state="Ok", host="127.0.0.1"), 1.0)
+        self.assertEqual(self.sample("pipecheck_metric_series", type="tcp"), 1.0)
+
+    def test_max_series(self):
+        metrics = self.create(max_series=3)
+        for port in range(10):
+            self.observe_tcp(metrics, port)
+        self.assertEqual(len(metrics), 4)
+        self.assertEqual(self.sample("tcp_check_state", tcp_check_state="Ok", host=OVERFLOW, port=OVERFLOW), 1.0)
+        self.assertEqual(self.sample("pipecheck_metric_series", type="tcp"), 4.0)
+
+    def test_retain(self):
+        calls = [Call(TcpProbe(host="127.0.0.1", port=port), "tcp") for port in (1, 2)]
+        for call in calls:
+            self.metrics.observe(call, Ok("ok", {"connect": 0.01}))
+        self.metrics.retain(calls[:1])
+        self.assertEqual(len(self.metrics), 1)
+        self.assertIsNone(self.sample("tcp_check_state", tcp_check_state="Ok", host="127.0.0.1", port="2"))
+        self.assertIsNone(self.sample("tcp_check_phase_duration_seconds_count", phase="connect", host="127.0.0.1", port="2"))
+        self.assertEqual(self.sample("tcp_check_state", tcp_check_state="Ok", host="127.0.0.1", port="1"), 1.0)
+
+    def test_expire(self):
+        metrics = self.create(series_ttl=10)
+        self.observe_tcp(metrics, 1, {"connect": 0.01})
+        metrics.expire(now=time.monotonic() + 5)
+        self.assertEqual(len(metrics), 1)
+        metrics.expire(now=time.monotonic() + 20)
+        self.assertEqual(len(metrics), 0)
+        self.assertIsNone(self.sample("tcp_check_state", tcp_check_state="Ok", host="127.0.0.1", port="1"))
+        self.assertEqual(self.sample("pipecheck_metric_series", type="tcp"), 0.0)
+
+    def test_long_url(self):
+        metrics = self.create(max_label_length=40, url_mode="path")
+        url = "http://localhost/" + "a" * 100
+        metrics.observe(Call(HttpProbe(url=url + "?token=1"), "http"), Ok("ok"))
+        self.assertEqual(self.sample("http_check_state", http_check_state="Ok", url=shorten(url, 40)), 1.0)
+
+    @parameterized.expand(
+        [
+            ("full", "https://example.com:8443/a/b?q=1#x"),
+            ("path", "https://example.com:8443/a/b"),
+            ("host", "https://example.com:8443"),
+        ]
+    )
+    def test_group_url(self, mode, expected):
+        self.assertEqual(group_url("https://example.com:8443/a/b?q=1#x", mode), expected)
+
+    def test_shorten(self):
+        self.assertEqual(shorten("short", 10), "short")
+        self.assertEqual(len(shorten("x" * 100, 40)), 40)
+        self.assertNotEqual(shorten("x" * 100 + "a", 40), shorten("x" * 100 + "b", 40))
+
+
+if __name__ == "__main__":
+    unittest.main()
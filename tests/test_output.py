@@ -0,0 +1,55 @@
+import io
+import json
+import unittest
+
+from pipecheck.api import Call, Err, Ok, Unk
+from pipecheck.checks.mysql import MysqlProbe
+from pipecheck.checks.tcp import TcpProbe
+from pipecheck.output import JsonLinesWriter
+
+
+class OutputTests(unittest.TestCase):
+    def test_write_buffers_until_flush(self):
+        stream = io.StringIO()
+        writer = JsonLinesWriter(stream)
+        result = Ok("up")
+        result.duration = 0.5
+        writer.write(Call(TcpProbe(host="127.0.0.1", port=80), "tcp", {"id": "web"}), result)
+        self.assertEqual(stream.getvalue(), "")
+        writer.flush()
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record["id"], "web")
+        self.assertEqual(record["type"], "tcp")
+        self.assertEqual(record["labels"], {"host": "127.0.0.1", "port": 80})
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual(record["message"], "up")
+        self.assertEqual(record["duration"], 0.5)
+        self.assertTrue(record["timestamp"].endswith("+00:00"))
+        writer.flush()
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
+    def test_labels_without_secrets(self):
+        stream = io.StringIO()
+        writer = JsonLinesWriter(stream)
+        writer.write((MysqlProbe(host="db", user="app", password="secret"), "mysql"), Err("down"))
+        writer.flush()
+        self.assertNotIn("secret", stream.getvalue())
+        self.assertIsNone(json.loads(stream.getvalue())["id"])
+
+    def test_summary(self):
+        stream = io.StringIO()
+        writer = JsonLinesWriter(stream)
+        call = (TcpProbe(host="127.0.0.1", port=80), "tcp")
+        for result in [Ok("up"), Ok("up"), Err("down"), Unk("skipped")]:
+            writer.write(call, result)
+        writer.summary(1.5)
+        writer.flush()
+        summary = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual(summary, {"summary": True, "checks": 4, "ok": 2, "warn": 0, "err": 1, "unk": 1, "seconds": 1.5})
+        writer.summary()
+        writer.flush()
+        self.assertEqual(json.loads(stream.getvalue().splitlines()[-1])["checks"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pipecheck.api import ProbeSpec
+from pipecheck.checks import ProbeRegistry, get_entry_points
+
+PLUGIN = '''
+import asyncio
+
+from pipecheck.api import Err, Ok, Probe
+
+
+class EchoProbe(Probe):
+    """Echo check answering with its message"""
+
+    message: str = ""
+    echo_delay: float = 0.0
+
+    async def acall(self):
+        await asyncio.sleep(self.echo_delay)
+        return Ok(f"echo {self.message}") if self.message != "fail" else Err("echo failed")
+'''
+
+
+class PluginTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        with open(os.path.join(self.dir.name, "pipecheck_echo.py"), "w") as f:
+            f.write(PLUGIN)
+        self.add_distribution(self.dir.name, "pipecheck_echo-0.1", {"echo": "pipecheck_echo:EchoProbe"})
+        return super().setUp()
+
+    def add_distribution(self, path, name, entry_points):
+        info = os.path.join(path, f"{name}.dist-info")
+        os.makedirs(info)
+        with open(os.path.join(info, "METADATA"), "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: {name.split('-')[0]}\nVersion: {name.split('-')[1]}\n")
+        with open(os.path.join(info, "entry_points.txt"), "w") as f:
+            f.write("[console_scripts]\necho = pipecheck_echo:main\n\n[pipecheck.probes]\n")
+            f.write("".join(f"{k} = {v}\n" for k, v in entry_points.items()))
+
+    def run_pipecheck(self, *args, stderr=None):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join([self.dir.name, os.getcwd()])}
+        out = subprocess.run(
+            [sys.executable, "-m", "pipecheck", "-o", "jsonl"] + list(args), env=env, capture_output=True, text=True
+        )
+        if stderr is not None:
+            stderr.append(out.stderr)
+        return [json.loads(line) for line in out.stdout.splitlines()]
+
+    def test_entry_points(self):
+        sys.path.insert(0, self.dir.name)
+        try:
+            self.assertEqual(list(get_entry_points("pipecheck.probes")), [("echo", "pipecheck_echo:EchoProbe")])
+        finally:
+            sys.path.remove(self.dir.name)
+
+    def test_entry_points_first_distribution(self):
+        other = os.path.join(self.dir.name, "other")
+        self.add_distribution(other, "Pipecheck.Echo-0.2", {"echo": "other_echo:EchoProbe"})
+        sys.path[:0] = [self.dir.name, other]
+        try:
+            self.assertEqual(list(get_entry_points("pipecheck.probes")), [("echo", "pipecheck_echo:EchoProbe")])
+        finally:
+            sys.path[:2] = []
+
+    def test_registry_lazy(self):
+        registry = ProbeRegistry()
+        registry["tcp"] = ProbeSpec("pipecheck.checks.tcp:TcpProbe", "tcp")
+        sys.path.insert(0, self.dir.name)
+        try:
+            self.assertIn("tcp", registry)
+            self.assertEqual(list(registry), ["tcp"])
+            self.assertEqual(registry["echo"].path, "pipecheck_echo:EchoProbe")
+            self.assertEqual(list(registry), ["tcp", "echo"])
+            self.assertNotIn("unknown", registry)
+        finally:
+            sys.path.remove(self.dir.name)
+
+    def test_clashing_plugins(self):
+        self.add_distribution(
+            self.dir.name,
+            "pipecheck_clash-0.1",
+            {"file": "pipecheck_echo:EchoProbe", "tcp": "pipecheck_echo:EchoProbe", "engine": "pipecheck_echo:EchoProbe"},
+        )
+        stderr = []
+        lines = self.run_pipecheck("--echo", "hello", stderr=stderr)
+        self.assertEqual(lines[0]["message"], "echo hello")
+        self.assertIn("check type 'tcp' already exists", stderr[0])
+        self.assertIn("check type 'file' is a command line option", stderr[0])
+        self.assertIn("check type 'engine' is a command line option", stderr[0])
+
+    def test_plugin_probe(self):
+        for engine in ["thread", "async"]:
+            lines = self.run_pipecheck("--engine", engine, "--echo", "hello", "fail")
+            self.assertEqual(
+                sorted((line["status"], line["message"]) for line in lines[:2]), [("err", "echo failed"), ("ok", "echo hello")]
+            )
+            self.assertEqual(lines[2]["checks"], 2)
+            self.assertEqual(lines[0]["type"], "echo")
+
+    def test_plugin_command_file(self):
+        path = os.path.join(self.dir.name, "checks.yaml")
+        with open(path, "w") as f:
+            f.write("greeting:\n  type: echo\n  message: hi\n  echo_delay: '0.01'\n")
+        lines = self.run_pipecheck("-f", path)
+        self.assertEqual((lines[0]["id"], lines[0]["message"]), ("greeting", "echo hi"))
+
+
+if __name__ == "__main__":
+    unittest.main()
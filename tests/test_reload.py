@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from pipecheck.reload import ConfigReloader
+
+
+class ReloadTests(unittest.TestCase):
+    def setUp(self) -> None:
+        (fd, self.path) = tempfile.mkstemp(suffix=".yaml")
+        os.close(fd)
+        self.write("v1")
+        self.applied = []
+        self.errors = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        os.unlink(self.path)
+        return super().tearDown()
+
+    def write(self, content, mtime=None):
+        with open(self.path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def load(self):
+        with open(self.path) as f:
+            content = f.read()
+        if content == "broken":
+            raise ValueError("invalid config")
+        return content
+
+    def reloader(self, poll_interval=0.0001):
+        return ConfigReloader(self.path, self.load, self.applied.append, self.errors.append, poll_interval)
+
+    def test_reload_on_change(self):
+        reloader = self.reloader()
+        self.assertFalse(reloader.poll())
+        self.write("v2", mtime=1000)
+        self.assertTrue(reloader.poll())
+        self.assertFalse(reloader.poll())
+        self.assertEqual(self.applied, ["v2"])
+
+    def test_reload_on_request(self):
+        reloader = self.reloader(poll_interval=0)
+        self.write("v2", mtime=1000)
+        self.assertFalse(reloader.poll())
+        reloader.request()
+        self.assertTrue(reloader.poll())
+        self.assertEqual(self.applied, ["v2"])
+
+    def test_broken_config_kept(self):
+        reloader = self.reloader()
+        self.write("broken", mtime=1000)
+        self.assertFalse(reloader.poll())
+        self.assertEqual(self.applied, [])
+        self.assertIsInstance(self.errors[0], ValueError)
+        self.write("v3", mtime=2000)
+        self.assertTrue(reloader.poll())
+        self.assertEqual(self.applied, ["v3"])
+
+    def test_stdin_not_watched(self):
+        reloader = ConfigReloader("-", self.load, self.applied.append, poll_interval=0.0001)
+        self.assertFalse(reloader.poll())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import socket
+import struct
+import unittest
+
+from parameterized import parameterized
+
+from pipecheck.bench.servers import DnsStubServer
+from pipecheck.resolver import DnsCache, DnsResolver, ResolveError, build_query, parse_nameserver, parse_response
+
+ZONE = {
+    "svc.example": {"A": ["10.0.0.1", "10.0.0.2"], "AAAA": ["fd00::1"]},
+    "alias.example": {"CNAME": ["svc.example"]},
+    "big.example": {"A": ["10.0.1.1"]},
+}
+
+
+class ResolverTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = DnsStubServer(ZONE, truncate=["big.example"])
+        self.cache = DnsCache()
+        self.resolver = DnsResolver(self.server.nameserver, timeout=1.0, cache=self.cache)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.close()
+        return super().tearDown()
+
+    def test_resolve_all_types(self):
+        records = self.resolver.resolve_sync("svc.example")
+        self.assertCountEqual(
+            [(r.type, r.value) for r in records], [("A", "10.0.0.1"), ("A", "10.0.0.2"), ("AAAA", "fd00::1")]
+        )
+        self.assertCountEqual([q[2] for q in self.server.queries], [1, 28, 5])
+
+    def test_resolve_cname(self):
+        records = self.resolver.resolve_sync("alias.example")
+        self.assertIn(("CNAME", "svc.example"), [(r.type, r.value) for r in records])
+        self.assertIn(("AAAA", "fd00::1"), [(r.type, r.value) for r in records])
+
+    def test_nxdomain(self):
+        with self.assertRaisesRegex(ResolveError, "NXDOMAIN"):
+            self.resolver.resolve_sync("missing.example")
+
+    def test_tcp_fallback(self):
+        records = self.resolver.resolve_sync("big.example", ("A",))
+        self.assertEqual([r.value for r in records], ["10.0.1.1"])
+        self.assertEqual([q[0] for q in self.server.queries], ["udp", "tcp"])
+
+    def test_tcp_only(self):
+        DnsResolver(self.server.nameserver, tcp=True, cache=None).resolve_sync("svc.example", ("A",))
+        self.assertEqual([q[0] for q in self.server.queries], ["tcp"])
+
+    def test_cache(self):
+        self.resolver.resolve_sync("svc.example")
+        self.resolver.resolve_sync("SVC.example.")
+        self.assertEqual(len(self.server.queries), 3)
+
+    def test_cache_ttl_zero(self):
+        self.server.ttl = 0
+        self.resolver.resolve_sync("svc.example", ("A",))
+        self.resolver.resolve_sync("svc.example", ("A",))
+        self.assertEqual(len(self.server.queries), 2)
+
+    def test_timeout(self):
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(("127.0.0.1", 0))
+        self.addCleanup(silent.close)
+        resolver = DnsResolver(f"127.0.0.1:{silent.getsockname()[1]}", timeout=0.2, cache=None)
+        with self.assertRaisesRegex(ResolveError, "no response"):
+            resolver.resolve_sync("svc.example")
+
+    def test_parse_compressed(self):
+        query = build_query(4711, "svc.example", "A")
+        answer = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 60, 4) + socket.inet_aton("10.0.0.1")
+        data = struct.pack("!HHHHHH", 4711, 0x8180, 1, 1, 0, 0) + query[12:] + answer
+        response = parse_response(data)
+        self.assertEqual(response.id, 4711)
+        self.assertEqual(response.records[0].name, "svc.example")
+        self.assertEqual(response.records[0].value, "10.0.0.1")
+
+    def test_parse_malformed(self):
+        with self.assertRaises(ResolveError):
+            parse_response(b"\x00\x01\x81\x80\x00\x01\x00\x01")
+
+    @parameterized.expand(
+        [
+            ("1.1.1.1", ("1.1.1.1", 53)),
+            ("127.0.0.1:5353", ("127.0.0.1", 5353)),
+            ("::1", ("::1", 53)),
+            ("[::1]:5353", ("::1", 5353)),
+        ]
+    )
+    def test_parse_nameserver(self, nameserver, expected):
+        self.assertEqual(parse_nameserver(nameserver), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
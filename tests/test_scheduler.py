@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+
+from pipecheck.api import Call, CheckResult, Ok, Probe
+from pipecheck.engine import ThreadEngine
+from pipecheck.engine_async import AsyncEngine
+from pipecheck.scheduler import Scheduler
+
+
+class CountingProbe(Probe):
+    """Probe counting its executions"""
+
+    delay: float = 0.0
+    _count: int = 0
+    _lock: object = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> CheckResult:
+        with self._lock:
+            self._count += 1
+        time.sleep(self.delay)
+        return Ok("counted")
+
+
+class SchedulerTests(unittest.TestCase):
+    def test_individual_intervals(self):
+        fast = CountingProbe()
+        slow = CountingProbe()
+        results = []
+        scheduler = Scheduler(ThreadEngine(), 0.2, jitter=0, on_result=lambda c, r: results.append(r))
+        scheduler.add(Call(fast, "counting", {"interval": 0.05}))
+        scheduler.add((slow, "counting"))
+        scheduler.run(0.5)
+        self.assertGreaterEqual(fast._count, 7)
+        self.assertLessEqual(slow._count, 3)
+        self.assertEqual(len(results), fast._count + slow._count)
+
+    def test_on_step(self):
+        steps = []
+        scheduler = Scheduler(ThreadEngine(), 0.1, jitter=0, on_step=steps.append)
+        scheduler.add((CountingProbe(), "counting"))
+        scheduler.run(0.35)
+        self.assertGreater(len(steps), 2)
+        # waiting for due calls and results doesn't count
+        self.assertLess(sum(steps), 0.1)
+
+    def test_skip_overrunning(self):
+        probe = CountingProbe(delay=0.2)
+        skipped = []
+        scheduler = Scheduler(AsyncEngine(), 0.05, jitter=0, on_skip=skipped.append)
+        scheduler.add((probe, "counting"))
+        scheduler.run(0.5)
+        self.assertLessEqual(probe._count, 3)
+        self.assertGreater(len(skipped), 0)
+        self.assertIs(skipped[0].probe, probe)
+
+    def test_jitter_spreads_start(self):
+        scheduler = Scheduler(ThreadEngine(), 10, jitter=1.0)
+        start = time.monotonic()
+        for _ in range(100):
+            scheduler.add((CountingProbe(), "counting"))
+        offsets = [entry[0] - start for entry in scheduler._heap]
+        self.assertEqual(len(scheduler), 100)
+        self.assertTrue(all(0 <= o <= 10.1 for o in offsets))
+        self.assertGreater(max(offsets) - min(offsets), 5)
+
+    def test_update_keeps_unchanged(self):
+        scheduler = Scheduler(ThreadEngine(), 10, jitter=1.0)
+        kept = Call(CountingProbe(delay=0.1), "counting")
+        scheduler.add(kept)
+        scheduler.add((CountingProbe(delay=0.2), "counting"))
+        due = {entry[2].probe.delay: entry[0] for entry in scheduler._heap}
+
+        (added, removed) = scheduler.update([(CountingProbe(delay=0.1), "counting"), (CountingProbe(delay=0.3), "counting")])
+        self.assertEqual((added, removed), (1, 1))
+        entries = {entry[2].probe.delay: entry for entry in scheduler._heap}
+        self.assertEqual(sorted(entries), [0.1, 0.3])
+        self.assertIs(entries[0.1][2].probe, kept.probe)
+        self.assertEqual(entries[0.1][0], due[0.1])
+
+    def test_update_options(self):
+        scheduler = Scheduler(ThreadEngine(), 10)
+        scheduler.add(Call(CountingProbe(), "counting", {"interval": 1}))
+        self.assertEqual(scheduler.update([Call(CountingProbe(), "counting", {"interval": 2})]), (1, 1))
+        self.assertEqual(scheduler.update([Call(CountingProbe(), "counting", {"interval": 2})] * 2), (1, 0))
+        self.assertEqual(len(scheduler), 2)
+
+    def test_update_drops_running_results(self):
+        results = []
+        scheduler = Scheduler(ThreadEngine(), 10, jitter=0, on_result=lambda c, r: results.append(r))
+        scheduler.add((CountingProbe(delay=0.2), "counting"))
+        with scheduler.engine:
+            scheduler.step(0)
+            scheduler.update([])
+            scheduler.step(0.5)
+        self.assertEqual(results, [])
+        self.assertEqual(len(scheduler), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from parameterized import parameterized
+
+from pipecheck.api import Call
+from pipecheck.checks.tcp import TcpProbe
+from pipecheck.shard import HashRing, get_shard_index, get_shard_keys, select_shard
+
+
+def tcp(port, **options):
+    return Call(TcpProbe(host="127.0.0.1", port=port), "tcp", options)
+
+
+class ShardTests(unittest.TestCase):
+    def test_shards_split_calls(self):
+        calls = [tcp(port, id=f"check{port}") for port in range(1000)]
+        shards = [select_shard(calls, 4, index) for index in range(4)]
+        self.assertEqual(sorted(c.probe.port for shard in shards for c in shard), list(range(1000)))
+        for shard in shards:
+            self.assertGreater(len(shard), 150)
+        self.assertEqual(select_shard(calls, 4, 2), shards[2])
+
+    def test_adding_shard_moves_few_keys(self):
+        keys = [f"check{i}" for i in range(2000)]
+        (before, after) = (HashRing(3), HashRing(4))
+        moved = [key for key in keys if before.get_shard(key) != after.get_shard(key)]
+        self.assertLess(len(moved), len(keys) * 0.35)
+        self.assertEqual({after.get_shard(key) for key in moved}, {3})
+
+    def test_dependencies_share_shard(self):
+        calls = [
+            tcp(1, id="a.db"),
+            tcp(2, id="a.app", depends_on=["a.db"]),
+            tcp(3, id="b.cache"),
+            tcp(4, id="b.app", depends_on=["b.cache", "a.app"]),
+            tcp(5),
+        ]
+        keys = get_shard_keys(calls)
+        self.assertEqual(keys[:4], ["a.app"] * 4)
+        self.assertEqual(keys[4], repr(calls[4].get_probe_key()))
+
+    @parameterized.expand(
+        [
+            (1, {"PIPECHECK_SHARD_INDEX": "2"}, 1),
+            (None, {"PIPECHECK_SHARD_INDEX": "2", "HOSTNAME": "pipecheck-3"}, 2),
+        ]
+    )
+    def test_get_shard_index(self, index, environ, expected):
+        self.assertEqual(get_shard_index(index, environ), expected)
+
+    def test_get_shard_index_unknown(self):
+        # the ordinal at the end of a hostname isn't guessed, a replica must know its shard
+        self.assertRaises(ValueError, get_shard_index, None, {"HOSTNAME": "pipecheck-3"})
+        self.assertRaises(ValueError, get_shard_index, None, {"PIPECHECK_SHARD_INDEX": ""})
+        self.assertRaises(ValueError, get_shard_index, None, {"PIPECHECK_SHARD_INDEX": "first"})
+        self.assertRaises(ValueError, select_shard, [tcp(1)], 2, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import socket
+import subprocess
+import sys
+import time
+import unittest
+
+from parameterized import parameterized
+
+HEAVY_MODULES = ["asyncio", "certifi", "icmplib", "netaddr", "prometheus_client", "pymysql", "requests", "termcolor", "yaml"]
+
+SCRIPT = """
+import runpy, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+sys.argv = ["pipecheck"] + sys.argv[1:]
+try:
+    runpy.run_module("pipecheck", run_name="__main__")
+except SystemExit:
+    pass
+loaded = {m.split(".")[0] for m in set(sys.modules) - before}
+print(",".join(sorted(loaded)))
+print(time.perf_counter() - start)
+"""
+
+
+class StartupTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(8)
+        self.target = f"127.0.0.1:{self.listener.getsockname()[1]}"
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.listener.close()
+        return super().tearDown()
+
+    def run_pipecheck(self, *args):
+        out = subprocess.run([sys.executable, "-c", SCRIPT] + list(args), capture_output=True, text=True, check=True)
+        (modules, seconds) = out.stdout.strip().splitlines()[-2:]
+        return set(modules.split(",")), float(seconds)
+
+    @parameterized.expand(
+        [
+            ("tcp", ["--tcp", "{target}"], []),
+            ("http", ["--http", "http://{target}/", "--http-timeout", "1"], ["requests", "certifi"]),
+            ("async", ["--tcp", "{target}", "--engine", "async"], ["asyncio"]),
+        ]
+    )
+    def test_lazy_imports(self, _, args, allowed):
+        (modules, _) = self.run_pipecheck(*[a.format(target=self.target) for a in args])
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules and m not in allowed], [])
+        for module in allowed[:1]:
+            self.assertIn(module, modules)
+
+    def test_startup_time(self):
+        # generous bound against accidental eager imports, see `python -m pipecheck.bench` for actual numbers
+        start = time.perf_counter()
+        (_, seconds) = self.run_pipecheck("--tcp", self.target)
+        self.assertLess(seconds, 0.5, f"one-shot tcp run took {seconds:.3f}s ({time.perf_counter() - start:.3f}s total)")
+
+
+if __name__ == "__main__":
+    unittest.main()
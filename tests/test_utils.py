@@ -2,7 +2,7 @@ import unittest
 
 from parameterized import parameterized
 
-from pipecheck.utils import mergedicts
+from pipecheck.utils import IpMatcher, get_ip_matcher, mergedicts
 
 
 class UtilsTests(unittest.TestCase):
@@ -50,3 +50,38 @@ class UtilsTests(unittest.TestCase):
     def test_mergedicts(self, msg, dict1, dict2, expected_merged_dict):
         merges_dict = dict(mergedicts(dict1, dict2))
         self.assertDictEqual(expected_merged_dict, merges_dict, msg=msg)
+
+    @parameterized.expand(
+        [
+            ("single ip", ["8.8.8.8"], "8.8.8.8", True),
+            ("single ip miss", ["8.8.8.8"], "8.8.4.4", False),
+            ("subnet", ["10.0.0.0/8"], "10.255.255.255", True),
+            ("subnet miss", ["10.0.0.0/8"], "11.0.0.0", False),
+            ("subnet host bits", ["8.8.0.0/8"], "8.1.2.3", True),
+            ("mixed", ["1.1.1.0/24", "1.0.0.1"], "1.0.0.1", True),
+            ("below first", ["1.1.1.0/24", "2.0.0.0/8"], "1.0.0.255", False),
+            ("between ranges", ["1.1.1.0/24", "2.0.0.0/8"], "1.1.2.0", False),
+            ("ipv6", ["2001:db8::/32"], "2001:db8:1::1", True),
+            ("ipv6 miss", ["2001:db8::/32"], "2001:db9::1", False),
+            ("ipv6 vs ipv4 targets", ["0.0.0.0/0"], "::1", False),
+            ("empty", [], "127.0.0.1", False),
+        ]
+    )
+    def test_ip_matcher(self, _, targets, ip, expected):
+        self.assertEqual(ip in IpMatcher(targets), expected)
+
+    def test_ip_matcher_merge(self):
+        matcher = IpMatcher(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.5", "10.0.3.0/24", "fd00::/8"])
+        self.assertEqual(len(matcher), 3)
+        self.assertEqual(matcher.versions, {4, 6})
+        self.assertTrue(matcher.has_networks)
+        self.assertNotIn("10.0.2.1", matcher)
+        self.assertIn("10.0.1.255", matcher)
+
+    def test_ip_matcher_large(self):
+        matcher = IpMatcher([f"10.{i}.{j}.0/24" for i in range(0, 256, 2) for j in range(256)])
+        self.assertIn("10.4.17.9", matcher)
+        self.assertNotIn("10.5.17.9", matcher)
+
+    def test_ip_matcher_cached(self):
+        self.assertIs(get_ip_matcher(("10.0.0.0/8",)), get_ip_matcher(("10.0.0.0/8",)))